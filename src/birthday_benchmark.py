@@ -0,0 +1,77 @@
+import argparse
+from datetime import datetime
+
+from helpers.birth_date_index import BirthDateIndex
+from helpers.birthday_columns import BirthdayColumns, _numpy, age_bounds
+from storage_benchmark import generate_book, timed
+
+
+def age_scan(book, min_age: int, max_age: int, today) -> list:
+    """Age-range query as a loop over the records, the baseline for born_between."""
+
+    start, end = age_bounds(today, min_age, max_age)
+    return [
+        name
+        for name, record in book.data.items()
+        if record.birthday is not None and start <= record.birthday.value.date() <= end
+    ]
+
+
+def by_name(birthdays: list) -> list:
+    """Order upcoming birthdays by name, to compare the calendar (by date) with the loop."""
+
+    return sorted(birthdays, key=lambda entry: entry["name"])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the per-record birthday loop with the packed birthday columns"
+    )
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--ages", type=int, nargs=2, default=(30, 40), metavar=("MIN", "MAX"))
+    args = parser.parse_args()
+
+    book = generate_book(args.contacts, 0)
+    today = datetime.now().date()
+    columns = BirthdayColumns()
+    backend = "numpy" if _numpy() is not None else "array + itertools"
+    build, _ = timed(columns.build, book)
+    print(f"{args.contacts} contacts, {len(columns)} birthdays, backend: {backend}")
+    loop, expected = timed(book.scan_upcoming_birthdays, args.days, today)
+    vector, found = timed(columns.upcoming, today, args.days)
+    assert len(found) == len(expected)
+    first, _ = timed(book.get_upcoming_birthdays, args.days)
+    cached, _ = timed(book.get_upcoming_birthdays, args.days)
+    horizon = book.birthday_calendar.horizon
+    for days in (-5, -1, 0, 1, args.days, horizon - 1, horizon):  # the calendar's edges
+        assert by_name(book.get_upcoming_birthdays(days)) == by_name(
+            book.scan_upcoming_birthdays(days, today)
+        ), f"calendar and loop differ for {days} days"
+    start, end = age_bounds(today, *args.ages)
+    age_loop, expected = timed(age_scan, book, *args.ages, today)
+    age_vector, found = timed(columns.born_between, start, end)
+    assert sorted(found) == sorted(expected)
+    index = BirthDateIndex()
+    index_build, _ = timed(index.build, book)
+    age_index, found = timed(index.born_between, start, end)
+    assert sorted(found) == sorted(expected)
+
+    print(f"{'query':<40}{'s':>10}")
+    rows = [
+        ("build columns (once)", build),
+        (f"upcoming {args.days} days: loop", loop),
+        (f"upcoming {args.days} days: columns", vector),
+        (f"upcoming {args.days} days: calendar, first", first),
+        (f"upcoming {args.days} days: calendar, cached", cached),
+        (f"ages {args.ages[0]}-{args.ages[1]}: loop", age_loop),
+        (f"ages {args.ages[0]}-{args.ages[1]}: columns", age_vector),
+        ("build birth date index (once)", index_build),
+        (f"ages {args.ages[0]}-{args.ages[1]}: birth date index", age_index),
+    ]
+    for name, seconds in rows:
+        print(f"{name:<40}{seconds:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
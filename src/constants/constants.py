@@ -15,20 +15,31 @@ COMMANDS = f"""
 {Fore.GREEN}- all_contacts:{Style.RESET_ALL} List all contacts.
 {Fore.GREEN}- all_notes:{Style.RESET_ALL} Show all notes.
 {Fore.GREEN}- birthdays: <days_lookup>{Style.RESET_ALL} Show all birthdays from today to days_lookup.
+{Fore.GREEN}- born_between <first date> <last date>:{Style.RESET_ALL} Show contacts born between two dates.
+{Fore.GREEN}- age_range <min age> <max age>:{Style.RESET_ALL} Show contacts aged from min to max years.
 {Fore.GREEN}- change_phone <name> <old_phone> <new_phone>:{Style.RESET_ALL} Change the phone number of a contact.
 {Fore.GREEN}- change_address <name> <address>:{Style.RESET_ALL} Change an address for a contact.
 {Fore.GREEN}- change_email <name> <email>:{Style.RESET_ALL} Change the email of a contact.
 {Fore.GREEN}- close/exit:{Style.RESET_ALL} Close the assistant.
 {Fore.GREEN}- delete_contact <name>:{Style.RESET_ALL} Delete a note by title.
 {Fore.GREEN}- delete_note <title>:{Style.RESET_ALL} Delete a note by title.
+{Fore.GREEN}- merge_duplicates:{Style.RESET_ALL} Find contacts sharing a phone, email or name and merge them.
 {Fore.GREEN}- edit_note <title> <new_content>:{Style.RESET_ALL} Edit an existing note.
 {Fore.GREEN}- find_contact_by_name <name>:{Style.RESET_ALL} Searching contact by entered name.
 {Fore.GREEN}- find_note_by_title <title>:{Style.RESET_ALL} Searching note by entered title.
 {Fore.GREEN}- find_notes <query>:{Style.RESET_ALL} Search notes by title or content.
+{Fore.GREEN}- notes_between <start date> <end date>:{Style.RESET_ALL} Show notes created between two dates, oldest first.
+{Fore.GREEN}- recent_notes <count>:{Style.RESET_ALL} Show the most recently created notes, newest first.
 {Fore.GREEN}- find_notes_by_tag <tag>:{Style.RESET_ALL} Searching notes by entered tag.
+{Fore.GREEN}- similar_notes <title>:{Style.RESET_ALL} Show notes whose content nearly duplicates a note.
+{Fore.GREEN}- query <expression>:{Style.RESET_ALL} Search contacts or notes, e.g. tag:#work AND created>2024-01-01.
+{Fore.GREEN}- explain <expression>:{Style.RESET_ALL} Show how a query would run, with estimated result sizes.
 {Fore.GREEN}- remove_tag <note title> <tag>:{Style.RESET_ALL} Removing exiting tag from note.
 {Fore.GREEN}- show_phone <name>:{Style.RESET_ALL} Get the phone number of a contact.
 {Fore.GREEN}- show_birthday: <name> :{Style.RESET_ALL} Show the birthday of a contact.
+{Fore.GREEN}- stats:{Style.RESET_ALL} Show per-command latency (start with --stats).
+{Fore.GREEN}- memory:{Style.RESET_ALL} Show memory used per subsystem and per item.
+{Fore.GREEN}- use <book>:{Style.RESET_ALL} Switch to another named address book (created if new).
 """
 
 COMMAND_NAMES = {
@@ -45,20 +56,67 @@ COMMAND_NAMES = {
     "all_contacts": "all_contacts",
     "all_notes": "all_notes",
     "birthdays": "birthdays",
+    "born_between": "born_between",
+    "age_range": "age_range",
     "change_phone": "change_phone",
     "change_address": "change_address",
     "change_email": "change_email",
     "delete_contact": "delete_contact",
     "delete_note": "delete_note",
     "edit_note": "edit_note",
+    "merge_duplicates": "merge_duplicates",
     "exit": "exit",
     "find_contact_by_name": "find_contact_by_name",
     "find_note_by_title": "find_note_by_title",
     "find_notes": "find_notes",
     "find_notes_by_tag": "find_notes_by_tag",
+    "similar_notes": "similar_notes",
+    "use": "use",
+    "notes_between": "notes_between",
+    "recent_notes": "recent_notes",
+    "query": "query",
+    "explain": "explain",
     "help": "help",
     "remove_tag": "remove_tag",
     "show_phone": "phone",
     "show_birthday": "show_birthday",
+    "stats": "stats",
+    "memory": "memory",
 }
 FILE_NAME = "address_book.pkl"
+SHARDED_FILE_NAME = "address_book.d"  # directory of a sharded book
+STORE_FILE_NAME = "address_book.db"  # SQLite store of a book with a bounded working set
+WORKING_SET_SIZE = 10_000  # records and notes kept in memory by a disk store, each
+DEFAULT_BOOK = "default"  # the book stored in the files above
+BOOKS_DIRECTORY = "books"  # other named books: books/<name>.pkl, .d or .db
+BOOK_MEMORY_BUDGET = 512  # MB of loaded books kept in memory by one session
+SHARD_COUNT = 16  # contact shards and note shards of a new sharded book
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
+MUTATING_COMMANDS = {
+    "add_address",
+    "add_birthday",
+    "add_contact",
+    "add_email",
+    "add_note",
+    "add_phone",
+    "add_tag",
+    "change_phone",
+    "change_address",
+    "change_email",
+    "delete_contact",
+    "delete_note",
+    "edit_note",
+    "merge_duplicates",
+    "remove_tag",
+}
+AUTOSAVE_MUTATIONS = 10  # save after this many changing commands
+AUTOSAVE_INTERVAL = 30  # or this many seconds after the first unsaved change
+BIRTHDAY_REMINDER_DAYS = 1  # remind about birthdays today and tomorrow
+DUPLICATES_SHOWN = 50  # merge proposals listed by merge_duplicates
+NOTES_PAGE_SIZE = 20  # notes shown before asking whether to show more
+BIRTHDAY_CALENDAR_DAYS = 366  # days ahead covered by the birthday calendar
+REMINDER_CHECK_INTERVAL = 60  # seconds between day rollover checks
+PARALLEL_SEARCH_MIN_NOTES = 50_000  # smaller books are scanned faster in-process
+STARTUP_BUDGET = 0.25  # seconds from interpreter start to the first prompt
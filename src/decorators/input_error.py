@@ -1,4 +1,5 @@
 from colorama import Fore
+from helpers.stats import stats
 from models.tag import TagDuplicateError, TagNotFound, TagValidationError
 
 
@@ -10,7 +11,7 @@ def input_error(command_name):
         command_name (str): The name of the command to provide specific error messages.
 
     Returns:
-        function: The decorated function with error handling.
+        function: The decorated coroutine function with error handling.
 
     The decorator catches the following exceptions and provides appropriate error messages:
         - TagValidationError: Raised when a tag contains invalid characters.
@@ -19,21 +20,27 @@ def input_error(command_name):
         - ValueError: Raised for various value errors, with specific messages based on the command.
         - IndexError: Raised when not enough arguments are provided to a command.
         - KeyError: Raised when a specified contact is not found.
+
+    Every handled error is also counted in the command latency stats when instrumentation is enabled.
     """
 
     def decorator(func):
-        def inner(*args, **kwargs):
+        async def inner(*args, **kwargs):
             try:
-                return func(*args, **kwargs)
+                return await func(*args, **kwargs)
             except TagValidationError:
+                stats.record_error(command_name)
                 return (
                     '\nTag can only include latin chars, numbers and underscore ("_")\n'
                 )
             except TagDuplicateError:
+                stats.record_error(command_name)
                 return "\nThis note already include entered tag.\n"
             except TagNotFound:
+                stats.record_error(command_name)
                 return "\nEntered tag not found.\n"
             except ValueError as e:
+                stats.record_error(command_name)
                 if len(e.__str__()):
                     print(f"\n{Fore.RED}Error: '{e}'\n")
                 match command_name:
@@ -61,6 +68,26 @@ def input_error(command_name):
                         print(
                             f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Enter user {Fore.CYAN}lookup days{Fore.RED}.\n"
                         )
+                    case "query" | "explain":
+                        print(
+                            f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Enter a {Fore.CYAN}query{Fore.RED} such as tag:#work AND created>2024-01-01.\n"
+                        )
+                    case "notes_between":
+                        print(
+                            f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Enter start and end {Fore.CYAN}dates{Fore.RED} as DD.MM.YYYY.\n"
+                        )
+                    case "recent_notes":
+                        print(
+                            f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Enter the {Fore.CYAN}number{Fore.RED} of notes.\n"
+                        )
+                    case "born_between":
+                        print(
+                            f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Enter two {Fore.CYAN}dates{Fore.RED} as DD.MM.YYYY.\n"
+                        )
+                    case "age_range":
+                        print(
+                            f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Enter {Fore.CYAN}minimum{Fore.RED} and {Fore.CYAN}maximum age{Fore.RED}.\n"
+                        )
                     case "add_phone":
                         print(
                             f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Enter contact {Fore.CYAN}name{Fore.RED} and {Fore.CYAN}phone{Fore.RED}.\n"
@@ -77,6 +104,14 @@ def input_error(command_name):
                         print(f"\n{Fore.RED}Error: '{e}'\n")
                     case "edit_note":
                         print(f"\n{Fore.RED}Error: '{e}'\n")
+                    case "use":
+                        print(
+                            f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Enter a book {Fore.CYAN}name{Fore.RED} of letters, digits, - and _.\n"
+                        )
+                    case "similar_notes":
+                        print(
+                            f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Enter note {Fore.CYAN}title{Fore.RED}.\n"
+                        )
                     case "delete_note":
                         print(
                             f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Enter note {Fore.CYAN}title{Fore.RED} to delete\n"
@@ -90,10 +125,12 @@ def input_error(command_name):
                             f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Invalid input.\n"
                         )
             except IndexError:
+                stats.record_error(command_name)
                 print(
                     f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Not enough arguments provided.\n"
                 )
             except KeyError:
+                stats.record_error(command_name)
                 print(
                     f"\n{Fore.RED}Error in {Fore.CYAN}{command_name}{Fore.RED} command: Contact {args[0]} not found.\n"
                 )
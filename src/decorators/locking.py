@@ -0,0 +1,51 @@
+from functools import wraps
+
+
+def read_locked(method):
+    """
+    Run a model method under the read side of the owner's `lock`.
+
+    Models carry `lock = None` unless their address book runs in concurrent mode,
+    in which case the book shares one RWLock with all its records and notes. Without
+    a lock the method is called directly.
+    """
+
+    @wraps(method)
+    def inner(self, *args, **kwargs):
+        lock = self.lock
+        if lock is None:
+            return method(self, *args, **kwargs)
+        lock.acquire_read()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_read()
+
+    return inner
+
+
+def write_locked(method):
+    """
+    Run a model method under the write side of the owner's `lock` and report the change.
+
+    See read_locked. After the method returns, records and notes that belong to an
+    address book (`self.book`) tell it through `book.mark_changed(self)`, so the book
+    knows which entries were modified since the last save.
+    """
+
+    @wraps(method)
+    def inner(self, *args, **kwargs):
+        lock = self.lock
+        if lock is not None:
+            lock.acquire_write()
+        try:
+            result = method(self, *args, **kwargs)
+            book = getattr(self, "book", None)
+            if book is not None:
+                book.mark_changed(self)
+            return result
+        finally:
+            if lock is not None:
+                lock.release_write()
+
+    return inner
@@ -0,0 +1,79 @@
+import argparse
+import contextlib
+import io
+import random
+
+from models.email import Email
+from models.phone import Phone
+from models.record import Record
+from storage_benchmark import generate_book, timed
+
+
+def add_duplicates(book, count: int, seed: int = 1) -> dict:
+    """
+    Add `count` altered copies of random contacts and return copy name -> original name.
+
+    A copy shares the original's phone (with the country code), its email (in upper
+    case) or its name (words reordered and re-cased), and has nothing else in common.
+    """
+
+    rng = random.Random(seed)
+    originals = rng.sample(list(book.data), count)
+    copies = {}
+    for i, name in enumerate(originals):
+        original = book.data[name]
+        kind = rng.choice(("phone", "email", "name"))
+        if kind == "email" and original.email is None:
+            kind = "phone"
+        if kind == "name":
+            copy = Record(" ".join(reversed(name.upper().split())))
+        else:
+            copy = Record(f"Copy {i}")
+        if kind == "phone":
+            copy.phones.append(_new_field(Phone, "+38" + original.phones[0].value))
+        else:
+            copy.phones.append(Phone(str(rng.randrange(10**9, 10**10))))
+        if kind == "email":
+            copy.email = _new_field(Email, original.email.value.upper())
+        book.data[copy.name.value] = copy
+        copies[copy.name.value] = name
+    return copies
+
+
+def _new_field(cls, value):
+    field = object.__new__(cls)  # bypass validation, as a contact imported as is would
+    field.value = value
+    return field
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time duplicate-contact detection and merging on a synthetic book"
+    )
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--duplicates", type=int, default=10_000)
+    args = parser.parse_args()
+
+    book = generate_book(args.contacts, 0)
+    copies = add_duplicates(book, args.duplicates)
+    print(f"{len(book.data)} contacts, {len(copies)} injected duplicates")
+
+    find, (proposals, skipped) = timed(book.find_duplicates)
+    grouped = {
+        name: proposal.keep
+        for proposal in proposals
+        for name in (proposal.keep, *proposal.duplicates)
+    }
+    found = sum(
+        grouped.get(copy) is not None and grouped.get(copy) == grouped.get(original)
+        for copy, original in copies.items()
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        merge, merged = timed(book.merge_duplicates, proposals)
+    print(f"find_duplicates  {find:8.2f} s  {len(proposals)} proposals, {skipped} blocks skipped")
+    print(f"merge_duplicates {merge:8.2f} s  {merged} contacts merged")
+    print(f"recall {found / len(copies):.1%} ({found} of {len(copies)} injected duplicates)")
+
+
+if __name__ == "__main__":
+    main()
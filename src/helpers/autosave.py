@@ -0,0 +1,105 @@
+import asyncio
+from time import monotonic
+
+from constants.constants import AUTOSAVE_INTERVAL, AUTOSAVE_MUTATIONS, FILE_NAME
+from helpers.data import snapshot_data, write_snapshot
+from helpers.file_lock import FileLock
+
+
+class AutoSaver:
+    """
+    Debounced background saver for an address book.
+
+    The REPL holds `lock` while a command runs and calls `notify()` after every
+    command that changes the book. A background task saves once `mutations` changes
+    are pending, or `interval` seconds after the first unsaved change.
+
+    The snapshot is taken under the same lock, so it always reflects the book
+    between two commands and never a half-applied one. Pickling and the atomic
+    write (temporary file and rename) run in worker threads, so the event loop,
+    and with it the prompt, keeps running while the book is saved. The file lock
+    is held for the whole save, the book lock only until the snapshot is taken.
+
+    Attributes:
+        book (AddressBook): The book to save.
+        filename (str): Target file.
+        lock (asyncio.Lock): Held by the dispatcher while a command runs.
+        pending (int): Changes made since the last snapshot.
+        saves (int): Number of completed background saves.
+    """
+
+    def __init__(
+        self,
+        book,
+        filename=FILE_NAME,
+        mutations=AUTOSAVE_MUTATIONS,
+        interval=AUTOSAVE_INTERVAL,
+    ):
+        self.book = book
+        self.filename = filename
+        self.mutations = mutations
+        self.interval = interval
+        self.lock = asyncio.Lock()
+        self.pending = 0
+        self.saves = 0
+        self._first_change = None
+        self._wake = asyncio.Event()
+        self._stopped = False
+        self._task = None
+
+    def start(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="autosave")
+        return self
+
+    def notify(self):
+        """Count one change to the book and wake the saver if the threshold is reached."""
+
+        self.pending += 1
+        if self._first_change is None:
+            self._first_change = monotonic()
+        if self.pending >= self.mutations:
+            self._wake.set()
+
+    def _due(self) -> bool:
+        if not self.pending:
+            return False
+        return (
+            self.pending >= self.mutations
+            or monotonic() - self._first_change >= self.interval
+        )
+
+    async def _run(self):
+        while not self._stopped:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self._stopped and self._due():
+                await self.save()
+
+    async def save(self):
+        """Serialize a consistent snapshot of the book and write it atomically."""
+
+        file_lock = FileLock(self.filename)
+        await asyncio.to_thread(file_lock.acquire)
+        try:
+            async with self.lock:
+                files = await asyncio.to_thread(
+                    snapshot_data, self.book, self.filename
+                )
+                self.pending = 0
+                self._first_change = None
+            await asyncio.to_thread(write_snapshot, files)
+        finally:
+            file_lock.release()
+        self.saves += 1
+
+    async def stop(self):
+        """Stop the background task, waiting for a save in progress to finish."""
+
+        self._stopped = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
@@ -0,0 +1,36 @@
+from datetime import date
+
+from helpers.sorted_index import SortedIndex
+
+
+class BirthDateIndex(SortedIndex):
+    """
+    Contacts sorted by full birth date (date ordinals).
+
+    A range of birth dates is two bisections and a slice, where
+    BirthdayColumns.born_between compares every row. See SortedIndex.
+    """
+
+    typecode = "i"
+
+    def _items(self, book) -> dict:
+        return book.data
+
+    def key(self, record) -> int | None:
+        if record.birthday is None:
+            return None
+        return record.birthday.value.toordinal()
+
+    def changed(self, book, record):
+        """Move one added, changed or deleted contact to its place in the index."""
+
+        self.update(book, record.name.value, record)
+
+    def born_between(self, start: date, end: date) -> list[str]:
+        """
+        Return the names of contacts born from start to end, both included, by birth date.
+
+        Call build() first.
+        """
+
+        return self.between(start.toordinal(), end.toordinal())
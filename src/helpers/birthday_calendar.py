@@ -0,0 +1,141 @@
+import threading
+from datetime import date, timedelta
+
+from constants.constants import BIRTHDAY_CALENDAR_DAYS
+
+DATE_FORMAT = "%d.%m.%Y"
+WEEKEND_DAYS = [5, 6]  # Saturday and Sunday
+
+
+def next_birthday(birth: date, today: date) -> date:
+    """
+    Return the next occurrence of a birthday, today included.
+
+    A 29 February birthday falls on 1 March in years that are not leap years.
+    """
+
+    for year in (today.year, today.year + 1):
+        try:
+            occurrence = birth.replace(year=year)
+        except ValueError:  # 29 February
+            occurrence = date(year, 3, 1)
+        if occurrence >= today:
+            return occurrence
+    raise AssertionError("unreachable")
+
+
+def congratulation_date(occurrence: date) -> date:
+    """Move a birthday that falls on a weekend to the following Monday."""
+
+    if occurrence.weekday() in WEEKEND_DAYS:
+        return occurrence + timedelta(days=7 - occurrence.weekday())
+    return occurrence
+
+
+class BirthdayCalendar:
+    """
+    Materialized calendar of upcoming birthdays.
+
+    For every day from today to `horizon` days ahead, the calendar holds the names
+    of the contacts whose birthday falls on that day, together with the date to
+    congratulate them on (moved from weekends to Monday). A query for the next
+    `days` days is a slice of it.
+
+    The calendar is built on the first query of a day, from the book's
+    BirthdayColumns, and rebuilt when the date changes. Between rebuilds it is
+    patched for every changed contact (see AddressBook.mark_changed), so adding a
+    birthday or deleting a contact costs one entry, not a rebuild.
+    """
+
+    def __init__(self, horizon=BIRTHDAY_CALENDAR_DAYS):
+        self.horizon = horizon
+        self.today = None
+        self.slots = []  # day offset -> names
+        self.offsets = {}  # name -> day offset
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_lock")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def invalidate(self):
+        self.today = None
+
+    def _offset(self, record) -> int | None:
+        if record.birthday is None:
+            return None
+        offset = (next_birthday(record.birthday.value.date(), self.today) - self.today).days
+        return offset if offset <= self.horizon else None
+
+    def _build(self, book, today: date):
+        columns = book.birthday_columns
+        columns.build(book)
+        self.today = today
+        self.slots = [[] for _ in range(self.horizon + 1)]
+        self.offsets = {}
+        for offset, name in columns.upcoming(today, self.horizon):
+            self.slots[offset].append(name)
+            self.offsets[name] = offset
+
+    def changed(self, book, record):
+        """
+        Patch the calendar for one added, changed or deleted contact.
+
+        Args:
+            book (AddressBook): The book the contact belongs (or belonged) to.
+            record (Record): The contact.
+        """
+
+        if self.today is None:
+            return
+        name = record.name.value
+        offset = self.offsets.pop(name, None)
+        if offset is not None:
+            self.slots[offset].remove(name)
+        if book.data.get(name) is record:
+            offset = self._offset(record)
+            if offset is not None:
+                self.slots[offset].append(name)
+                self.offsets[name] = offset
+
+    def _ensure(self, book, today: date):
+        with self._lock:
+            if self.today != today:
+                self._build(book, today)
+
+    def names(self, book, days: int, today: date) -> list[str]:
+        """Return the names of the contacts with a birthday in the next `days` days."""
+
+        if days < 0:  # a negative slice would count from the end of the calendar
+            return []
+        self._ensure(book, today)
+        return [name for names in self.slots[: days + 1] for name in names]
+
+    def upcoming(self, book, days: int, today: date) -> list:
+        """
+        Return the birthdays of the next `days` days in the format of
+        AddressBook.get_upcoming_birthdays, ordered by date.
+        """
+
+        if days < 0:
+            return []
+        self._ensure(book, today)
+        upcoming = []
+        for offset, names in enumerate(self.slots[: days + 1]):
+            if names:
+                congratulate = congratulation_date(
+                    today + timedelta(days=offset)
+                ).strftime(DATE_FORMAT)
+                upcoming.extend(
+                    {"name": name, "next_upcoming_birthday": congratulate}
+                    for name in names
+                )
+        return upcoming
@@ -0,0 +1,204 @@
+import threading
+from array import array
+from datetime import date, timedelta
+from itertools import compress, repeat
+from operator import and_, ge, le
+
+from helpers.birthday_calendar import next_birthday
+
+FREE = 0  # key and date of an unused row
+NEVER = 0xFFFF  # offset of keys that are not a day of the year
+
+
+_numpy_module = False  # not looked up yet
+
+
+def _numpy():
+    """Return NumPy if it is installed; it is optional and imported on first use."""
+
+    global _numpy_module
+    if _numpy_module is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy_module = numpy
+    return _numpy_module
+
+
+def _view(np, column: array):
+    return np.frombuffer(column, dtype=f"u{column.itemsize}")
+
+
+def day_key(birth: date) -> int:
+    return birth.month << 5 | birth.day
+
+
+def date_key(birth: date) -> int:
+    return birth.year << 9 | birth.month << 5 | birth.day
+
+
+def offset_table(today: date) -> array:
+    """
+    Days from today to the next occurrence of every month/day key.
+
+    Indexed by day_key(); keys that are no day of the year (including FREE) map to
+    NEVER. Building it costs 366 date computations, after which the offset of any
+    number of birthdays is one lookup each.
+    """
+
+    table = array("H", [NEVER]) * (12 << 5 | 32)
+    day = date(2000, 1, 1)  # a leap year, so 29 February gets a key
+    while day.year == 2000:
+        table[day_key(day)] = (next_birthday(day, today) - today).days
+        day += timedelta(days=1)
+    return table
+
+
+def years_before(today: date, years: int) -> date:
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:  # 29 February
+        return today.replace(year=today.year - years, day=28)
+
+
+def age_bounds(today: date, min_age: int, max_age: int) -> tuple[date, date]:
+    """Return the first and last birth date of people aged min_age to max_age today."""
+
+    return (
+        years_before(today, max_age + 1) + timedelta(days=1),
+        years_before(today, min_age),
+    )
+
+
+class BirthdayColumns:
+    """
+    Packed columnar view of the birthdays of an address book.
+
+    Every contact with a birthday has a row: `keys` holds month << 5 | day and
+    `dates` holds year << 9 | month << 5 | day, both in `array` columns, and
+    `names` the contact name. Rows of deleted contacts are reused.
+
+    Queries are whole-column operations. The offset of every birthday from today
+    is a lookup in a 416-entry table (offset_table) and date ranges are two
+    comparisons per row. With NumPy installed they run as NumPy array expressions
+    over zero-copy views of the columns, otherwise as chains of C-level iterators
+    (map, itertools.compress) without a Python-level loop per record.
+
+    Like the birthday calendar, the columns are built on first use, patched by
+    AddressBook.mark_changed and rebuilt after a merge.
+    """
+
+    def __init__(self):
+        self.built = False
+        self._reset()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_lock")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self.names = []
+        self.keys = array("H")
+        self.dates = array("I")
+        self.rows = {}  # name -> row
+        self.free = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def invalidate(self):
+        self.built = False
+
+    def _set(self, name: str, birth: date):
+        row = self.rows.get(name)
+        if row is None:
+            if self.free:
+                row = self.free.pop()
+                self.names[row] = name
+            else:
+                row = len(self.names)
+                self.names.append(name)
+                self.keys.append(FREE)
+                self.dates.append(FREE)
+            self.rows[name] = row
+        self.keys[row] = day_key(birth)
+        self.dates[row] = date_key(birth)
+
+    def _clear(self, name: str):
+        row = self.rows.pop(name, None)
+        if row is not None:
+            self.names[row] = None
+            self.keys[row] = FREE
+            self.dates[row] = FREE
+            self.free.append(row)
+
+    def build(self, book):
+        """Fill the columns from the book unless they are up to date."""
+
+        with self._lock:
+            if self.built:
+                return
+            self._reset()
+            births = [
+                (name, record.birthday.value)
+                for name, record in book.data.items()
+                if record.birthday is not None
+            ]
+            self.names = [name for name, _ in births]
+            self.keys = array("H", [day_key(birth) for _, birth in births])
+            self.dates = array("I", [date_key(birth) for _, birth in births])
+            self.rows = dict(zip(self.names, range(len(self.names))))
+            self.built = True
+
+    def changed(self, book, record):
+        """Patch the row of one added, changed or deleted contact."""
+
+        if not self.built:
+            return
+        name = record.name.value
+        if book.data.get(name) is record and record.birthday is not None:
+            self._set(name, record.birthday.value.date())
+        else:
+            self._clear(name)
+
+    def upcoming(self, today: date, days: int) -> list[tuple[int, str]]:
+        """
+        Return (days from today, name) for every birthday in the next `days` days.
+
+        Call build() first.
+        """
+
+        table = offset_table(today)
+        np = _numpy()
+        if np is not None:
+            offsets = _view(np, table)[_view(np, self.keys)]
+            rows = np.flatnonzero(offsets <= days)
+            names = self.names
+            return [(int(offsets[row]), names[row]) for row in rows.tolist()]
+        offsets = list(map(table.__getitem__, self.keys))
+        rows = compress(range(len(offsets)), map(ge, repeat(days), offsets))
+        return [(offsets[row], self.names[row]) for row in rows]
+
+    def born_between(self, start: date, end: date) -> list[str]:
+        """Return the names of contacts born from start to end, both included (call build() first)."""
+
+        low, high = date_key(start), date_key(end)
+        np = _numpy()
+        if np is not None:
+            dates = _view(np, self.dates)
+            rows = np.flatnonzero((dates >= low) & (dates <= high))
+            return [self.names[row] for row in rows.tolist()]
+        dates = self.dates
+        return list(
+            compress(
+                self.names,
+                map(and_, map(le, repeat(low), dates), map(ge, repeat(high), dates)),
+            )
+        )
@@ -0,0 +1,76 @@
+import math
+import struct
+from hashlib import blake2b
+
+ERROR_RATE = 0.01  # false-positive rate of a filter holding its capacity
+MIN_CAPACITY = 1024
+HEADER = struct.Struct("<QQBQ")  # bits, capacity, hashes, items
+MASK = (1 << 64) - 1
+
+
+class BloomFilter:
+    """
+    A set of strings that answers "definitely not in it" or "maybe in it".
+
+    `bits` bits are set by `hashes` positions per item, derived from one blake2b
+    digest (double hashing), so filters saved by one process are valid in another.
+    Sized for `capacity` items at ERROR_RATE false positives; items cannot be
+    removed, so deletions and growth past the capacity raise the rate until the
+    filter is rebuilt.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = ERROR_RATE):
+        self.capacity = max(capacity, MIN_CAPACITY)
+        bits = -self.capacity * math.log(error_rate) / math.log(2) ** 2
+        self.bits = math.ceil(bits / 8) * 8
+        self.hashes = max(round(self.bits / self.capacity * math.log(2)), 1)
+        self.items = 0  # additions that set a bit, so repeated items count once
+        self.array = bytearray(self.bits // 8)
+
+    @staticmethod
+    def _hash(item: str) -> tuple[int, int]:
+        digest = int.from_bytes(
+            blake2b(item.encode("utf-8", "surrogatepass"), digest_size=16).digest(), "little"
+        )
+        return digest & MASK, (digest >> 64) | 1
+
+    def add(self, item: str):
+        first, second = self._hash(item)
+        array, bits = self.array, self.bits
+        new = False
+        for i in range(self.hashes):
+            position = (first + i * second) % bits
+            mask = 1 << (position & 7)
+            if not array[position >> 3] & mask:
+                array[position >> 3] |= mask
+                new = True
+        self.items += new
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        first, second = self._hash(item)
+        array, bits = self.array, self.bits
+        for i in range(self.hashes):  # most missing items stop at the first clear bit
+            position = (first + i * second) % bits
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def false_positive_rate(self) -> float:
+        """Estimate the current false-positive rate from the share of bits set."""
+
+        filled = int.from_bytes(self.array, "little").bit_count() / self.bits
+        return filled**self.hashes
+
+    def to_bytes(self) -> bytes:
+        return HEADER.pack(self.bits, self.capacity, self.hashes, self.items) + self.array
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "BloomFilter":
+        bloom = cls.__new__(cls)
+        bloom.bits, bloom.capacity, bloom.hashes, bloom.items = HEADER.unpack_from(payload)
+        bloom.array = bytearray(payload[HEADER.size :])
+        return bloom
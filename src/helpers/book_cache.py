@@ -0,0 +1,83 @@
+from collections import OrderedDict
+
+CONTACT_BYTES = 1_000  # memory of a loaded contact, as measured by the memory command
+NOTE_BYTES = 900  # and of a note with a typical body
+
+
+def estimate_size(book) -> int:
+    """
+    Estimate the memory a loaded book takes from its number of contacts and notes.
+
+    A book in a disk store (see helpers.disk_store) only counts the entries it keeps
+    in memory.
+    """
+
+    contacts, notes = book.data, book.notes
+    if book.store is not None:
+        contacts, notes = contacts.cache, notes.cache
+    return len(contacts) * CONTACT_BYTES + len(notes) * NOTE_BYTES
+
+
+class OpenBook:
+    """A loaded book with the path it is saved to and whatever runs alongside it (its autosaver)."""
+
+    def __init__(self, name: str, book, filename: str, autosaver=None):
+        self.name = name
+        self.book = book
+        self.filename = filename
+        self.autosaver = autosaver
+
+    @property
+    def size(self) -> int:
+        return estimate_size(self.book)
+
+
+class BookCache:
+    """
+    Named address books kept loaded within a memory budget, least recently used first out.
+
+    get() returns a loaded book without touching the disk, or loads it with
+    `load(name) -> OpenBook`. When the estimated size of the loaded books (see
+    estimate_size) exceeds `budget` bytes, the least recently used books are
+    evicted, but never the one just requested. Evicted books are returned to the
+    caller, which saves and closes them; the cache does no I/O of its own.
+    """
+
+    def __init__(self, load, budget: int):
+        self.load = load
+        self.budget = budget
+        self.books = OrderedDict()  # name -> OpenBook, least recently used first
+        self.hits = self.misses = 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.books
+
+    def __iter__(self):
+        return iter(list(self.books.values()))
+
+    def get(self, name: str) -> tuple[OpenBook, list[OpenBook]]:
+        """
+        Return the book `name`, loading it if needed, and the books evicted to make room.
+
+        Returns:
+            tuple[OpenBook, list[OpenBook]]: The book and the evicted books, to be saved.
+        """
+
+        entry = self.books.get(name)
+        if entry is not None:
+            self.hits += 1
+            self.books.move_to_end(name)
+            return entry, []
+        self.misses += 1
+        entry = self.books[name] = self.load(name)
+        return entry, self._evict()
+
+    def _evict(self) -> list[OpenBook]:
+        evicted = []
+        sizes = {name: entry.size for name, entry in self.books.items()}
+        total = sum(sizes.values())
+        while total > self.budget and len(self.books) > 1:
+            name, entry = self.books.popitem(last=False)
+            total -= sizes[name]
+            evicted.append(entry)
+        return evicted
@@ -1,27 +1,295 @@
+import os
 import pickle
-from constants.constants import FILE_NAME
+import re
+import struct
+import tempfile
+from constants.constants import (
+    BOOKS_DIRECTORY,
+    DEFAULT_BOOK,
+    FILE_NAME,
+    SHARDED_FILE_NAME,
+    STORE_FILE_NAME,
+    WORKING_SET_SIZE,
+)
+from helpers.file_lock import FileLock
+from helpers.index_snapshot import dumps_indexes, index_file, load_indexes
+from helpers.serializer import (
+    ENVELOPE,
+    LENGTH,
+    codec_of,
+    dumps_bodies,
+    dumps_contacts,
+    dumps_notes,
+    gc_paused,
+    loads_bodies,
+    loads_contacts,
+    loads_notes,
+)
+from helpers.shards import BodySegment, read_manifest, read_shards, snapshot_shards
 from models.address_book import AddressBook
 
+UMASK = os.umask(0)
+os.umask(UMASK)
 
-def save_data(book, filename=FILE_NAME):
+BOOK_NAME = re.compile(r"[\w-]+")
+MAGIC = b"ABK3"
+INLINE_MAGIC = b"ABK2"  # files with the note bodies inside the notes segment
+PICKLE_MAGIC = b"ABK1"  # files pickled by earlier versions
+HEADER = struct.Struct(">4sQ")  # magic, save generation
+
+
+def write_atomic(filename, payload: bytes):
+    """
+    Write bytes to a file so that readers see either the old or the new content.
+
+    The payload is written to a temporary file in the same directory, flushed to disk
+    and then renamed over the target, which is atomic on POSIX and Windows.
+
+    Args:
+        filename (str): The file to replace.
+        payload (bytes): The new content of the file.
+
+    Returns:
+        None
+    """
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_name = tempfile.mkstemp(
+        prefix=f".{os.path.basename(filename)}.", suffix=".tmp", dir=directory
+    )
+    try:
+        os.chmod(tmp_name, 0o666 & ~UMASK)
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, filename)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def read_generation(filename) -> int | None:
+    """
+    Read the save generation from the header of a data file without loading it.
+
+    Args:
+        filename (str): The data file.
+
+    Returns:
+        int | None: The generation, 0 for files written before generations existed,
+            or None if the file does not exist.
+    """
+
+    try:
+        with open(filename, "rb") as f:
+            magic, generation = HEADER.unpack(f.read(HEADER.size).ljust(HEADER.size))
+    except FileNotFoundError:
+        return None
+    return generation if magic in (MAGIC, INLINE_MAGIC, PICKLE_MAGIC) else 0
+
+
+def read_codec(filename) -> str:
+    """
+    Read the compression codec of a data file from its first bytes.
+
+    Args:
+        filename (str): The data file.
+
+    Returns:
+        str: The codec, "none" for uncompressed, missing or pickled files.
+    """
+
+    try:
+        with open(filename, "rb") as f:
+            prefix = f.read(HEADER.size + LENGTH.size + ENVELOPE.size)
+    except FileNotFoundError:
+        return "none"
+    if prefix[: len(MAGIC)] not in (MAGIC, INLINE_MAGIC):
+        return "none"
+    return codec_of(prefix[HEADER.size + LENGTH.size :])
+
+
+def _segments(payload: bytes) -> tuple[memoryview, memoryview, memoryview | None]:
+    """
+    Split a data file after its header into contacts, notes and bodies segments.
+
+    Files written before bodies were split off have no bodies segment (None).
+    """
+
+    magic, _ = HEADER.unpack_from(payload, 0)
+    view = memoryview(payload)[HEADER.size :]
+    (size,) = LENGTH.unpack_from(view, 0)
+    contacts = view[LENGTH.size : LENGTH.size + size]
+    view = view[LENGTH.size + size :]
+    if magic == INLINE_MAGIC:
+        return contacts, view, None
+    (size,) = LENGTH.unpack_from(view, 0)
+    return contacts, view[LENGTH.size : LENGTH.size + size], view[LENGTH.size + size :]
+
+
+class DataFileBodies(BodySegment):
+    """
+    The note bodies of a data file, read from its bodies segment on first use.
+
+    Like the bodies of a shard (see BodySegment), they come from the file as last
+    saved, which may be newer than the notes if another session saved since.
+    """
+
+    def _read(self) -> dict:
+        try:
+            # no FileLock: saves read bodies while holding it, and the file is replaced atomically
+            with open(self.path, "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return {}
+        magic, _ = HEADER.unpack(payload[: HEADER.size].ljust(HEADER.size))
+        if magic != MAGIC:  # replaced by a file without a bodies segment
+            return {}
+        return loads_bodies(_segments(payload)[2])
+
+
+def _read_book(filename) -> AddressBook:
+    """
+    Read a data file: contacts, notes and note bodies segments (see
+    helpers.serializer) after the header, or a pickled AddressBook written by
+    earlier versions, which is converted by the next save.
+
+    Note bodies are not decoded: each note reads them from the file the first time
+    its content is needed (see DataFileBodies and models.note.LazyBody).
+    """
+
+    with open(filename, "rb") as f:
+        payload = f.read()
+    magic, generation = HEADER.unpack(payload[: HEADER.size].ljust(HEADER.size))
+    with gc_paused():
+        if magic == PICKLE_MAGIC:
+            return pickle.loads(payload[HEADER.size :])
+        if magic not in (MAGIC, INLINE_MAGIC):
+            return pickle.loads(payload)
+        contacts, notes, bodies = _segments(payload)
+        data, contact_generations = loads_contacts(contacts)
+        notes, note_generations = loads_notes(notes)
+        if bodies is not None:
+            segment = DataFileBodies(filename)
+            for title, note in notes.items():
+                note.body_loader = (segment, title)
+    book = AddressBook()
+    book.__setstate__(
+        {
+            "data": data,
+            "notes": notes,
+            "generation": generation,
+            "contact_generations": contact_generations,
+            "note_generations": note_generations,
+        }
+    )
+    return book
+
+
+def snapshot_data(
+    book, filename=FILE_NAME, shards=None, codec=None
+) -> list[tuple[str, bytes]]:
+    """
+    Serialize the book as the next generation of a data file or sharded book.
+
+    Must be called while holding the exclusive FileLock of the file. If another
+    process saved since this book was loaded (the generation in the file header
+    differs), its changes are merged into the book first, so they are not lost.
+    Only the fixed-size header is read when nobody else has saved.
+
+    A directory is saved as a sharded book (see helpers.shards), which only
+    rewrites the shards holding changed entries. A book attached to a disk store
+    (see helpers.disk_store) is saved by flushing the store; there is nothing
+    else to write.
+
+    The secondary indexes the book has built are saved next to it, stamped with
+    the new generation (see helpers.index_snapshot), so the next load does not
+    rebuild them.
+
+    Args:
+        book (AddressBook): The book to save.
+        filename (str, optional): The data file or directory. Defaults to FILE_NAME.
+        shards (int | None, optional): Shard count of a sharded book.
+        codec (str | None, optional): Compression codec (see helpers.serializer.compress).
+            Defaults to the codec the book is stored with.
+
+    Returns:
+        list: (path, payload) pairs, ready for write_snapshot.
     """
-    Save the given book data to a file using pickle.
+
+    if book.store is not None:
+        book.store.flush()
+        book.changed_contacts.clear()
+        book.changed_notes.clear()
+        return []
+    if shards or os.path.isdir(filename):
+        os.makedirs(filename, exist_ok=True)
+        files = snapshot_shards(book, filename, shards, codec)
+        return [*files, (index_file(filename), dumps_indexes(book))]
+    codec = codec or read_codec(filename)
+    stored = read_generation(filename)
+    if stored is not None and stored != book.generation:
+        book.merge(_read_book(filename))
+    generation = max(stored or 0, book.generation) + 1
+    book.stamp_changes(generation)
+    contacts = dumps_contacts(book.data, book.contact_generations, codec)
+    notes = dumps_notes(book.notes, book.note_generations, bodies=False, codec=codec)
+    bodies = dumps_bodies({title: note.value for title, note in book.notes.items()}, codec)
+    payload = b"".join(
+        (
+            HEADER.pack(MAGIC, generation),
+            LENGTH.pack(len(contacts)),
+            contacts,
+            LENGTH.pack(len(notes)),
+            notes,
+            bodies,
+        )
+    )
+    return [(filename, payload), (index_file(filename), dumps_indexes(book))]
+
+
+def write_snapshot(files: list[tuple[str, bytes]]):
+    """Write the files of a snapshot atomically, one after the other, removing those without payload."""
+
+    for path, payload in files:
+        if payload is None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        else:
+            write_atomic(path, payload)
+
+
+def save_data(book, filename=FILE_NAME, shards=None, codec=None):
+    """
+    Save the given book data to a file (see helpers.serializer).
+
+    The file is locked against other sessions for the duration of the save and
+    concurrent changes saved by them are merged in (see snapshot_data).
 
     Args:
         book (object): The book data to be saved.
         filename (str, optional): The name of the file where the data will be saved. Defaults to FILE_NAME.
+        shards (int | None, optional): Save as a sharded book with this many shards.
+        codec (str | None, optional): Compress with this codec from now on.
 
     Returns:
         None
     """
 
-    with open(filename, "wb") as f:
-        pickle.dump(book, f)
+    with FileLock(filename):
+        write_snapshot(snapshot_data(book, filename, shards, codec))
 
 
 def load_data(filename=FILE_NAME):
     """
-    Load data from a file using pickle.
+    Load data from a file (see helpers.serializer).
+
+    A directory is loaded as a sharded book, reading its shards in parallel.
+    Secondary indexes saved with the book are restored if they are up to date
+    (see helpers.index_snapshot).
 
     Args:
         filename (str): The name of the file to load data from. Defaults to FILE_NAME.
@@ -34,8 +302,113 @@ def load_data(filename=FILE_NAME):
     """
 
     try:
-        with open(filename, "rb") as f:
-            return pickle.load(f)
+        with FileLock(filename, exclusive=False):
+            if os.path.isdir(filename):
+                manifest = read_manifest(filename)
+                if manifest is None:
+                    return AddressBook()
+                with gc_paused():
+                    state = read_shards(filename, manifest)
+                book = AddressBook()
+                book.__setstate__(state)
+            else:
+                book = _read_book(filename)
+            load_indexes(book, filename)
+            return book
     except FileNotFoundError:
         return AddressBook()
-    
\ No newline at end of file
+
+
+def book_files(name=DEFAULT_BOOK) -> tuple[str, str, str]:
+    """
+    Return the single-file, sharded and disk-store paths of a named book.
+
+    The default book uses FILE_NAME, SHARDED_FILE_NAME and STORE_FILE_NAME; other
+    books live in BOOKS_DIRECTORY as <name>.pkl, <name>.d and <name>.db.
+
+    Raises:
+        ValueError: If the name is not letters, digits, "-" and "_".
+    """
+
+    if name == DEFAULT_BOOK:
+        return FILE_NAME, SHARDED_FILE_NAME, STORE_FILE_NAME
+    if not BOOK_NAME.fullmatch(name):
+        raise ValueError(f"Book names are letters, digits, - and _, not {name!r}")
+    base = os.path.join(BOOKS_DIRECTORY, name)
+    return f"{base}.pkl", f"{base}.d", f"{base}.db"
+
+
+def list_books() -> list[str]:
+    """Return the names of the default book and the books found in BOOKS_DIRECTORY."""
+
+    names = set()
+    try:
+        entries = os.listdir(BOOKS_DIRECTORY)
+    except FileNotFoundError:
+        entries = []
+    for entry in entries:
+        name, extension = os.path.splitext(entry)
+        if extension in (".pkl", ".d", ".db") and BOOK_NAME.fullmatch(name):
+            names.add(name)
+    return [DEFAULT_BOOK, *sorted(names - {DEFAULT_BOOK})]
+
+
+def load_book(
+    shards=None, codec=None, working_set=None, name=DEFAULT_BOOK
+) -> tuple[AddressBook, str]:
+    """
+    Load a book of the assistant from its file or, once it is sharded, its directory.
+
+    The paths of the book come from book_files(name); the default book is
+    FILE_NAME / SHARDED_FILE_NAME / STORE_FILE_NAME. A book that does not exist
+    yet is created empty.
+
+    With `shards` the book is stored sharded from now on: a single-file book is
+    converted on first use and an existing sharded book is re-partitioned if the
+    shard count differs. With `codec` the book is rewritten compressed with it.
+
+    With `working_set`, or once the store file exists, the book is opened from
+    that disk store (see helpers.disk_store) with at most `working_set` records and
+    notes in memory (WORKING_SET_SIZE by default); the existing book is copied into
+    it on first use. `shards` and `codec` do not apply to it.
+
+    Args:
+        shards (int | None): Shard count to store the book with.
+        codec (str | None): Compression codec to store the book with.
+        working_set (int | None): Records and notes a disk store keeps in memory.
+        name (str): The book to load.
+
+    Returns:
+        tuple[AddressBook, str]: The book and the path to save it to.
+
+    Raises:
+        ValueError: If the name is not a valid book name.
+    """
+
+    file_name, sharded_file_name, store_file_name = book_files(name)
+    if name != DEFAULT_BOOK:
+        os.makedirs(BOOKS_DIRECTORY, exist_ok=True)
+    if working_set or os.path.exists(store_file_name):
+        from helpers.disk_store import DiskStore
+
+        with FileLock(store_file_name):
+            new = not os.path.exists(store_file_name)
+            store = DiskStore(store_file_name, working_set or WORKING_SET_SIZE)
+            if new:
+                store.import_book(
+                    load_data(
+                        sharded_file_name
+                        if os.path.isdir(sharded_file_name)
+                        else file_name
+                    )
+                )
+        return store.attach(AddressBook()), store_file_name
+    if shards or os.path.isdir(sharded_file_name):
+        filename = sharded_file_name
+        book = load_data(filename if os.path.isdir(filename) else file_name)
+    else:
+        filename = file_name
+        book = load_data(filename)
+    if shards or codec:
+        save_data(book, filename, shards, codec)
+    return book, filename
@@ -0,0 +1,217 @@
+import re
+import string
+from collections import Counter
+from itertools import chain, compress, repeat
+
+from helpers.serializer import gc_paused
+
+MAX_BLOCK_SIZE = 50  # larger blocks (a shared office phone, a common name) are skipped
+NON_ALNUM = re.compile(r"[\W_]+")
+NON_ALNUM_LINES = re.compile(r"[^\w\n ]+|_+")  # spaces are collapsed by split()
+NON_DIGIT = re.compile(r"\D+")
+ASCII_PUNCTUATION = str.maketrans(dict.fromkeys(string.punctuation, " "))
+
+
+def normalize_phone(value: str) -> str:
+    """Digits only, the last 10 of them (drops country codes and formatting)."""
+
+    return NON_DIGIT.sub("", value)[-10:]
+
+
+def normalize_name(value: str) -> str:
+    """Case-folded words separated by single spaces, punctuation dropped."""
+
+    return " ".join(NON_ALNUM.sub(" ", value).casefold().split())
+
+
+def name_signature(value: str) -> str:
+    """The words of a normalized name in sorted order, so "Lee, Ann" matches "Ann Lee"."""
+
+    return " ".join(sorted(normalize_name(value).split()))
+
+
+def normalize_names(names: list[str]) -> list[str]:
+    """normalize_name for many names at once: one regex pass over all of them."""
+
+    blob = "\n".join(names).casefold()
+    if blob.isascii():  # translate has a fast path for ASCII, the regex has none
+        cleaned = blob.translate(ASCII_PUNCTUATION).split("\n")
+    else:
+        cleaned = NON_ALNUM_LINES.sub(" ", blob).split("\n")
+    if len(cleaned) != len(names):  # a name with a line break
+        return list(map(normalize_name, names))
+    return list(map(" ".join, map(str.split, cleaned)))
+
+
+def _collisions(keys: list, names: list) -> dict:
+    """Group names by key (keys[i] belongs to names[i]), keeping only keys shared by several names."""
+
+    shared = {key for key, count in Counter(keys).items() if count > 1 and key}
+    blocks = {}
+    for key, name in compress(zip(keys, names), map(shared.__contains__, keys)):
+        blocks.setdefault(key, []).append(name)
+    return blocks
+
+
+def blocks_of(records: dict) -> dict:
+    """
+    Return the blocks of several contacts: (kind, key) -> names.
+
+    The kinds are "phone" (every normalized phone), "email" (lowercased) and
+    "name" (name_signature, so equal normalized names share a block as well as
+    names with the words in another order).
+    Keys of only one contact are dropped. Keys are computed a column at a time and counted before
+    any block is built, so the cost is a few C-level passes over the book.
+    """
+
+    names = list(records)
+    values = list(records.values())
+    phone_counts = [len(record.phones) for record in values]
+    phones = [phone.value for record in values for phone in record.phones]
+    phones = [
+        value if len(value) == 10 and value.isdigit() else normalize_phone(value)
+        for value in phones
+    ]
+    phone_owners = list(chain.from_iterable(map(repeat, names, phone_counts)))
+    with_email = [record.email is not None for record in values]
+    emails = [
+        record.email.value.strip().lower() for record in compress(values, with_email)
+    ]
+    normalized = normalize_names(names)
+    signatures = list(map(" ".join, map(sorted, map(str.split, normalized))))
+    blocks = {}
+    for kind, keys, owners in (
+        ("phone", phones, phone_owners),
+        ("email", emails, list(compress(names, with_email))),
+        ("name", signatures, names),
+    ):
+        for key, members in _collisions(keys, owners).items():
+            blocks[kind, key] = members
+    return blocks
+
+
+def conflicting(first, second) -> bool:
+    """Tell two contacts apart by a field both have and that differs (birthday)."""
+
+    return (
+        first.birthday is not None
+        and second.birthday is not None
+        and first.birthday.value != second.birthday.value
+    )
+
+
+def compatible(kind: str, first, second) -> bool:
+    """
+    Decide whether two contacts of one block are the same person.
+
+    Sharing a phone or an email is enough unless their birthdays differ. Contacts
+    that only share a name must also not have different emails, unless they share
+    a phone.
+    """
+
+    if conflicting(first, second):
+        return False
+    if kind in ("phone", "email"):
+        return True
+    if first.email is not None and second.email is not None:
+        if first.email.value.lower() != second.email.value.lower():
+            phones = {normalize_phone(phone.value) for phone in first.phones}
+            return any(normalize_phone(phone.value) in phones for phone in second.phones)
+    return True
+
+
+def _birthday(record):
+    return record.birthday.value if record.birthday is not None else None
+
+
+class MergeProposal:
+    """Contacts found to be one person: `keep` absorbs `duplicates`."""
+
+    def __init__(self, keep: str, duplicates: list[str], reasons: set[str]):
+        self.keep = keep
+        self.duplicates = duplicates
+        self.reasons = reasons  # kinds of the blocking keys that matched
+
+
+def _keep_first(record) -> tuple:
+    """Sort key putting the contact with the most filled-in fields first."""
+
+    filled = (
+        len(record.phones)
+        + (record.email is not None)
+        + (record.address is not None)
+        + (record.birthday is not None)
+    )
+    return -filled, len(record.name.value), record.name.value
+
+
+def find_duplicates(records: dict) -> tuple[list[MergeProposal], int]:
+    """
+    Group duplicate contacts without comparing every pair.
+
+    Every contact is put in one block per blocking key (see blocks_of): each
+    normalized phone, the lowercased email and the sorted-token name signature,
+    which also groups equal normalized names. Contacts are compared only with the others of their blocks (see
+    compatible), and matching pairs are joined with union-find, so duplicates
+    linked through different keys end up in one group. Blocks of more than
+    MAX_BLOCK_SIZE contacts are skipped. The work is linear in the number of
+    contacts plus the pairs inside blocks.
+
+    Args:
+        records (dict): Contact name -> Record.
+
+    Returns:
+        tuple[list[MergeProposal], int]: One proposal per group, the contact with
+            the most filled-in fields kept, and the number of skipped blocks.
+    """
+
+    with gc_paused():  # millions of short-lived keys; none of them is garbage in a cycle
+        blocks = blocks_of(records)
+    parent = {}
+    birthdays = {}  # group root -> birthday of any member
+    reasons = {}
+
+    def root(name):
+        parent.setdefault(name, name)
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    skipped = 0
+    for (kind, _), names in blocks.items():
+        if len(names) > MAX_BLOCK_SIZE:
+            skipped += 1
+            continue
+        for i, first in enumerate(names):
+            for second in names[i + 1 :]:
+                if first == second or not compatible(kind, records[first], records[second]):
+                    continue
+                a, b = root(first), root(second)
+                if a != b:
+                    birthday_a = birthdays.get(a, _birthday(records[first]))
+                    birthday_b = birthdays.get(b, _birthday(records[second]))
+                    if birthday_a and birthday_b and birthday_a != birthday_b:
+                        continue  # would join two people through a third contact
+                    parent[b] = a
+                    birthdays[a] = birthday_a or birthday_b
+                reasons.setdefault(first, set()).add(kind)
+                reasons.setdefault(second, set()).add(kind)
+
+    groups = {}
+    for name in parent:
+        groups.setdefault(root(name), []).append(name)
+    proposals = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=lambda name: _keep_first(records[name]))
+        proposals.append(
+            MergeProposal(
+                keep=members[0],
+                duplicates=members[1:],
+                reasons=set().union(*(reasons.get(name, ()) for name in members)),
+            )
+        )
+    proposals.sort(key=lambda proposal: proposal.keep)
+    return proposals, skipped
@@ -0,0 +1,479 @@
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import ItemsView, MutableMapping, ValuesView
+
+from helpers.bloom import BloomFilter
+from helpers.serializer import dumps_contacts, dumps_notes, is_segment, loads_contacts, loads_notes
+from models.note import Note
+
+TABLES = ("contacts", "notes")
+FILTERS = ("names", "titles", "phones")
+SCAN_BATCH = 1000  # rows fetched at a time by iteration
+PAGE_CACHE_KIB = 8192  # sqlite page cache of a store
+FILTER_HEADROOM = 2  # a rebuilt filter has room for this many times the current entries
+COMPACT_DELETED = 0.25  # compact once this share of the entries has been deleted
+
+
+def encode(table: str, key: str, entry) -> bytes:
+    """Encode one record or note as a row value: a one-entry segment (see helpers.serializer)."""
+
+    if table == "contacts":
+        return dumps_contacts({key: entry}, {})
+    return dumps_notes({key: entry}, {})
+
+
+def decode(table: str, payload: bytes):
+    """Decode a row value written by encode."""
+
+    if not is_segment(payload):
+        return pickle.loads(payload)  # rows written before the segment format
+    entries, _ = (loads_contacts if table == "contacts" else loads_notes)(payload)
+    return next(iter(entries.values()))
+
+
+class _Values(ValuesView):
+    def __iter__(self):
+        for _, entry in self._mapping.scan():
+            yield entry
+
+
+class _Items(ItemsView):
+    def __iter__(self):
+        return self._mapping.scan()
+
+
+class LRUMapping(MutableMapping):
+    """
+    One table of a DiskStore as a mapping of keys to records or notes.
+
+    Every entry is stored in the table as a one-entry segment (see encode). The
+    `capacity` most recently used entries are kept hydrated in `cache`; reading
+    another one decodes it from disk
+    and evicts the least recently used. Entries reported changed (mark_dirty) are
+    written back when they are evicted or the store is flushed; new entries are
+    written at once, so the table always has every key.
+
+    Iteration goes through the table in insertion order, a batch of SCAN_BATCH rows
+    at a time, and does not promote the entries it reads into the cache, so a full
+    scan (a search, building an index) does not flush the working set. Cached
+    entries are returned as they are, with their unsaved changes.
+
+    With a Bloom filter of the keys (`filter`, kept by the store), lookups and
+    membership tests of keys that are neither cached nor in the filter are
+    answered without reading the table.
+
+    `hits` and `misses` count key lookups answered from the cache and from disk,
+    `evictions` and `writes` the entries dropped from the cache and written to disk,
+    `filtered` the lookups the filter answered and `false_positives` the ones it let
+    through to the table for keys that were not there.
+    """
+
+    def __init__(self, store, table: str, capacity: int):
+        self.store = store
+        self.table = table
+        self.capacity = capacity
+        self.cache = OrderedDict()  # key -> entry, least recently used first
+        self.dirty = set()  # cached keys with changes not written yet
+        self.link = None  # called with every entry loaded from disk
+        self.filter = None  # BloomFilter of the keys
+        self.hits = self.misses = self.evictions = self.writes = 0
+        self.filtered = self.false_positives = 0
+        (self._length,) = self._execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+
+    def _execute(self, sql: str, parameters=()):
+        return self.store.connection.execute(sql, parameters)
+
+    def _filtered(self, key, counted=True) -> bool:
+        """Tell whether the filter rules out a key that is not cached."""
+
+        if self.filter is None or key in self.filter:
+            return False
+        self.filtered += counted
+        return True
+
+    def _exists(self, key, counted=True) -> bool:
+        """Look a key up in the table; `counted` lookups update filtered / false_positives."""
+
+        if self._filtered(key, counted):
+            return False
+        found = (
+            self._execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            is not None
+        )
+        if not found and self.filter is not None:
+            self.false_positives += counted
+        return found
+
+    def _load(self, payload: bytes):
+        entry = decode(self.table, payload)
+        if self.link is not None:
+            self.link(entry)
+        return entry
+
+    def _write(self, key, entry):
+        self._execute(
+            f"INSERT INTO {self.table} (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, encode(self.table, key, entry)),
+        )
+        self.writes += 1
+
+    def _cache(self, key, entry):
+        self.cache[key] = entry
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.capacity:
+            evicted, old = self.cache.popitem(last=False)
+            self.evictions += 1
+            if evicted in self.dirty:
+                self.dirty.discard(evicted)
+                self._write(evicted, old)
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, key):
+        with self.store.lock:
+            return key in self.cache or self._exists(key)
+
+    def __getitem__(self, key):
+        with self.store.lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return entry
+            if self._filtered(key):
+                raise KeyError(key)
+            self.misses += 1
+            row = self._execute(
+                f"SELECT value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                if self.filter is not None:
+                    self.false_positives += 1
+                raise KeyError(key)
+            entry = self._load(row[0])
+            self._cache(key, entry)
+            return entry
+
+    def __setitem__(self, key, entry):
+        with self.store.lock:
+            if key not in self.cache and not self._exists(key):
+                self._length += 1
+            if self.filter is not None:
+                self.filter.add(key)
+            self._write(key, entry)
+            self.dirty.discard(key)
+            self._cache(key, entry)
+
+    def __delitem__(self, key):
+        with self.store.lock:
+            if key not in self.cache and self._filtered(key):
+                raise KeyError(key)
+            cursor = self._execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            if not cursor.rowcount:
+                raise KeyError(key)
+            self.cache.pop(key, None)
+            self.dirty.discard(key)
+            self._length -= 1
+            self.store.deleted += 1
+
+    def __iter__(self):
+        last = 0
+        while True:
+            with self.store.lock:
+                rows = self._execute(
+                    f"SELECT rowid, key FROM {self.table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, SCAN_BATCH),
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for _, key in rows:
+                yield key
+
+    def scan(self):
+        """Yield (key, entry) pairs in insertion order without changing the cache."""
+
+        last = 0
+        while True:
+            with self.store.lock:
+                rows = self._execute(
+                    f"SELECT rowid, key, value FROM {self.table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, SCAN_BATCH),
+                ).fetchall()
+                batch = []
+                for _, key, payload in rows:
+                    entry = self.cache.get(key)
+                    batch.append((key, self._load(payload) if entry is None else entry))
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield from batch
+
+    def values(self):
+        return _Values(self)
+
+    def items(self):
+        return _Items(self)
+
+    def mark_dirty(self, key, entry) -> bool:
+        """
+        Remember that an entry changed, to write it back on eviction or flush.
+
+        The entry is put in the cache even if it had been evicted (a caller still
+        held it), replacing any copy loaded since. Deleted keys are ignored.
+
+        Returns:
+            bool: False for a deleted key.
+        """
+
+        with self.store.lock:
+            if key not in self.cache and not self._exists(key, counted=False):
+                return False
+            self.dirty.add(key)
+            self._cache(key, entry)
+            return True
+
+    def flush(self):
+        """Write back every changed entry (the store commits them, see DiskStore.flush)."""
+
+        with self.store.lock:
+            for key in self.dirty:
+                self._write(key, self.cache[key])
+            self.dirty.clear()
+
+    def counters(self) -> dict:
+        return {
+            "entries": self._length,
+            "cached": len(self.cache),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "writes": self.writes,
+            "filtered": self.filtered,
+            "false_positives": self.false_positives,
+        }
+
+
+class DiskStore:
+    """
+    An address book kept in a SQLite database, with a bounded working set in memory.
+
+    `contacts` and `notes` are LRUMappings over the tables of the same names and
+    replace `data` and `notes` of the AddressBook they are attached to, so the book
+    works unchanged while holding at most `capacity` hydrated records and as many
+    notes. The book reports changes through mark_changed (see changed), and
+    flush() writes back the changed entries and commits, which is what saving a
+    disk-backed book does (see helpers.data.snapshot_data). Until then the changes
+    live in the open transaction, which SQLite spills to disk, not in memory.
+
+    Bloom filters of the contact names, note titles and phones (`filters`) are
+    kept in memory and saved in the `meta` table with every flush, so lookups of
+    missing contacts and notes (and `phone=` queries, see may_have_phone) skip the
+    database. Filters only grow; once they hold more items than they were sized for,
+    or a COMPACT_DELETED share of the entries was deleted, the flush compacts the
+    store: the filters are rebuilt from the tables (decoding every contact for its
+    phones) and the database is vacuumed.
+
+    One connection is shared by both tables and guarded by `lock`, so the book can
+    be read from several threads. A store is meant to be used by one session at a
+    time: entries cached by one session do not see what another one commits.
+    """
+
+    def __init__(self, path, capacity: int):
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(f"PRAGMA cache_size = -{PAGE_CACHE_KIB}")
+        for table in TABLES:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+            )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+        )
+        self.connection.commit()
+        self.contacts = LRUMapping(self, "contacts", capacity)
+        self.notes = LRUMapping(self, "notes", capacity)
+        self.filters = {}
+        self.deleted = 0  # entries deleted since the filters were built
+        self._load_filters()
+
+    def _meta(self, key):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_filters(self, filters: dict):
+        self.filters = filters
+        self.contacts.filter = filters["names"]
+        self.notes.filter = filters["titles"]
+
+    def _load_filters(self):
+        payloads = {name: self._meta(f"filter:{name}") for name in FILTERS}
+        if None in payloads.values():  # a store saved without filters
+            self.rebuild_filters()
+            self._save_filters()
+            self.connection.commit()
+            return
+        self._set_filters(
+            {name: BloomFilter.from_bytes(payload) for name, payload in payloads.items()}
+        )
+        self.deleted = int(self._meta("deleted") or 0)
+
+    def _save_filters(self):
+        rows = [(f"filter:{name}", bloom.to_bytes()) for name, bloom in self.filters.items()]
+        rows.append(("deleted", str(self.deleted).encode()))
+        self.connection.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            rows,
+        )
+
+    def _build_filters(self, names, titles, records):
+        filters = {
+            "names": BloomFilter(len(self.contacts) * FILTER_HEADROOM),
+            "titles": BloomFilter(len(self.notes) * FILTER_HEADROOM),
+        }
+        filters["names"].update(names)
+        filters["titles"].update(titles)
+        phones = {phone.value for record in records for phone in record.phones}
+        filters["phones"] = BloomFilter(len(phones) * FILTER_HEADROOM)
+        filters["phones"].update(phones)
+        self._set_filters(filters)
+        self.deleted = 0
+
+    def rebuild_filters(self):
+        """Rebuild the filters from the tables, sized for the current entries."""
+
+        with self.lock:
+            self._build_filters(
+                iter(self.contacts),
+                iter(self.notes),
+                (entry for _, entry in self.contacts.scan()),
+            )
+
+    def needs_compaction(self) -> bool:
+        return self.deleted > COMPACT_DELETED * (len(self.contacts) + len(self.notes)) or any(
+            bloom.items > bloom.capacity for bloom in self.filters.values()
+        )
+
+    def compact(self):
+        """Rebuild the filters, commit and vacuum the database."""
+
+        with self.lock:
+            self.contacts.flush()
+            self.notes.flush()
+            self.rebuild_filters()
+            self._save_filters()
+            self.connection.commit()
+            self.connection.execute("VACUUM")
+
+    def may_have_phone(self, phone: str) -> bool:
+        """Return False if no contact has the phone, True if one may have it."""
+
+        return phone in self.filters["phones"]
+
+    def attach(self, book):
+        """Make the store the storage of an empty AddressBook."""
+
+        self.contacts.link = self.notes.link = book._link
+        book.store = self
+        book.data = self.contacts
+        book.notes = self.notes
+        return book
+
+    def import_book(self, book):
+        """
+        Copy every contact and note of an in-memory book into the store and commit.
+
+        The filters of an empty store are built for the book; otherwise the book is
+        added to them, and the next flush compacts the store if they overflow.
+        """
+
+        with self.lock:
+            empty = not len(self.contacts) and not len(self.notes)
+            for table, entries in (("contacts", book.data), ("notes", book.notes)):
+                self.connection.executemany(
+                    f"INSERT INTO {table} (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    ((key, encode(table, key, entry)) for key, entry in entries.items()),
+                )
+            for mapping in (self.contacts, self.notes):
+                (mapping._length,) = mapping._execute(
+                    f"SELECT COUNT(*) FROM {mapping.table}"
+                ).fetchone()
+            if empty:
+                self._build_filters(book.data.keys(), book.notes.keys(), book.data.values())
+            else:
+                self.filters["names"].update(book.data.keys())
+                self.filters["titles"].update(book.notes.keys())
+                self.filters["phones"].update(
+                    phone.value for record in book.data.values() for phone in record.phones
+                )
+            self._save_filters()
+            self.connection.commit()
+
+    def changed(self, item):
+        """Mark a changed record or note for write-back (called by AddressBook.mark_changed)."""
+
+        if isinstance(item, Note):
+            self.notes.mark_dirty(item.title, item)
+        elif self.contacts.mark_dirty(item.name.value, item):
+            self.filters["phones"].update(phone.value for phone in item.phones)
+
+    def flush(self):
+        """Write back the changed entries and the filters and commit, compacting if due."""
+
+        with self.lock:
+            if self.needs_compaction():
+                self.compact()
+                return
+            self.contacts.flush()
+            self.notes.flush()
+            self._save_filters()
+            self.connection.commit()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def discard(self):
+        """Close the store without writing back or committing the changes of the session."""
+
+        with self.lock:
+            self.connection.rollback()
+            self.connection.close()
+
+    def counters(self) -> dict:
+        """Return the cache counters of both tables: table -> LRUMapping.counters()."""
+
+        return {"contacts": self.contacts.counters(), "notes": self.notes.counters()}
+
+    def filter_stats(self) -> dict:
+        """
+        Describe the Bloom filters: name -> items, capacity, bytes and false-positive rates.
+
+        `estimated_fpr` follows from the bits set; `observed_fpr` is the share of
+        lookups of missing keys the filter let through (names and titles only).
+        """
+
+        stats = {}
+        for name, bloom in self.filters.items():
+            mapping = {"names": self.contacts, "titles": self.notes}.get(name)
+            observed = None
+            if mapping is not None:
+                misses = mapping.filtered + mapping.false_positives
+                observed = mapping.false_positives / misses if misses else None
+            stats[name] = {
+                "items": bloom.items,
+                "capacity": bloom.capacity,
+                "bytes": len(bloom.array),
+                "hashes": bloom.hashes,
+                "estimated_fpr": bloom.false_positive_rate(),
+                "observed_fpr": observed,
+            }
+        return stats
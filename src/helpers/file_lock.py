@@ -0,0 +1,45 @@
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows has no advisory locks, saves are then unguarded
+    fcntl = None
+
+
+class FileLock:
+    """
+    Advisory inter-process lock for a data file.
+
+    The lock is taken on a sidecar `<filename>.lock` file rather than on the data
+    file itself, because saves replace the data file by renaming a new one over it.
+    Loads take the lock shared, saves exclusive, so a reader never sees a save in
+    progress and two sessions never save at the same time.
+
+    The lock can be acquired in one thread and released in another, which lets the
+    autosave task hold it across awaits.
+    """
+
+    def __init__(self, filename, exclusive=True):
+        self.path = f"{filename}.lock"
+        self.exclusive = exclusive
+        self._fd = None
+
+    def acquire(self):
+        if fcntl is None:
+            return self
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        fcntl.flock(self._fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
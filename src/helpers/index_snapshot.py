@@ -0,0 +1,104 @@
+import os
+import struct
+
+from helpers.serializer import (
+    LENGTH,
+    dumps_sorted_index,
+    dumps_tag_index,
+    gc_paused,
+    loads_sorted_index,
+    loads_tag_index,
+)
+
+MAGIC = b"ABI2"  # 1: pickled indexes
+HEADER = struct.Struct(">4sQQQ")  # magic, save generation, contacts, notes
+# MinHashIndex is left out: its shingle hashes come from hash() and differ between processes
+SORTED_INDEXES = ("birth_date_index", "note_date_index")
+INDEXES = (*SORTED_INDEXES, "tag_index")
+
+
+def index_file(filename) -> str:
+    """Return the path of the index snapshot saved next to a data file or sharded book."""
+
+    return f"{os.path.normpath(filename)}.idx"
+
+
+def dumps_indexes(book) -> bytes | None:
+    """
+    Serialize the secondary indexes the book has built, stamped with its save generation.
+
+    Call after the book was stamped with the generation it is being saved as
+    (AddressBook.stamp_changes). Indexes that were never built are left out, so a
+    session only persists what it or an earlier session actually used. Every index
+    is a segment of helpers.serializer (an empty one when left out), so loading a
+    snapshot runs no code from the file.
+
+    Returns:
+        bytes | None: The snapshot, or None if no index is built.
+    """
+
+    segments = []
+    for name in INDEXES:
+        index = getattr(book, name)
+        if not index.built:
+            segments.append(b"")
+        elif name in SORTED_INDEXES:
+            segments.append(dumps_sorted_index(index.keys, index.entries))
+        else:
+            segments.append(dumps_tag_index(index.tags))
+    if not any(segments):
+        return None
+    chunks = [HEADER.pack(MAGIC, book.generation, len(book.data), len(book.notes))]
+    for segment in segments:
+        chunks += [LENGTH.pack(len(segment)), segment]
+    return b"".join(chunks)
+
+
+def load_indexes(book, filename) -> list[str]:
+    """
+    Restore the indexes saved next to a data file into a book just loaded from it.
+
+    The snapshot is used only if it was saved with the generation the book was
+    loaded at and for as many contacts and notes; otherwise, for example after a
+    crash between writing the data file and the snapshot, or a save by an older
+    version, it is ignored and the indexes are built on first use as usual.
+
+    Call while holding the FileLock the book was loaded under.
+
+    Args:
+        book (AddressBook): The freshly loaded book.
+        filename (str): The data file or sharded book directory it was loaded from.
+
+    Returns:
+        list[str]: The names of the restored indexes.
+    """
+
+    try:
+        with open(index_file(filename), "rb") as f:
+            payload = f.read()
+    except FileNotFoundError:
+        return []
+    stamp = (MAGIC, book.generation, len(book.data), len(book.notes))
+    if len(payload) < HEADER.size or HEADER.unpack_from(payload) != stamp:
+        return []
+    view = memoryview(payload)[HEADER.size :]
+    restored = []
+    try:
+        with gc_paused():
+            for name in INDEXES:
+                (size,) = LENGTH.unpack_from(view, 0)
+                segment = view[LENGTH.size : LENGTH.size + size]
+                view = view[LENGTH.size + size :]
+                if not size:
+                    continue
+                index = getattr(book, name)
+                if name in SORTED_INDEXES:
+                    index.restore(*loads_sorted_index(segment, index.typecode))
+                else:
+                    index.restore(loads_tag_index(segment))
+                restored.append(name)
+    except (ValueError, struct.error):  # a damaged snapshot is only a lost cache
+        for name in restored:
+            getattr(book, name).invalidate()
+        return []
+    return restored
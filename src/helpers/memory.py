@@ -0,0 +1,90 @@
+import gc
+import sys
+import threading
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+
+# never counted nor followed: code and classes, and the locks every entry shares with its book
+SHARED = (
+    type,
+    ModuleType,
+    FunctionType,
+    BuiltinFunctionType,
+    MethodType,
+    type(threading.Lock()),
+)
+
+
+def measure_retained(obj, shared=()) -> tuple[int, int]:
+    """
+    Measure how many bytes an object graph retains, without copying or loading anything.
+
+    Walks everything reachable from the object (gc.get_referents and instance
+    dictionaries) once and adds up sys.getsizeof of each object. Classes, functions,
+    modules, locks and instances of `shared` types (the book a note points back to,
+    storage segments) are neither counted nor followed.
+
+    Note bodies that are still on disk (see models.note.LazyBody) are not loaded:
+    only their loader is counted, and the notes holding one are reported apart.
+
+    Args:
+        obj: Any object.
+        shared (tuple[type, ...]): More types to leave out.
+
+    Returns:
+        tuple[int, int]: Retained size in bytes and the number of bodies not loaded.
+    """
+
+    shared = SHARED + tuple(shared)
+    seen = set()
+    stack = [obj]
+    size = unloaded = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, shared):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        state = getattr(item, "__dict__", None)
+        if isinstance(state, dict):
+            unloaded += "body_loader" in state
+            stack.append(state)
+        else:
+            stack.extend(gc.get_referents(item))
+    return size, unloaded
+
+
+def get_memory_report(subsystems: dict, shared=()) -> list[dict]:
+    """
+    Attribute memory to each subsystem of the assistant.
+
+    Every subsystem is measured on its own, so strings shared between subsystems
+    (for example contact names in the book and in the names completer) are counted
+    in each of them. Note bodies not loaded yet are counted in an extra row
+    ("bodies on disk") and not in the bytes of their subsystem.
+
+    Args:
+        subsystems (dict): Subsystem name -> (object to measure, number of items).
+        shared (tuple[type, ...]): Types to leave out (see measure_retained).
+
+    Returns:
+        list: A list of dictionaries with the subsystem name, items, bytes and bytes per item.
+    """
+
+    report = []
+    unloaded = 0
+    for name, (obj, items) in subsystems.items():
+        size, bodies = measure_retained(obj, shared)
+        unloaded = max(unloaded, bodies)
+        report.append(
+            {
+                "name": name,
+                "items": items,
+                "bytes": size,
+                "bytes_per_item": size / items if items else 0,
+            }
+        )
+    if unloaded:
+        report.append(
+            {"name": "bodies on disk", "items": unloaded, "bytes": 0, "bytes_per_item": 0}
+        )
+    return report
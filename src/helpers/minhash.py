@@ -0,0 +1,167 @@
+import threading
+
+SHINGLE_WORDS = 3  # words per shingle
+BANDS = 16  # LSH bands ...
+ROWS = 4  # ... of this many signature values; notes sharing one band are candidates
+BINS = BANDS * ROWS  # signature length
+SIMILARITY = 0.5  # default threshold; BANDS and ROWS make pairs from about here likely to collide
+EMPTY = 1 << 64  # larger than hash(x) // BINS of any shingle
+OFFSET = EMPTY // BINS  # added per bin of distance to values borrowed by empty bins
+
+
+def shingles(text: str) -> set[int]:
+    """
+    Hash the word shingles of a text.
+
+    Shingles are SHINGLE_WORDS consecutive lowercase words (the single words of
+    shorter texts). Hashes are Python's hash() and are only comparable within
+    one process, like the index built from them.
+    """
+
+    words = text.lower().split()
+    if len(words) < SHINGLE_WORDS:
+        grams = words
+    else:
+        grams = zip(*(words[i:] for i in range(SHINGLE_WORDS)))
+    return set(map(hash, grams))
+
+
+def signature(hashes: set[int]) -> tuple | None:
+    """
+    Compute the MinHash signature of a set of shingle hashes.
+
+    One-permutation MinHash: every hash goes to bin `hash % BINS`, which keeps the
+    smallest `hash // BINS`, so the signature costs one pass over the shingles
+    instead of one per bin. A bin no shingle fell into borrows the value of the
+    next filled bin, offset by the distance (densification), which keeps equal
+    bins as likely as the Jaccard similarity of the two sets.
+
+    Returns:
+        tuple | None: BINS values, or None for a text without words.
+    """
+
+    if not hashes:
+        return None
+    bins = [EMPTY] * BINS
+    for value in hashes:
+        index = value % BINS
+        value //= BINS
+        if value < bins[index]:
+            bins[index] = value
+    if EMPTY in bins:
+        # walk backwards, so `source` is the next filled bin; past the last one wrap to the first
+        source = BINS + next(index for index in range(BINS) if bins[index] != EMPTY)
+        filled = bins[:]
+        for index in range(BINS - 1, -1, -1):
+            if filled[index] != EMPTY:
+                source = index
+            else:
+                bins[index] = filled[source % BINS] + (source - index) * OFFSET
+    return tuple(bins)
+
+
+def similarity(first: tuple, second: tuple) -> float:
+    """Estimate the Jaccard similarity of two notes from their signatures."""
+
+    return sum(map(int.__eq__, first, second)) / BINS
+
+
+class MinHashIndex:
+    """
+    Locality-sensitive hashing index of note contents for near-duplicate search.
+
+    Every note has a MinHash signature (`signatures`); each of its BANDS bands of
+    ROWS values is a key in `buckets`. Notes whose contents are similar share a
+    band with high probability, so the near-duplicates of a note are found among
+    the few notes in its buckets, without comparing it with every note.
+
+    Like the other indexes of the book, it is built on first use, patched by
+    AddressBook.mark_changed (add_note, edit_note, deletions) and rebuilt after a
+    merge. Building reads every note body.
+    """
+
+    def __init__(self):
+        self.built = False
+        self.signatures = {}  # title -> signature
+        self.buckets = {}  # (band, values) -> set of titles
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_lock")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def invalidate(self):
+        self.built = False
+
+    @staticmethod
+    def _bands(values: tuple):
+        for band in range(BANDS):
+            yield band, values[band * ROWS : (band + 1) * ROWS]
+
+    def _add(self, title: str, text: str):
+        values = signature(shingles(text))
+        if values is None:
+            return
+        self.signatures[title] = values
+        for key in self._bands(values):
+            self.buckets.setdefault(key, set()).add(title)
+
+    def _remove(self, title: str):
+        values = self.signatures.pop(title, None)
+        if values is None:
+            return
+        for key in self._bands(values):
+            bucket = self.buckets[key]
+            bucket.discard(title)
+            if not bucket:
+                del self.buckets[key]
+
+    def build(self, book):
+        """Hash every note of the book unless the index is up to date."""
+
+        with self._lock:
+            if self.built:
+                return
+            self.signatures, self.buckets = {}, {}
+            for title, note in book.notes.items():
+                self._add(title, note.value)
+            self.built = True
+
+    def changed(self, book, note):
+        """Re-hash one added, edited or deleted note."""
+
+        if not self.built:
+            return
+        self._remove(note.title)
+        if book.notes.get(note.title) is note:
+            self._add(note.title, note.value)
+
+    def similar(self, title: str, threshold: float = SIMILARITY) -> list[tuple[str, float]]:
+        """
+        Return (title, estimated similarity) of the near-duplicates of a note, most similar first.
+
+        Call build() first.
+        """
+
+        values = self.signatures.get(title)
+        if values is None:
+            return []
+        candidates = set()
+        for key in self._bands(values):
+            candidates |= self.buckets[key]
+        candidates.discard(title)
+        found = [
+            (candidate, similarity(values, self.signatures[candidate]))
+            for candidate in candidates
+        ]
+        found = [(candidate, score) for candidate, score in found if score >= threshold]
+        found.sort(key=lambda pair: (-pair[1], pair[0]))
+        return found
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from helpers.serializer import EPOCH, MICROSECOND
+from helpers.sorted_index import SortedIndex
+
+
+def stamp(moment: datetime) -> int:
+    """Microseconds since the epoch, the key of a note creation date."""
+
+    return (moment - EPOCH) // MICROSECOND
+
+
+class NoteDateIndex(SortedIndex):
+    """
+    Notes sorted by creation date (microsecond stamps).
+
+    Answers the notes created in a time range and the most recent notes in
+    O(log n + k) without sorting the notes, and pages through either with an
+    offset. See SortedIndex.
+    """
+
+    typecode = "q"
+
+    def _items(self, book) -> dict:
+        return book.notes
+
+    def key(self, note) -> int:
+        return stamp(note.creation_date)
+
+    def changed(self, book, note):
+        """Move one added or deleted note to its place in the index."""
+
+        self.update(book, note.title, note)
+
+    def created_between(
+        self, start: datetime, end: datetime, offset: int = 0, limit: int | None = None
+    ) -> list[str]:
+        """
+        Return the titles of notes created from start to end, both included, oldest first.
+
+        Call build() first.
+        """
+
+        return self.between(stamp(start), stamp(end), offset, limit)
+
+    def recent(self, count: int, offset: int = 0) -> list[str]:
+        """Return the titles of the `count` newest notes after skipping `offset`, newest first."""
+
+        return self.last(count, offset)
@@ -1,9 +1,18 @@
 import os
+import sys
+
+CLEAR_SCREEN = "\033[H\033[2J\033[3J"  # cursor home, clear screen, clear scrollback
+
 
 def clear_console():
-    # For Windows
+    """Clear the terminal with escape codes instead of running `clear` / `cls` in a shell."""
+
+    if not sys.stdout.isatty():
+        return
+    # For Windows consoles that do not process escape codes by default
     if os.name == "nt":
-        os.system("cls")
-    # For Mac and Linux
-    else:
-        os.system("clear")
+        from colorama import just_fix_windows_console
+
+        just_fix_windows_console()
+    sys.stdout.write(CLEAR_SCREEN)
+    sys.stdout.flush()
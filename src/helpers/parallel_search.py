@@ -0,0 +1,154 @@
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+from models.tag import auto_add_hashtag
+
+HEADER = struct.Struct("<qqq")  # notes, text bytes, tags bytes
+SHARDS_PER_WORKER = 4
+TEXT_END = b"\x00"
+TAG_EDGE = b"\x01"
+
+_corpus = None  # per worker process: (path, mmap, text offsets, tags offsets, bases)
+
+
+def _open_corpus(path):
+    global _corpus
+    if _corpus is not None and _corpus[0] == path:
+        return _corpus
+    if _corpus is not None:
+        _corpus[1].close()
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    count, text_size, _ = HEADER.unpack_from(mapped, 0)
+    position = HEADER.size
+    text_offsets = array("q")
+    text_offsets.frombytes(mapped[position : position + 8 * (count + 1)])
+    position += 8 * (count + 1)
+    tags_offsets = array("q")
+    tags_offsets.frombytes(mapped[position : position + 8 * (count + 1)])
+    position += 8 * (count + 1)
+    _corpus = (path, mapped, text_offsets, tags_offsets, position, position + text_size)
+    return _corpus
+
+
+def _scan(path, field, needle, start, end):
+    """
+    Find the notes start..end-1 of the corpus whose field contains needle.
+
+    Runs in a worker process. The corpus file is memory-mapped once per worker and
+    searched in place with mmap.find, jumping to the next note after each hit, so
+    only matching notes cost more than a byte scan.
+    """
+
+    _, mapped, text_offsets, tags_offsets, text_base, tags_base = _open_corpus(path)
+    offsets, base = (
+        (text_offsets, text_base) if field == "text" else (tags_offsets, tags_base)
+    )
+    hits = []
+    position, limit = base + offsets[start], base + offsets[end]
+    while position < limit:
+        found = mapped.find(needle, position, limit)
+        if found < 0:
+            break
+        index = bisect_right(offsets, found - base, start, end + 1) - 1
+        hits.append(index)
+        position = base + offsets[index + 1]
+    return hits
+
+
+class ParallelNoteSearch:
+    """
+    Note search that scans shards of the notes in a process pool.
+
+    The lowercased title and content of every note, and its tags, are written once
+    into a flat corpus file together with per-note offsets. Worker processes map the
+    file into memory, so the text is shared through the page cache instead of being
+    pickled for every task. A search splits the notes into contiguous shards, scans
+    them in parallel and concatenates the hits shard by shard, which keeps the order
+    of AddressBook.notes. The corpus is rebuilt when the book's revision changes.
+
+    Attach it with `book.parallel_search = ParallelNoteSearch(book)`; AddressBook then
+    delegates find_notes and find_notes_by_tag to it for large books.
+    """
+
+    def __init__(self, book, workers=None):
+        self.book = book
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.path = None
+        self.titles = []
+        self.revision = None
+
+    def _build(self):
+        text_offsets, tags_offsets = array("q", [0]), array("q", [0])
+        text, tags = [], []
+        text_size = tags_size = 0
+        self.titles = list(self.book.notes)
+        for note in self.book.notes.values():
+            chunk = f"{note.title}\x00{note.value}".lower().encode() + TEXT_END
+            text.append(chunk)
+            text_size += len(chunk)
+            text_offsets.append(text_size)
+            chunk = b"".join(
+                TAG_EDGE + tag.value.encode() + TAG_EDGE for tag in note.tags
+            )
+            tags.append(chunk)
+            tags_size += len(chunk)
+            tags_offsets.append(tags_size)
+
+        fd, path = tempfile.mkstemp(prefix="notes-", suffix=".corpus")
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(len(self.titles), text_size, tags_size))
+            f.write(text_offsets.tobytes())
+            f.write(tags_offsets.tobytes())
+            f.writelines(text)
+            f.writelines(tags)
+        self._remove()
+        self.path = path
+        self.revision = self.book.revision
+
+    def _remove(self):
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except OSError:  # still mapped by a worker on Windows
+                pass
+            self.path = None
+
+    def _search(self, field: str, needle: bytes) -> dict:
+        if self.revision != self.book.revision or self.path is None:
+            self._build()
+        count = len(self.titles)
+        shards = min(self.workers * SHARDS_PER_WORKER, count) or 1
+        bounds = [count * i // shards for i in range(shards + 1)]
+        futures = [
+            self.pool.submit(_scan, self.path, field, needle, start, end)
+            for start, end in zip(bounds, bounds[1:])
+            if start < end
+        ]
+        notes = self.book.notes
+        found = {}
+        for future in futures:
+            for index in future.result():
+                title = self.titles[index]
+                found[title] = notes[title]
+        return found
+
+    def find_notes(self, query: str) -> dict:
+        """Same result as the linear AddressBook.find_notes scan."""
+
+        return self._search("text", query.lower().replace("\x00", "").encode())
+
+    def find_notes_by_tag(self, tag: str) -> dict:
+        """Same result as the linear AddressBook.find_notes_by_tag scan."""
+
+        return self._search("tags", TAG_EDGE + auto_add_hashtag(tag).encode() + TAG_EDGE)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        self._remove()
@@ -0,0 +1,692 @@
+import re
+from datetime import date, datetime, timedelta
+
+from helpers.birthday_calendar import DATE_FORMAT, next_birthday
+from helpers.birthday_columns import years_before
+from helpers.note_date_index import stamp
+from models.tag import auto_add_hashtag
+
+LOWEST = float("-inf")
+HIGHEST = float("inf")
+INTERSECT_FACTOR = 8  # intersect an index with the candidates only if it is at most this much larger
+TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<paren>[()])
+        |(?P<term>(?P<field>[A-Za-z_]+)(?P<op>>=|<=|[:=<>])(?:"(?P<quoted>[^"]*)"|(?P<value>[^\s()]+)))
+        |(?P<word>[^\s()]+)
+    )""",
+    re.VERBOSE,
+)
+DATE_FORMATS = ("%Y-%m-%d", DATE_FORMAT)
+
+
+class QueryError(ValueError):
+    """Raised for a query that cannot be parsed or mixes contact and note fields."""
+
+
+def parse_date(value: str) -> date:
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise QueryError(f"Invalid date {value}. Use YYYY-MM-DD or DD.MM.YYYY")
+
+
+def parse_int(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryError(f"Invalid number {value}") from None
+
+
+class Access:
+    """A way to get the candidates of a term from an index instead of a scan."""
+
+    def __init__(self, index: str, estimate: int, fetch):
+        self.index = index
+        self.estimate = estimate
+        self.fetch = fetch  # () -> iterable of keys
+
+
+# Expressions
+
+
+class Term:
+    """
+    One `field op value` condition.
+
+    Subclasses set the fields they handle, the target ("contacts" or "notes") and
+    the operators they accept, and implement matches(); the ones backed by an
+    index also implement access().
+    """
+
+    target = None
+    ops = (":",)
+
+    def __init__(self, field: str, op: str, value: str):
+        if op not in self.ops:
+            raise QueryError(f"{field} supports {', '.join(self.ops)}, not {op}")
+        self.field = field
+        self.op = op
+        self.value = value
+
+    def __str__(self):
+        value = f'"{self.value}"' if re.search(r"\s", self.value) else self.value
+        return f"{self.field}{self.op}{value}"
+
+    def terms(self):
+        yield self
+
+    def matches(self, book, key, item) -> bool:
+        raise NotImplementedError
+
+    def access(self, book) -> Access | None:
+        return None
+
+
+class And:
+    def __init__(self, children: list):
+        self.children = children
+
+    def __str__(self):
+        return "(" + " AND ".join(map(str, self.children)) + ")"
+
+    def terms(self):
+        for child in self.children:
+            yield from child.terms()
+
+    def matches(self, book, key, item) -> bool:
+        return all(child.matches(book, key, item) for child in self.children)
+
+
+class Or(And):
+    def __str__(self):
+        return "(" + " OR ".join(map(str, self.children)) + ")"
+
+    def matches(self, book, key, item) -> bool:
+        return any(child.matches(book, key, item) for child in self.children)
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def __str__(self):
+        return f"NOT {self.child}"
+
+    def terms(self):
+        yield from self.child.terms()
+
+    def matches(self, book, key, item) -> bool:
+        return not self.child.matches(book, key, item)
+
+
+class Contains(Term):
+    """Case-insensitive substring of a text attribute; `=` on the key is a key lookup."""
+
+    def __init__(self, field, op, value):
+        super().__init__(field, op, value)
+        self.needle = value.lower()
+
+    def texts(self, key, item) -> list:
+        raise NotImplementedError
+
+    def matches(self, book, key, item):
+        return any(self.needle in text.lower() for text in self.texts(key, item) if text)
+
+
+class KeyTerm(Contains):
+    ops = (":", "=")
+
+    def matches(self, book, key, item):
+        if self.op == "=":
+            return key == self.value
+        return super().matches(book, key, item)
+
+    def texts(self, key, item):
+        return [key]
+
+    def access(self, book):
+        if self.op != "=":
+            return None
+        items = book.data if self.target == "contacts" else book.notes
+        found = [self.value] if self.value in items else []
+        return Access("key", len(found), lambda: found)
+
+
+class RangeTerm(Term):
+    """A condition on the key of a SortedIndex, as an inclusive range of keys."""
+
+    ops = (":", "=", ">", ">=", "<", "<=")
+    index = None  # attribute of the book
+    index_name = None
+
+    def __init__(self, field, op, value):
+        super().__init__(field, op, value)
+        try:
+            self.low, self.high = self.bounds()
+        except QueryError:
+            raise
+        except (ValueError, OverflowError):  # date arithmetic past year 1 or 9999
+            raise QueryError(f"{self} is out of range") from None
+
+    def bounds(self) -> tuple:
+        """Return the inclusive range of keys; may raise ValueError or OverflowError for dates out of range."""
+
+        raise NotImplementedError
+
+    def matches(self, book, key, item):
+        value = getattr(book, self.index).key(item)
+        return value is not None and self.low <= value <= self.high
+
+    def access(self, book):
+        index = getattr(book, self.index)
+        index.build(book)
+        return Access(
+            self.index_name,
+            index.count(self.low, self.high),
+            lambda: index.between(self.low, self.high),
+        )
+
+
+def _range(op: str, first, last, before, after) -> tuple:
+    """Turn an operator on a value covering first..last into an inclusive range of keys."""
+
+    return {
+        ":": (first, last),
+        "=": (first, last),
+        ">": (after, HIGHEST),
+        ">=": (first, HIGHEST),
+        "<": (LOWEST, before),
+        "<=": (LOWEST, last),
+    }[op]
+
+
+# Note terms
+
+
+class TitleTerm(KeyTerm):
+    target = "notes"
+
+
+class TextTerm(Contains):
+    target = "notes"
+
+    def texts(self, key, item):
+        return [item.title, item.value]
+
+
+class TagTerm(Term):
+    target = "notes"
+    ops = (":", "=")
+
+    def __init__(self, field, op, value):
+        super().__init__(field, op, auto_add_hashtag(value))
+
+    def matches(self, book, key, item):
+        return any(tag.value == self.value for tag in item.tags)
+
+    def access(self, book):
+        book.tag_index.build(book)
+        titles = book.tag_index.get(self.value)
+        return Access("tag index", len(titles), lambda: titles)
+
+
+class CreatedTerm(RangeTerm):
+    target = "notes"
+    index = "note_date_index"
+    index_name = "note date index"
+
+    def bounds(self):
+        start = datetime.combine(parse_date(self.value), datetime.min.time())
+        first = stamp(start)
+        last = stamp(start + timedelta(days=1)) - 1
+        return _range(self.op, first, last, first - 1, last + 1)
+
+
+class ModifiedTerm(Term):
+    target = "notes"
+    ops = RangeTerm.ops
+
+    def __init__(self, field, op, value):
+        super().__init__(field, op, value)
+        day = parse_date(value).toordinal()
+        self.low, self.high = _range(op, day, day, day - 1, day + 1)
+
+    def matches(self, book, key, item):
+        return self.low <= item.modification_date.toordinal() <= self.high
+
+
+# Contact terms
+
+
+class NameTerm(KeyTerm):
+    target = "contacts"
+
+
+class PhoneTerm(Contains):
+    """`phone=` is an exact phone; a disk store rules out phones no contact has by its Bloom filter."""
+
+    target = "contacts"
+    ops = (":", "=")
+
+    def matches(self, book, key, item):
+        if self.op == "=":
+            return any(phone.value == self.value for phone in item.phones)
+        return super().matches(book, key, item)
+
+    def texts(self, key, item):
+        return [phone.value for phone in item.phones]
+
+    def access(self, book):
+        if self.op != "=" or book.store is None or book.store.may_have_phone(self.value):
+            return None
+        return Access("phone filter", 0, lambda: [])
+
+
+class EmailTerm(Contains):
+    target = "contacts"
+
+    def texts(self, key, item):
+        return [item.email.value] if item.email else []
+
+
+class AddressTerm(Contains):
+    target = "contacts"
+
+    def texts(self, key, item):
+        return [item.address.value] if item.address else []
+
+
+class HasTerm(Term):
+    target = "contacts"
+    attributes = ("address", "birthday", "email", "phone")
+
+    def __init__(self, field, op, value):
+        super().__init__(field, op, value.lower())
+        if self.value not in self.attributes:
+            raise QueryError(f"has: takes one of {', '.join(self.attributes)}")
+
+    def matches(self, book, key, item):
+        if self.value == "phone":
+            return bool(item.phones)
+        return getattr(item, self.value) is not None
+
+    def access(self, book):
+        if self.value != "birthday":
+            return None
+        index = book.birth_date_index
+        index.build(book)
+        return Access("birth date index", len(index), lambda: index.positions.keys())
+
+
+class BirthdayTerm(Term):
+    """Birthday within the next N days (`birthday:30d`), as in the birthdays command."""
+
+    target = "contacts"
+
+    def __init__(self, field, op, value):
+        super().__init__(field, op, value)
+        self.days = parse_int(value.lower().removesuffix("d"))
+        if self.days < 0:
+            raise QueryError(f"{self} is negative, use a number of days from 0")
+
+    def matches(self, book, key, item):
+        if item.birthday is None:
+            return False
+        today = datetime.now().date()
+        return (next_birthday(item.birthday.value.date(), today) - today).days <= self.days
+
+    def access(self, book):
+        calendar = book.birthday_calendar
+        if self.days > calendar.horizon:
+            return None
+        names = calendar.names(book, self.days, datetime.now().date())
+        return Access("birthday calendar", len(names), lambda: names)
+
+
+class BornTerm(RangeTerm):
+    """Birth date; `born:1990` is the whole year."""
+
+    target = "contacts"
+    index = "birth_date_index"
+    index_name = "birth date index"
+
+    def bounds(self):
+        if re.fullmatch(r"\d{4}", self.value):
+            first = date(int(self.value), 1, 1).toordinal()
+            last = date(int(self.value), 12, 31).toordinal()
+        else:
+            first = last = parse_date(self.value).toordinal()
+        return _range(self.op, first, last, first - 1, last + 1)
+
+
+class AgeTerm(RangeTerm):
+    """Age in full years, as a range of birth dates."""
+
+    target = "contacts"
+    index = "birth_date_index"
+    index_name = "birth date index"
+
+    def bounds(self):
+        age = parse_int(self.value)
+        today = datetime.now().date()
+
+        def oldest(years):  # first birth date of people aged `years` or younger
+            return years_before(today, years + 1).toordinal() + 1
+
+        def youngest(years):  # last birth date of people aged `years` or older
+            return years_before(today, years).toordinal()
+
+        return {
+            ":": (oldest(age), youngest(age)),
+            "=": (oldest(age), youngest(age)),
+            ">": (LOWEST, youngest(age + 1)),
+            ">=": (LOWEST, youngest(age)),
+            "<": (oldest(age - 1), HIGHEST),
+            "<=": (oldest(age), HIGHEST),
+        }[self.op]
+
+
+FIELDS = {
+    "title": TitleTerm,
+    "text": TextTerm,
+    "tag": TagTerm,
+    "created": CreatedTerm,
+    "modified": ModifiedTerm,
+    "name": NameTerm,
+    "phone": PhoneTerm,
+    "email": EmailTerm,
+    "address": AddressTerm,
+    "has": HasTerm,
+    "birthday": BirthdayTerm,
+    "born": BornTerm,
+    "age": AgeTerm,
+}
+
+
+# Parser
+
+
+def _tokens(expression: str) -> list:
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN.match(expression, position)
+        if match is None or match.end() == position:
+            raise QueryError(f"Cannot read the query at: {expression[position:]}")
+        position = match.end()
+        if match["paren"]:
+            tokens.append(match["paren"])
+        elif match["term"]:
+            field = match["field"].lower()
+            if field not in FIELDS:
+                raise QueryError(f"Unknown field {field}. Use one of {', '.join(FIELDS)}")
+            value = match["quoted"] if match["quoted"] is not None else match["value"]
+            tokens.append(FIELDS[field](field, match["op"], value))
+        elif match["word"].upper() in ("AND", "OR", "NOT"):
+            tokens.append(match["word"].upper())
+        else:
+            raise QueryError(f"Expected field:value, got {match['word']}")
+    return tokens
+
+
+def parse(expression: str):
+    """
+    Parse a query into a tree of Term, And, Or and Not.
+
+    Terms are `field op value` with op one of `:`, `=`, `>`, `>=`, `<`, `<=`; values
+    with spaces are quoted. Terms combine with AND (also implied between adjacent
+    terms), OR and NOT, with NOT binding tightest and AND before OR, and can be
+    grouped with parentheses.
+    """
+
+    tokens = _tokens(expression)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def disjunction():
+        children = [conjunction()]
+        while peek() == "OR":
+            take()
+            children.append(conjunction())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def conjunction():
+        children = [negation()]
+        while peek() not in (None, "OR", ")"):
+            if peek() == "AND":
+                take()
+            children.append(negation())
+        return children[0] if len(children) == 1 else And(children)
+
+    def negation():
+        if peek() == "NOT":
+            take()
+            return Not(negation())
+        return operand()
+
+    def operand():
+        token = take() if peek() is not None else None
+        if token == "(":
+            node = disjunction()
+            if peek() != ")":
+                raise QueryError("Missing )")
+            take()
+            return node
+        if isinstance(token, Term):
+            return token
+        raise QueryError("Expected field:value" if token is None else f"Unexpected {token}")
+
+    if not tokens:
+        raise QueryError("Empty query")
+    tree = disjunction()
+    if peek() is not None:
+        raise QueryError(f"Unexpected {peek()}")
+    return tree
+
+
+def target_of(tree) -> str:
+    targets = {term.target for term in tree.terms()}
+    if len(targets) > 1:
+        raise QueryError("A query searches either contacts or notes, not both")
+    return targets.pop()
+
+
+# Planner
+
+
+class Plan:
+    """A step of a query plan: it yields candidate keys and estimates how many."""
+
+    estimate = 0
+
+    def run(self, book, items) -> set:
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+    def children(self) -> list:
+        return []
+
+    def explain(self, depth: int = 0) -> list[str]:
+        lines = [f"{'  ' * depth}{self.describe()}"]
+        for child in self.children():
+            lines.extend(child.explain(depth + 1))
+        return lines
+
+
+class IndexScan(Plan):
+    def __init__(self, term, access: Access):
+        self.term = term
+        self.access = access
+        self.estimate = access.estimate
+
+    def run(self, book, items):
+        return set(self.access.fetch())
+
+    def describe(self):
+        return f"Index {self.term} via {self.access.index} (est. {self.estimate:,})"
+
+
+class FullScan(Plan):
+    def __init__(self, node, total: int):
+        self.node = node
+        self.estimate = total
+
+    def run(self, book, items):
+        node = self.node
+        return {key for key, item in items.items() if node.matches(book, key, item)}
+
+    def describe(self):
+        return f"Scan all {self.estimate:,} for {self.node} (est. <= {self.estimate:,})"
+
+
+class Intersect(Plan):
+    def __init__(self, plans: list):
+        self.plans = plans  # most selective first
+        self.estimate = plans[0].estimate
+
+    def run(self, book, items):
+        keys = self.plans[0].run(book, items)
+        for plan in self.plans[1:]:
+            if not keys:
+                break
+            keys &= plan.run(book, items)
+        return keys
+
+    def describe(self):
+        return f"Intersect (est. <= {self.estimate:,})"
+
+    def children(self):
+        return self.plans
+
+
+class Union(Plan):
+    def __init__(self, plans: list, total: int):
+        self.plans = plans
+        self.estimate = min(sum(plan.estimate for plan in plans), total)
+
+    def run(self, book, items):
+        keys = set()
+        for plan in self.plans:
+            keys |= plan.run(book, items)
+        return keys
+
+    def describe(self):
+        return f"Union (est. <= {self.estimate:,})"
+
+    def children(self):
+        return self.plans
+
+
+class Filter(Plan):
+    def __init__(self, plan: Plan, predicates: list, notes: list):
+        self.plan = plan
+        self.predicates = predicates
+        self.notes = notes  # why index terms became predicates
+        self.estimate = plan.estimate
+
+    def run(self, book, items):
+        predicates = self.predicates
+        return {
+            key
+            for key in self.plan.run(book, items)
+            if all(predicate.matches(book, key, items[key]) for predicate in predicates)
+        }
+
+    def describe(self):
+        checks = " AND ".join(map(str, self.predicates))
+        return f"Filter {checks} on <= {self.plan.estimate:,} candidates"
+
+    def explain(self, depth=0):
+        indent = "  " * depth
+        lines = [f"{indent}{self.describe()}"]
+        lines.extend(f"{indent}  ({note})" for note in self.notes)
+        lines.extend(self.plan.explain(depth + 1))
+        return lines
+
+
+def plan(tree, book, total: int) -> Plan:
+    """
+    Choose how to evaluate a query tree.
+
+    A term with an index becomes an IndexScan, estimated from the index without
+    fetching anything. For AND the most selective index drives: the other indexes
+    are intersected with it if they are at most INTERSECT_FACTOR times larger, and
+    everything else (including larger indexes) is checked on the candidates only.
+    OR unions its children if all of them have an index plan. Anything else scans
+    every entry.
+    """
+
+    if isinstance(tree, Term):
+        access = tree.access(book)
+        return FullScan(tree, total) if access is None else IndexScan(tree, access)
+    if isinstance(tree, Or):
+        plans = [plan(child, book, total) for child in tree.children]
+        if any(isinstance(child, FullScan) for child in plans):
+            return FullScan(tree, total)
+        return Union(plans, total)
+    if isinstance(tree, And):
+        indexed, predicates = [], []
+        for child in tree.children:
+            child_plan = plan(child, book, total)
+            if isinstance(child_plan, FullScan):
+                predicates.append(child)
+            else:
+                indexed.append((child_plan, child))
+        if not indexed:
+            return FullScan(tree, total)
+        indexed.sort(key=lambda pair: pair[0].estimate)
+        driver = indexed[0][0]
+        plans, notes = [driver], []
+        for child_plan, child in indexed[1:]:
+            if child_plan.estimate <= INTERSECT_FACTOR * max(driver.estimate, 1):
+                plans.append(child_plan)
+            else:
+                predicates.append(child)
+                notes.append(
+                    f"index for {child} skipped: est. {child_plan.estimate:,} "
+                    f"> {INTERSECT_FACTOR} x {driver.estimate:,}"
+                )
+        chosen = plans[0] if len(plans) == 1 else Intersect(plans)
+        return Filter(chosen, predicates, notes) if predicates else chosen
+    return FullScan(tree, total)
+
+
+class Query:
+    """
+    A parsed query against one address book, ready to run or explain.
+
+    Args:
+        book (AddressBook): The book to search.
+        expression (str): The query, e.g. `tag:#work AND text:invoice AND created>2024-01-01`
+            or `has:email AND birthday:30d` (see parse and FIELDS).
+    """
+
+    def __init__(self, book, expression: str):
+        self.book = book
+        self.tree = parse(expression)
+        self.target = target_of(self.tree)
+        self.items = book.data if self.target == "contacts" else book.notes
+        self.plan = plan(self.tree, book, len(self.items))
+
+    def run(self) -> dict:
+        """Return key -> Record or Note of every match, ordered by key."""
+
+        keys = self.plan.run(self.book, self.items)
+        return {key: self.items[key] for key in sorted(keys) if key in self.items}
+
+    def explain(self) -> str:
+        header = f"Query on {self.target} ({len(self.items):,}): {self.tree}"
+        return "\n".join([header, *self.plan.explain()])
@@ -0,0 +1,93 @@
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    """
+    A writer-preferring reader-writer lock.
+
+    Any number of threads may hold the lock for reading at the same time, a writer
+    holds it alone. Waiting writers block new readers, so a steady stream of reads
+    cannot starve a write.
+
+    The lock is reentrant: a thread holding a read lock may read again, and the
+    writer may take the lock again for reading or writing (for example
+    AddressBook.add_record calling Record.add_phone). Upgrading a read lock to a
+    write lock would deadlock and raises RuntimeError instead.
+
+    Methods:
+        read():
+            Context manager holding the lock for reading.
+        write():
+            Context manager holding the lock for writing.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    def acquire_read(self):
+        local = self._local
+        if self._writer == threading.get_ident():
+            local.nested = getattr(local, "nested", 0) + 1
+            return
+        depth = getattr(local, "reads", 0)
+        with self._cond:
+            if not depth:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+            self._readers += 1
+        local.reads = depth + 1
+
+    def release_read(self):
+        local = self._local
+        if getattr(local, "nested", 0):
+            local.nested -= 1
+            return
+        local.reads -= 1
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            self._writer_depth += 1
+            return
+        if getattr(self._local, "reads", 0):
+            raise RuntimeError("Cannot upgrade a read lock to a write lock")
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        self._writer_depth -= 1
+        if not self._writer_depth:
+            with self._cond:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield self
+        finally:
+            self.release_write()
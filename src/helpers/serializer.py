@@ -0,0 +1,508 @@
+import gc
+import importlib
+import struct
+import sys
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from models.birthday import Birthday
+from models.email import Email
+from models.address import Address
+from models.name import Name
+from models.note import Note
+from models.phone import Phone
+from models.record import Record
+from models.tag import Tag
+
+SCHEMA_VERSION = 3  # 2: tags and email domains dictionary-encoded, 3: note modification dates
+READABLE_VERSIONS = (1, 2, 3)
+MAGIC = b"ABKS"
+HEADER = struct.Struct("<4sH")  # magic, schema version
+COMPRESSED_MAGIC = b"ABKZ"
+ENVELOPE = struct.Struct("<4sB")  # magic, codec id
+CODECS = {"none": 0, "zlib": 1, "lzma": 2, "bz2": 3}  # name -> codec id
+CODEC_NAMES = {codec_id: name for name, codec_id in CODECS.items()}
+LENGTH = struct.Struct("<Q")
+NONE = 0xFFFFFFFF  # string length marking a missing optional value
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+SWAP = sys.byteorder == "big"  # columns are stored little-endian
+
+_new = object.__new__
+
+
+@contextmanager
+def gc_paused():
+    """
+    Keep the cyclic garbage collector from running while many objects are created.
+
+    Decoding a large book allocates millions of objects and none of them is garbage,
+    but every allocation counts towards the next collection, which then walks all of
+    them again. Pausing collection for the load is several times faster.
+    """
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def compress(segment: bytes, codec: str = "none") -> bytes:
+    """
+    Wrap a segment in a compressed envelope.
+
+    Args:
+        segment (bytes): The segment.
+        codec (str): One of CODECS. The stdlib module of the same name is imported
+            on first use; "none" returns the segment unchanged.
+
+    Returns:
+        bytes: The envelope, or the segment itself.
+    """
+
+    if codec == "none":
+        return segment
+    return ENVELOPE.pack(COMPRESSED_MAGIC, CODECS[codec]) + importlib.import_module(
+        codec
+    ).compress(segment)
+
+
+def decompress(payload: bytes) -> bytes:
+    """Unwrap a segment written by compress (an uncompressed segment is returned as is)."""
+
+    if payload[: len(COMPRESSED_MAGIC)] != COMPRESSED_MAGIC:
+        return payload
+    _, codec_id = ENVELOPE.unpack_from(payload, 0)
+    return importlib.import_module(CODEC_NAMES[codec_id]).decompress(
+        payload[ENVELOPE.size :]
+    )
+
+
+def codec_of(payload: bytes) -> str:
+    """Return the codec of a segment from its first bytes (at least ENVELOPE.size)."""
+
+    if payload[: len(COMPRESSED_MAGIC)] != COMPRESSED_MAGIC:
+        return "none"
+    return CODEC_NAMES[ENVELOPE.unpack_from(payload, 0)[1]]
+
+
+class _Writer:
+    def __init__(self):
+        self.chunks = [HEADER.pack(MAGIC, SCHEMA_VERSION)]
+
+    def raw(self, data: bytes):
+        self.chunks.append(LENGTH.pack(len(data)))
+        self.chunks.append(data)
+
+    def ints(self, typecode: str, values):
+        column = values if isinstance(values, array) else array(typecode, values)
+        if SWAP:
+            column.byteswap()
+        self.raw(column.tobytes())
+
+    def strings(self, values: list):
+        self.ints("I", map(len, values))
+        self.raw("".join(values).encode("utf-8", "surrogatepass"))
+
+    def optional_strings(self, values: list):
+        self.ints("I", [NONE if value is None else len(value) for value in values])
+        self.raw(
+            "".join(value for value in values if value is not None).encode(
+                "utf-8", "surrogatepass"
+            )
+        )
+
+    def dictionary(self, values: list):
+        """Write repeated values once, followed by the index of each value."""
+
+        codes = {}
+        indexes = array("I", [codes.setdefault(value, len(codes)) for value in values])
+        self.strings(list(codes))
+        self.ints("I", indexes)
+
+    def getvalue(self, codec: str = "none") -> bytes:
+        return compress(b"".join(self.chunks), codec)
+
+
+class _Reader:
+    def __init__(self, payload: bytes):
+        payload = decompress(payload)
+        magic, version = HEADER.unpack_from(payload, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an address book segment")
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported address book schema version {version}")
+        self.version = version
+        self.view = memoryview(payload)
+        self.position = HEADER.size
+
+    def raw(self) -> memoryview:
+        (size,) = LENGTH.unpack_from(self.view, self.position)
+        start = self.position + LENGTH.size
+        self.position = start + size
+        return self.view[start : self.position]
+
+    def ints(self, typecode: str) -> array:
+        column = array(typecode)
+        column.frombytes(self.raw())
+        if SWAP:
+            column.byteswap()
+        return column
+
+    def strings(self) -> list:
+        lengths = self.ints("I")
+        text = str(self.raw(), "utf-8", "surrogatepass")
+        ends = list(accumulate(lengths))
+        return list(map(text.__getitem__, map(slice, [0] + ends[:-1], ends)))
+
+    def optional_strings(self) -> list:
+        lengths = self.ints("I")
+        text = str(self.raw(), "utf-8", "surrogatepass")
+        values = []
+        position = 0
+        for length in lengths:
+            if length == NONE:
+                values.append(None)
+            else:
+                values.append(text[position : position + length])
+                position += length
+        return values
+
+    def dictionary(self) -> list:
+        table = self.strings()
+        return list(map(table.__getitem__, self.ints("I")))
+
+
+def _fields(cls, values) -> list:
+    def make(value):
+        field = _new(cls)
+        field.value = value
+        return field
+
+    return list(map(make, values))
+
+
+def _optional_fields(cls, values) -> list:
+    def make(value):
+        if value is None:
+            return None
+        field = _new(cls)
+        field.value = value
+        return field
+
+    return list(map(make, values))
+
+
+def _split(items: list, counts: array) -> list:
+    ends = list(accumulate(counts))
+    return list(map(items.__getitem__, map(slice, [0] + ends[:-1], ends)))
+
+
+def _write_generations(writer: _Writer, generations: dict):
+    writer.strings(list(generations))
+    writer.ints("Q", generations.values())
+
+
+def dumps_contacts(records: dict, generations: dict, codec: str = "none") -> bytes:
+    """
+    Encode contacts and their save generations as a columnar segment.
+
+    Every attribute of the records is written as one column: names, phone counts
+    and the flattened phones, birthdays as date ordinals (0 for none), emails and
+    addresses as optional strings, with the email domains dictionary-encoded.
+    Strings are stored as a length column and one UTF-8 blob, so decoding is a
+    single decode and a slice per value.
+
+    Args:
+        records (dict): Contact name -> Record.
+        generations (dict): Contact name -> generation, tombstones included.
+        codec (str): Compression codec (see compress).
+
+    Returns:
+        bytes: The segment.
+    """
+
+    values = list(records.values())
+    writer = _Writer()
+    writer.strings([record.name.value for record in values])
+    writer.ints("I", [len(record.phones) for record in values])
+    writer.strings([phone.value for record in values for phone in record.phones])
+    writer.ints(
+        "i",
+        [
+            record.birthday.value.toordinal() if record.birthday else 0
+            for record in values
+        ],
+    )
+    emails = [record.email.value.rpartition("@") if record.email else None for record in values]
+    writer.optional_strings([email[0] if email else None for email in emails])
+    writer.dictionary([email[2] for email in emails if email])
+    writer.optional_strings(
+        [record.address.value if record.address else None for record in values]
+    )
+    _write_generations(writer, generations)
+    return writer.getvalue(codec)
+
+
+def read_contact_columns(payload: bytes) -> dict:
+    """
+    Decode the columns of a segment written by dumps_contacts without building records.
+
+    The columns are plain strings, lists and arrays, cheap to send between processes;
+    contacts_from_columns turns them into records.
+    """
+
+    reader = _Reader(payload)
+    columns = {
+        "names": reader.strings(),
+        "phone_counts": reader.ints("I"),
+        "phones": reader.strings(),
+        "birthdays": reader.ints("i"),
+    }
+    emails = reader.optional_strings()
+    if reader.version >= 2:
+        domains = iter(reader.dictionary())
+        emails = [
+            None if local is None else f"{local}@{next(domains)}" for local in emails
+        ]
+    columns["emails"] = emails
+    columns["addresses"] = reader.optional_strings()
+    columns["generations"] = (reader.strings(), reader.ints("Q"))
+    return columns
+
+
+def contacts_from_columns(columns: dict) -> tuple[dict, dict]:
+    """Build the records of columns decoded by read_contact_columns."""
+
+    names = columns["names"]
+    phones = _split(_fields(Phone, columns["phones"]), columns["phone_counts"])
+    from_ordinal = datetime.fromordinal
+
+    def birthday(ordinal):
+        if not ordinal:
+            return None
+        field = _new(Birthday)
+        field.value = from_ordinal(ordinal)
+        return field
+
+    birthdays = list(map(birthday, columns["birthdays"]))
+    emails = _optional_fields(Email, columns["emails"])
+    addresses = _optional_fields(Address, columns["addresses"])
+
+    def record(state):
+        item = _new(Record)
+        item.__dict__ = state
+        return item
+
+    records = dict(
+        zip(
+            names,
+            map(
+                record,
+                [
+                    {
+                        "name": name,
+                        "phones": record_phones,
+                        "birthday": record_birthday,
+                        "email": email,
+                        "address": address,
+                    }
+                    for name, record_phones, record_birthday, email, address in zip(
+                        _fields(Name, names), phones, birthdays, emails, addresses
+                    )
+                ],
+            ),
+        )
+    )
+    return records, dict(zip(*columns["generations"]))
+
+
+def loads_contacts(payload: bytes) -> tuple[dict, dict]:
+    """
+    Decode a segment written by dumps_contacts.
+
+    Returns:
+        tuple[dict, dict]: Contact name -> Record, and contact name -> generation.
+    """
+
+    return contacts_from_columns(read_contact_columns(payload))
+
+
+def dumps_notes(
+    notes: dict, generations: dict, bodies: bool = True, codec: str = "none"
+) -> bytes:
+    """
+    Encode notes and their save generations as a columnar segment.
+
+    Args:
+        notes (dict): Title -> Note.
+        generations (dict): Title -> generation, tombstones included.
+        bodies (bool): Include the note contents. Without them only titles, tags
+            and creation and modification dates are written (see dumps_bodies).
+        codec (str): Compression codec (see compress).
+
+    Returns:
+        bytes: The segment.
+    """
+
+    values = list(notes.values())
+    writer = _Writer()
+    writer.ints("B", [bodies])
+    writer.strings([note.title for note in values])
+    if bodies:
+        writer.strings([note.value for note in values])
+    writer.ints(
+        "q", [(note.creation_date - EPOCH) // MICROSECOND for note in values]
+    )
+    writer.ints(
+        "q", [(note.modification_date - EPOCH) // MICROSECOND for note in values]
+    )
+    writer.ints("I", [len(note.tags) for note in values])
+    writer.dictionary([tag.value for note in values for tag in note.tags])
+    _write_generations(writer, generations)
+    return writer.getvalue(codec)
+
+
+def read_note_columns(payload: bytes) -> dict:
+    """
+    Decode the columns of a segment written by dumps_notes without building notes.
+
+    Like read_contact_columns, for notes_from_columns. `contents` is None for a
+    segment written without bodies.
+    """
+
+    reader = _Reader(payload)
+    (bodies,) = reader.ints("B")
+    columns = {"titles": reader.strings()}
+    columns["contents"] = reader.strings() if bodies else None
+    columns["created"] = reader.ints("q")
+    columns["modified"] = reader.ints("q") if reader.version >= 3 else columns["created"]
+    columns["tag_counts"] = reader.ints("I")
+    columns["tags"] = reader.dictionary() if reader.version >= 2 else reader.strings()
+    columns["generations"] = (reader.strings(), reader.ints("Q"))
+    return columns
+
+
+def notes_from_columns(columns: dict) -> tuple[dict, dict]:
+    """
+    Build the notes of columns decoded by read_note_columns.
+
+    Notes of a segment written without bodies have no `value` until one is set or
+    a `body_loader` is attached (see models.note.LazyBody).
+    """
+
+    titles = columns["titles"]
+    contents = columns["contents"]
+    created = [EPOCH + MICROSECOND * stamp for stamp in columns["created"]]
+    if columns["modified"] is columns["created"]:
+        modified = created
+    else:
+        modified = [EPOCH + MICROSECOND * stamp for stamp in columns["modified"]]
+    tags = _split(_fields(Tag, columns["tags"]), columns["tag_counts"])
+
+    def note(state):
+        item = _new(Note)
+        item.__dict__ = state
+        return item
+
+    if contents is not None:
+        states = [
+            {
+                "value": content,
+                "title": title,
+                "creation_date": date,
+                "modification_date": changed,
+                "tags": note_tags,
+            }
+            for title, content, date, changed, note_tags in zip(
+                titles, contents, created, modified, tags
+            )
+        ]
+    else:
+        states = [
+            {
+                "title": title,
+                "creation_date": date,
+                "modification_date": changed,
+                "tags": note_tags,
+            }
+            for title, date, changed, note_tags in zip(titles, created, modified, tags)
+        ]
+    return dict(zip(titles, map(note, states))), dict(zip(*columns["generations"]))
+
+
+def loads_notes(payload: bytes) -> tuple[dict, dict]:
+    """
+    Decode a segment written by dumps_notes.
+
+    Notes of a segment written without bodies have no `value` until one is set or
+    a `body_loader` is attached (see models.note.LazyBody).
+
+    Returns:
+        tuple[dict, dict]: Title -> Note, and title -> generation.
+    """
+
+    return notes_from_columns(read_note_columns(payload))
+
+
+def dumps_bodies(bodies: dict, codec: str = "none") -> bytes:
+    """Encode note contents (title -> content) as a segment."""
+
+    writer = _Writer()
+    writer.strings(list(bodies))
+    writer.strings(list(bodies.values()))
+    return writer.getvalue(codec)
+
+
+def loads_bodies(payload: bytes) -> dict:
+    """Decode a segment written by dumps_bodies."""
+
+    reader = _Reader(payload)
+    titles = reader.strings()
+    return dict(zip(titles, reader.strings()))
+
+
+def is_segment(payload: bytes) -> bool:
+    """Tell segments of this format from pickles written by earlier versions."""
+
+    return payload[: len(MAGIC)] in (MAGIC, COMPRESSED_MAGIC)
+
+
+def dumps_sorted_index(keys: array, entries: list) -> bytes:
+    """Encode the columns of a SortedIndex: its keys array and the entries in key order."""
+
+    writer = _Writer()
+    writer.ints(keys.typecode, array(keys.typecode, keys))  # a copy, ints() may byteswap it
+    writer.strings(entries)
+    return writer.getvalue()
+
+
+def loads_sorted_index(payload: bytes, typecode: str) -> tuple[array, list]:
+    """Decode a segment written by dumps_sorted_index."""
+
+    reader = _Reader(payload)
+    return reader.ints(typecode), reader.strings()
+
+
+def dumps_tag_index(tags: dict) -> bytes:
+    """Encode the tags of a TagIndex (title -> tuple of tags), with the tags dictionary-encoded."""
+
+    writer = _Writer()
+    writer.strings(list(tags))
+    writer.ints("I", map(len, tags.values()))
+    writer.dictionary([tag for note_tags in tags.values() for tag in note_tags])
+    return writer.getvalue()
+
+
+def loads_tag_index(payload: bytes) -> dict:
+    """Decode a segment written by dumps_tag_index."""
+
+    reader = _Reader(payload)
+    titles = reader.strings()
+    counts = reader.ints("I")
+    return dict(zip(titles, map(tuple, _split(reader.dictionary(), counts))))
@@ -0,0 +1,294 @@
+import json
+import os
+import pickle
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from constants.constants import SHARD_COUNT
+from helpers.serializer import (
+    SCHEMA_VERSION,
+    contacts_from_columns,
+    dumps_bodies,
+    dumps_contacts,
+    dumps_notes,
+    gc_paused,
+    is_segment,
+    loads_bodies,
+    notes_from_columns,
+    read_contact_columns,
+    read_note_columns,
+)
+from models.note import Note
+
+MANIFEST = "manifest.json"
+KINDS = ("contacts", "notes")
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Return the shard of a contact name or note title (stable across processes)."""
+
+    return zlib.crc32(key.encode()) % shards
+
+
+def shard_path(directory, kind: str, index: int, form=SCHEMA_VERSION) -> str:
+    suffix = ".pkl" if form is None else ".seg"  # manifests of pickled shards have no format
+    return os.path.join(directory, f"{kind}-{index:03d}{suffix}")
+
+
+def read_manifest(directory) -> dict | None:
+    """
+    Read the manifest of a sharded book.
+
+    The manifest is small: the book generation, the number of shards, the
+    generation each shard was last written at and the segment format (absent
+    for books whose shards were pickled).
+
+    Returns:
+        dict | None: The manifest, or None if the directory has none yet.
+    """
+
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class BodySegment:
+    """
+    The note bodies of one notes shard, read from disk on first use.
+
+    Notes shards hold titles, tags and creation dates only; the bodies are kept in
+    a `bodies-NNN.seg` file next to them and loaded for the whole shard the first
+    time any of its notes is read (see models.note.LazyBody). A body read this way
+    reflects the last save of the shard, which may be newer than the metadata if
+    another session saved in between. load(reload=True) reads the file again, for
+    a body that the cached bodies lack.
+
+    Subclasses read the bodies from elsewhere by overriding _read
+    (see helpers.data.DataFileBodies).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.bodies = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return {}
+        if is_segment(payload):
+            return loads_bodies(payload)
+        return pickle.loads(payload)  # written before the segment format
+
+    def load(self, reload: bool = False) -> dict:
+        with self._lock:
+            if self.bodies is None or reload:
+                with gc_paused():
+                    self.bodies = self._read()
+            return self.bodies
+
+
+def _read_columns(kind: str, path) -> tuple[dict | None, bytes | None]:
+    """
+    Read a shard file and decode its columns, in a worker process of read_shards.
+
+    Returns:
+        tuple: The columns (see helpers.serializer.read_contact_columns), or None
+            and the payload of a shard pickled by earlier versions.
+    """
+
+    with open(path, "rb") as f:
+        payload = f.read()
+    if not is_segment(payload):
+        return None, payload
+    if kind == "contacts":
+        return read_contact_columns(payload), None
+    return read_note_columns(payload), None
+
+
+def _build(kind: str, columns: dict | None, payload: bytes | None, bodies_path):
+    """Turn the decoded columns of a shard into records or notes, with lazy note bodies."""
+
+    if columns is None:
+        entries, generations = pickle.loads(payload)  # written before the segment format
+    elif kind == "contacts":
+        entries, generations = contacts_from_columns(columns)
+    else:
+        entries, generations = notes_from_columns(columns)
+    if kind == "contacts":
+        return entries, generations
+    segment = BodySegment(bodies_path)
+    notes = {}
+    for title, state in entries.items():
+        if isinstance(state, Note):
+            if "value" in state.__dict__:  # written before bodies were split off
+                notes[title] = state
+                continue
+            note = notes[title] = state
+        else:  # pickled metadata
+            note = notes[title] = Note.__new__(Note)
+            note.__setstate__(state)
+        note.body_loader = (segment, title)
+    return notes, generations
+
+
+def read_shards(directory, manifest: dict, since: int = -1, workers: int | None = None) -> dict:
+    """
+    Read the shards written after generation `since` into an AddressBook state.
+
+    Reading, decompressing and decoding the columns of a shard is spread over a
+    process pool of up to `workers` processes (one per CPU by default), so it uses
+    several cores; the records and notes are built from the columns in this
+    process, overlapping with the workers, and merged into single dictionaries.
+    With one worker, one shard or when reading back the shards of a merge
+    (`since` given), everything runs in this process. Note bodies are not read (see
+    BodySegment). Shards pickled by earlier versions are still read.
+
+    Args:
+        directory (str): The sharded book.
+        manifest (dict): Its manifest.
+        since (int): Skip shards whose generation is not newer. -1 reads all.
+        workers (int | None): Most worker processes. Defaults to the CPU count.
+
+    Returns:
+        dict: data, notes, generation, contact_generations and note_generations.
+    """
+
+    form = manifest.get("format")
+    shards = [
+        (kind, index)
+        for kind in KINDS
+        for index, generation in enumerate(manifest[kind])
+        if generation > since
+    ]
+    kinds = [kind for kind, _ in shards]
+    paths = [shard_path(directory, kind, index, form) for kind, index in shards]
+    state = {
+        "data": {},
+        "notes": {},
+        "generation": manifest["generation"],
+        "contact_generations": {},
+        "note_generations": {},
+    }
+    workers = min(len(shards), workers or os.cpu_count() or 1)
+    pool = ProcessPoolExecutor(max_workers=workers) if since < 0 and workers > 1 else None
+    try:
+        decoded = (pool.map if pool else map)(_read_columns, kinds, paths)
+        for (kind, index), (columns, payload) in zip(shards, decoded):
+            entries, generations = _build(
+                kind, columns, payload, shard_path(directory, "bodies", index, form)
+            )
+            if kind == "contacts":
+                state["data"].update(entries)
+                state["contact_generations"].update(generations)
+            else:
+                state["notes"].update(entries)
+                state["note_generations"].update(generations)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return state
+
+
+def snapshot_shards(book, directory, shards=None, codec=None) -> list[tuple[str, bytes]]:
+    """
+    Serialize the shards of a book that changed since the last save.
+
+    Must be called while holding the exclusive FileLock of the directory. If the
+    manifest generation moved, only the shards written since this book's generation
+    are read back and merged (see AddressBook.merge).
+
+    Args:
+        book (AddressBook): The book to save.
+        directory (str): The sharded book.
+        shards (int | None): Number of contact and note shards. Defaults to the
+            current layout, or SHARD_COUNT for a new one. A different number, or
+            an older segment format, rewrites every shard.
+        codec (str | None): Compression codec of the segments (see
+            helpers.serializer.compress). Defaults to the current one; a different
+            codec rewrites every shard.
+
+    Returns:
+        list: (path, payload) pairs, the manifest after the shards. Files of a
+            previous layout follow it with a payload of None, to be removed.
+    """
+
+    manifest = read_manifest(directory)
+    if manifest is not None and manifest["generation"] != book.generation:
+        other = type(book)()
+        other.__setstate__(read_shards(directory, manifest, since=book.generation))
+        book.merge(other)
+
+    shards = shards or (manifest["shards"] if manifest else SHARD_COUNT)
+    codec = codec or (manifest.get("codec", "none") if manifest else "none")
+    rewrite = (
+        manifest is None
+        or manifest["shards"] != shards
+        or manifest.get("format") != SCHEMA_VERSION
+        or manifest.get("codec", "none") != codec
+    )
+    dirty = {
+        "contacts": {shard_of(name, shards) for name in book.changed_contacts},
+        "notes": {shard_of(title, shards) for title in book.changed_notes},
+    }
+    generation = max(manifest["generation"] if manifest else 0, book.generation) + 1
+    book.stamp_changes(generation)
+
+    sources = {
+        "contacts": (book.data, book.contact_generations),
+        "notes": (book.notes, book.note_generations),
+    }
+    files = []
+    new_manifest = {"generation": generation, "shards": shards}
+    for kind, (entries, generations) in sources.items():
+        indexes = set(range(shards)) if rewrite else dirty[kind]
+        buckets = {index: ({}, {}) for index in indexes}
+        if buckets:
+            for key, value in entries.items():
+                bucket = buckets.get(shard_of(key, shards))
+                if bucket is not None:
+                    bucket[0][key] = value
+            for key, value in generations.items():
+                bucket = buckets.get(shard_of(key, shards))
+                if bucket is not None:
+                    bucket[1][key] = value
+        for index, (bucket_entries, bucket_generations) in buckets.items():
+            if kind == "notes":
+                files.append(
+                    (
+                        shard_path(directory, "bodies", index),
+                        dumps_bodies(
+                            {title: note.value for title, note in bucket_entries.items()},
+                            codec,
+                        ),
+                    )
+                )
+                payload = dumps_notes(
+                    bucket_entries, bucket_generations, bodies=False, codec=codec
+                )
+            else:
+                payload = dumps_contacts(bucket_entries, bucket_generations, codec)
+            files.append((shard_path(directory, kind, index), payload))
+        shard_generations = [0] * shards if rewrite else list(manifest[kind])
+        for index in indexes:
+            shard_generations[index] = generation
+        new_manifest[kind] = shard_generations
+    new_manifest["format"] = SCHEMA_VERSION
+    new_manifest["codec"] = codec
+    files.append(
+        (os.path.join(directory, MANIFEST), json.dumps(new_manifest).encode())
+    )
+    if rewrite and manifest is not None:
+        written = {path for path, _ in files}
+        form = manifest.get("format")
+        for index in range(manifest["shards"]):
+            for kind in ("contacts", "notes", "bodies"):
+                path = shard_path(directory, kind, index, form)
+                if path not in written:
+                    files.append((path, None))
+    return files
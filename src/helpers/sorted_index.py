@@ -0,0 +1,135 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class SortedIndex:
+    """
+    Entries of an address book sorted by an integer key.
+
+    `keys` holds the keys in ascending order in an `array` column and `entries` the
+    contact names or note titles in the same order; `positions` maps an entry to
+    its key. A range of keys is two bisections and a slice, O(log n + k) for k
+    matches.
+
+    Subclasses choose the array typecode and say which entries of the book are
+    indexed under which key (`_items`, `key`). The index is built on first use,
+    patched by AddressBook.mark_changed and rebuilt after a merge. A patch is one
+    insertion or removal in the sorted columns (a memory move, no re-sort).
+    """
+
+    typecode = "q"
+
+    def __init__(self):
+        self.built = False
+        self.keys = array(self.typecode)
+        self.entries = []
+        self.positions = {}  # entry -> key
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_lock")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def invalidate(self):
+        self.built = False
+
+    def _items(self, book) -> dict:
+        """Return entry -> model object for every entry of the book that may be indexed."""
+
+        raise NotImplementedError
+
+    def key(self, item) -> int | None:
+        """Return the key of a model object, or None to leave it out."""
+
+        raise NotImplementedError
+
+    def build(self, book):
+        """Sort the entries of the book unless the index is up to date."""
+
+        with self._lock:
+            if self.built:
+                return
+            items = self._items(book)
+            pairs = sorted(
+                (key, entry)
+                for entry, key in zip(items, map(self.key, items.values()))
+                if key is not None
+            )
+            self.keys = array(self.typecode, [key for key, _ in pairs])
+            self.entries = [entry for _, entry in pairs]
+            self.positions = dict(zip(self.entries, self.keys))
+            self.built = True
+
+    def restore(self, keys: array, entries: list):
+        """Take the columns of a built index saved earlier (see helpers.index_snapshot)."""
+
+        with self._lock:
+            self.keys, self.entries = keys, entries
+            self.positions = dict(zip(entries, keys))
+            self.built = True
+
+    def _insert(self, entry, key: int):
+        position = bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.entries.insert(position, entry)
+        self.positions[entry] = key
+
+    def _remove(self, entry):
+        key = self.positions.pop(entry, None)
+        if key is None:
+            return
+        start = bisect_left(self.keys, key)
+        position = self.entries.index(entry, start, bisect_right(self.keys, key))
+        del self.keys[position]
+        del self.entries[position]
+
+    def update(self, book, entry, item):
+        """Move one added, changed or deleted entry to its place in the index."""
+
+        if not self.built:
+            return
+        key = self.key(item) if self._items(book).get(entry) is item else None
+        if self.positions.get(entry) == key:
+            return
+        self._remove(entry)
+        if key is not None:
+            self._insert(entry, key)
+
+    def between(self, low: int, high: int, offset: int = 0, limit: int | None = None) -> list:
+        """
+        Return the entries with keys from low to high, both included, in key order.
+
+        Args:
+            low (int): The smallest key.
+            high (int): The largest key.
+            offset (int): Matches to skip, for paging.
+            limit (int | None): Most matches to return; all by default.
+
+        Call build() first.
+        """
+
+        start = bisect_left(self.keys, low) + offset
+        end = bisect_right(self.keys, high)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.entries[start:end]
+
+    def count(self, low: int, high: int) -> int:
+        """Return the number of entries with keys from low to high without listing them."""
+
+        return max(bisect_right(self.keys, high) - bisect_left(self.keys, low), 0)
+
+    def last(self, count: int, offset: int = 0) -> list:
+        """Return up to `count` entries with the largest keys, largest first, skipping `offset`."""
+
+        end = max(len(self.entries) - offset, 0)
+        return self.entries[max(end - count, 0) : end][::-1]
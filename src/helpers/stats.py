@@ -0,0 +1,156 @@
+from time import perf_counter
+
+PHASES = ("prompt", "model", "render")
+SUB_BUCKET_BITS = 5
+PROFILE_LINES = 25
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram with log-linear buckets.
+
+    Values are recorded in whole microseconds. Values below 2**SUB_BUCKET_BITS are
+    counted exactly, larger values are grouped into buckets whose width doubles with
+    every power of two, so the relative error of any percentile stays below 1/32
+    while the memory used is bounded by the number of distinct magnitudes.
+
+    Methods:
+        record(seconds):
+            Adds a single measurement to the histogram.
+        percentile(percent):
+            Returns the value (in seconds) at the given percentile.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.max = 0
+
+    def record(self, seconds: float):
+        value = max(int(seconds * 1_000_000), 0)
+        shift = max(value.bit_length() - SUB_BUCKET_BITS, 0)
+        bucket = (value >> shift) << shift
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        target = max(self.count * percent / 100, 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return min(bucket, self.max) / 1_000_000
+        return self.max / 1_000_000
+
+
+class _Phase:
+    """Context manager adding the elapsed time of its block to the current command phase."""
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self):
+        if self.stats.enabled:
+            self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        current = self.stats.current
+        if self.stats.enabled and current is not None:
+            current[self.name] += perf_counter() - self.started
+        return False
+
+
+class _Command:
+    """Context manager timing one dispatched command and optionally profiling it."""
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.started = 0.0
+        self.profiler = None
+
+    def __enter__(self):
+        stats = self.stats
+        if stats.profile_command == self.name:
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if stats.enabled:
+            stats.current = dict.fromkeys(PHASES, 0.0)
+            self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        stats = self.stats
+        if stats.enabled and stats.current is not None:
+            stats.record(self.name, perf_counter() - self.started, stats.current)
+            stats.current = None
+        if self.profiler is not None:
+            self.profiler.disable()
+            stats.dump_profile(self.profiler)
+        return False
+
+
+class CommandStats:
+    """
+    Collects per-command latency split into prompt, model and render phases.
+
+    The instrumentation is off by default. While disabled, entering a command or a
+    phase costs a single attribute check, so the REPL can be wrapped unconditionally.
+
+    Attributes:
+        enabled (bool): Whether latency is recorded.
+        profile_command (str | None): Command to run under cProfile, if any.
+        profile_output (str | None): File for raw profile data; printed to stdout when None.
+        histograms (dict): Command name -> {"total" | phase: LatencyHistogram}.
+        errors (dict): Command name -> number of errors handled by input_error.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.profile_command = None
+        self.profile_output = None
+        self.histograms = {}
+        self.errors = {}
+        self.current = None
+
+    def command(self, name: str) -> _Command:
+        return _Command(self, name)
+
+    def phase(self, name: str) -> _Phase:
+        return _Phase(self, name)
+
+    def record(self, name: str, total: float, phases: dict):
+        histograms = self.histograms.get(name)
+        if histograms is None:
+            histograms = {key: LatencyHistogram() for key in ("total", *PHASES)}
+            self.histograms[name] = histograms
+        phases["model"] = max(total - phases["prompt"] - phases["render"], 0.0)
+        histograms["total"].record(total)
+        for phase, elapsed in phases.items():
+            histograms[phase].record(elapsed)
+
+    def record_error(self, name: str):
+        if self.enabled:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def dump_profile(self, profiler):
+        if self.profile_output:
+            profiler.dump_stats(self.profile_output)
+            print(f"\nProfile of '{self.profile_command}' saved to {self.profile_output}\n")
+            return
+        import pstats
+
+        pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(
+            PROFILE_LINES
+        )
+
+
+stats = CommandStats()
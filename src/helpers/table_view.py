@@ -1,6 +1,3 @@
-from prettytable import PrettyTable
-
-
 def get_contacts_table(contacts):
     """
     Create a formatted table of contacts using PrettyTable.
@@ -11,6 +8,8 @@ def get_contacts_table(contacts):
     Returns:
         PrettyTable: Formatted table of contacts
     """
+    from prettytable import PrettyTable
+
     table = PrettyTable()
     table.field_names = ["Name", "Phone(s)", "Birthday", "Email", "Address"]
 
@@ -43,12 +42,15 @@ def get_notes_table(notes):
         PrettyTable: Formatted table of notes
     """
 
+    from prettytable import PrettyTable
+
     table = PrettyTable()
-    table.field_names = ["Title", "Content", "Tags", "Created"]
+    table.field_names = ["Title", "Content", "Tags", "Created", "Modified"]
 
     for note in notes.values():
         tags = ', '.join(tag.value for tag in note.tags) if note.tags else ''
         created_at = note.creation_date.strftime("%Y-%m-%d %H:%M:%S")
+        modified_at = note.modification_date.strftime("%Y-%m-%d %H:%M:%S")
 
         content = note.value
         if len(content) > 50:
@@ -58,7 +60,42 @@ def get_notes_table(notes):
             note.title,
             content,
             tags,
-            created_at
+            created_at,
+            modified_at
+        ])
+
+    table.align = 'l'
+    table.max_width = 50
+    return table
+
+def get_similar_notes_table(similar):
+    """
+    Create a formatted table of near-duplicate notes using PrettyTable.
+
+    Args:
+        similar (list): List of (note, estimated similarity) pairs
+
+    Returns:
+        PrettyTable: Formatted table of notes
+    """
+
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = ["Title", "Similarity", "Content", "Tags"]
+
+    for note, score in similar:
+        tags = ', '.join(tag.value for tag in note.tags) if note.tags else ''
+
+        content = note.value
+        if len(content) > 50:
+            content = content[:47] + "..."
+
+        table.add_row([
+            note.title,
+            f"{score:.0%}",
+            content,
+            tags
         ])
 
     table.align = 'l'
@@ -75,6 +112,8 @@ def get_birthdays_table(birthdays):
     Returns:
         PrettyTable: Formatted table of birthdays
     """
+    from prettytable import PrettyTable
+
     table = PrettyTable()
     table.field_names = ["Name", "Birthday"]
 
@@ -98,6 +137,8 @@ def get_phone_table(phones):
     Returns:
         PrettyTable: Formatted table of phones
     """
+    from prettytable import PrettyTable
+
     table = PrettyTable()
     table.field_names = ["Phone(s)"]
 
@@ -118,6 +159,8 @@ def get_birthday_table(contact):
     Returns:
         PrettyTable: Formatted table of birthday
     """
+    from prettytable import PrettyTable
+
     table = PrettyTable()
     table.field_names = ["Name", "Birthday"]
 
@@ -128,4 +171,165 @@ def get_birthday_table(contact):
 
     table.align = 'l'
     table.max_width = 50
-    return table
\ No newline at end of file
+    return table
+
+def get_stats_table(histograms, errors):
+    """
+    Create a formatted table of per-command latency using PrettyTable.
+
+    Args:
+        histograms (dict): Command name -> dict of LatencyHistogram per phase
+        errors (dict): Command name -> number of handled errors
+
+    Returns:
+        PrettyTable: Formatted table of latency percentiles in milliseconds
+    """
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = [
+        "Command", "Calls", "Errors", "Total p50", "Total p99", "Max",
+        "Prompt p50", "Model p50", "Model p99", "Render p50"
+    ]
+
+    for command, phases in sorted(histograms.items()):
+        total = phases["total"]
+        table.add_row([
+            command,
+            total.count,
+            errors.get(command, 0),
+            f"{total.percentile(50) * 1000:.2f}",
+            f"{total.percentile(99) * 1000:.2f}",
+            f"{total.max / 1000:.2f}",
+            f"{phases['prompt'].percentile(50) * 1000:.2f}",
+            f"{phases['model'].percentile(50) * 1000:.2f}",
+            f"{phases['model'].percentile(99) * 1000:.2f}",
+            f"{phases['render'].percentile(50) * 1000:.2f}"
+        ])
+
+    table.align = 'l'
+    table.max_width = 50
+    return table
+
+def get_memory_table(report):
+    """
+    Create a formatted table of memory usage per subsystem using PrettyTable.
+
+    Args:
+        report (list): List of subsystem dictionaries from get_memory_report
+
+    Returns:
+        PrettyTable: Formatted table of retained bytes
+    """
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = ["Subsystem", "Items", "Bytes", "Bytes/item"]
+
+    for row in report:
+        table.add_row([
+            row["name"],
+            row["items"],
+            f"{row['bytes']:,}",
+            f"{row['bytes_per_item']:,.1f}"
+        ])
+
+    table.align = 'l'
+    table.max_width = 50
+    return table
+
+def get_store_table(counters):
+    """
+    Create a formatted table of disk store cache counters using PrettyTable.
+
+    Args:
+        counters (dict): Table name -> counters, as returned by DiskStore.counters
+
+    Returns:
+        PrettyTable: Formatted table of cache hits and misses
+    """
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = [
+        "Table", "Entries", "In memory", "Capacity", "Hits", "Misses", "Hit rate",
+        "Evictions", "Writes", "Filtered"
+    ]
+
+    for name, row in counters.items():
+        lookups = row['hits'] + row['misses']
+        table.add_row([
+            name,
+            f"{row['entries']:,}",
+            f"{row['cached']:,}",
+            f"{row['capacity']:,}",
+            f"{row['hits']:,}",
+            f"{row['misses']:,}",
+            f"{row['hits'] / lookups:.1%}" if lookups else '',
+            f"{row['evictions']:,}",
+            f"{row['writes']:,}",
+            f"{row['filtered']:,}"
+        ])
+
+    table.align = 'l'
+    table.max_width = 50
+    return table
+
+def get_filter_table(filters):
+    """
+    Create a formatted table of Bloom filter statistics using PrettyTable.
+
+    Args:
+        filters (dict): Filter name -> statistics, as returned by DiskStore.filter_stats
+
+    Returns:
+        PrettyTable: Formatted table of filter sizes and false-positive rates
+    """
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = [
+        "Filter", "Items", "Capacity", "Bytes", "Hashes", "FP rate (est.)", "FP rate (seen)"
+    ]
+
+    for name, row in filters.items():
+        observed = row['observed_fpr']
+        table.add_row([
+            name,
+            f"{row['items']:,}",
+            f"{row['capacity']:,}",
+            f"{row['bytes']:,}",
+            row['hashes'],
+            f"{row['estimated_fpr']:.3%}",
+            f"{observed:.3%}" if observed is not None else ''
+        ])
+
+    table.align = 'l'
+    table.max_width = 50
+    return table
+
+def get_duplicates_table(proposals):
+    """
+    Create a formatted table of proposed contact merges using PrettyTable.
+
+    Args:
+        proposals (list): List of MergeProposal from find_duplicates
+
+    Returns:
+        PrettyTable: Formatted table of merges
+    """
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = ["Keep", "Merge into it", "Matched on"]
+
+    for proposal in proposals:
+        table.add_row([
+            proposal.keep,
+            '; '.join(proposal.duplicates),
+            ', '.join(sorted(proposal.reasons))
+        ])
+
+    table.align = 'l'
+    table.max_width = 50
+    return table
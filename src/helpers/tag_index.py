@@ -0,0 +1,80 @@
+import threading
+
+
+class TagIndex:
+    """
+    Note titles by tag.
+
+    `titles` maps a tag to the set of titles of the notes carrying it, and `tags`
+    a title to the tags it was indexed under, so a changed note can be taken out
+    of its old sets. Like the date indexes, the index is built on first use,
+    patched by AddressBook.mark_changed and rebuilt after a merge.
+    """
+
+    def __init__(self):
+        self.built = False
+        self.titles = {}  # tag -> set of titles
+        self.tags = {}  # title -> tuple of tags
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_lock")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.titles)
+
+    def invalidate(self):
+        self.built = False
+
+    def _add(self, title: str, tags: tuple):
+        if tags:
+            self.tags[title] = tags
+            for tag in tags:
+                self.titles.setdefault(tag, set()).add(title)
+
+    def _remove(self, title: str):
+        for tag in self.tags.pop(title, ()):
+            titles = self.titles[tag]
+            titles.discard(title)
+            if not titles:
+                del self.titles[tag]
+
+    def build(self, book):
+        """Collect the tags of the book unless the index is up to date."""
+
+        with self._lock:
+            if self.built:
+                return
+            self.titles, self.tags = {}, {}
+            for title, note in book.notes.items():
+                self._add(title, tuple(tag.value for tag in note.tags))
+            self.built = True
+
+    def restore(self, tags: dict):
+        """Take the tags by title of a built index saved earlier (see helpers.index_snapshot)."""
+
+        with self._lock:
+            self.titles, self.tags = {}, {}
+            for title, note_tags in tags.items():
+                self._add(title, note_tags)
+            self.built = True
+
+    def changed(self, book, note):
+        """Re-index one added, changed or deleted note."""
+
+        if not self.built:
+            return
+        self._remove(note.title)
+        if book.notes.get(note.title) is note:
+            self._add(note.title, tuple(tag.value for tag in note.tags))
+
+    def get(self, tag: str) -> set:
+        """Return the titles of the notes tagged `tag` (call build() first; do not modify)."""
+
+        return self.titles.get(tag, set())
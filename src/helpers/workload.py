@@ -0,0 +1,117 @@
+import json
+from collections import deque
+from datetime import datetime
+
+FORMAT = 1  # version of the log lines
+
+
+class ReplayMismatch(Exception):
+    """A replayed command prompted for more inputs than were recorded for it."""
+
+
+class _Command:
+    """Context manager recording one dispatched command, or feeding it its recorded inputs."""
+
+    def __init__(self, workload, name, inputs):
+        self.workload = workload
+        self.name = name
+        self.inputs = inputs
+
+    def __enter__(self):
+        workload = self.workload
+        if workload.file is not None:
+            workload.current = {"at": _now(), "command": self.name, "inputs": []}
+        if self.inputs is not None:
+            workload.scripted = deque(self.inputs)
+        return self
+
+    def __exit__(self, *exc_info):
+        workload = self.workload
+        if workload.file is not None and workload.current is not None:
+            workload.file.write(json.dumps(workload.current, ensure_ascii=False) + "\n")
+            workload.file.flush()  # keep everything up to a crash
+            workload.current = None
+        if self.inputs is not None:
+            workload.unused += len(workload.scripted)
+            workload.scripted = None
+        return False
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="milliseconds")
+
+
+class Workload:
+    """
+    Records the commands of a session with the inputs they prompt for, and replays them.
+
+    Recording is off by default; while it is off, entering a command costs two
+    attribute checks. Once started, every command dispatched under command() is
+    appended to a JSON-lines log as {"at", "command", "inputs"}: the local time
+    it started and every line the user typed at its prompts, in order, including
+    empty ones. A session starts with a {"workload", "started", "book"} line.
+    The log holds everything typed, contact details included.
+
+    For a replay, command(name, inputs) makes the prompts of the command read
+    from `inputs` instead of the terminal (see next_input).
+
+    Attributes:
+        file (TextIO | None): The log being written, while recording.
+        scripted (deque | None): Inputs left for the command being replayed.
+        unused (int): Recorded inputs that replayed commands did not prompt for.
+    """
+
+    def __init__(self):
+        self.file = None
+        self.current = None
+        self.scripted = None
+        self.unused = 0
+
+    @property
+    def replaying(self) -> bool:
+        return self.scripted is not None
+
+    def start(self, path: str, book: str):
+        """Append the commands of this session to the log at `path`."""
+
+        self.file = open(path, "a", encoding="utf-8")
+        header = {"workload": FORMAT, "started": _now(), "book": book}
+        self.file.write(json.dumps(header) + "\n")
+        self.file.flush()
+
+    def stop(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def command(self, name: str, inputs: list | None = None) -> _Command:
+        return _Command(self, name, inputs)
+
+    def record(self, value: str):
+        """Add a line typed at a prompt to the command being recorded."""
+
+        if self.current is not None:
+            self.current["inputs"].append(value)
+
+    def next_input(self) -> str:
+        """
+        Return the next recorded input of the command being replayed.
+
+        Raises:
+            ReplayMismatch: If the command prompts for more inputs than were recorded.
+        """
+
+        if not self.scripted:
+            raise ReplayMismatch("the command asked for more inputs than were recorded")
+        return self.scripted.popleft()
+
+
+def read_log(path: str) -> list[dict]:
+    """Return the commands of a workload log in order, skipping its session header lines."""
+
+    with open(path, encoding="utf-8") as f:
+        entries = (json.loads(line) for line in f if line.strip())
+        return [entry for entry in entries if "command" in entry]
+
+
+workload = Workload()
@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import json
+import random
+from time import perf_counter
+
+from constants.constants import SERVER_HOST, SERVER_PORT
+from helpers.stats import LatencyHistogram
+
+
+async def request(reader, writer, method: str, path: str, body=None):
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {SERVER_HOST}\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n"
+        ).encode()
+        + payload
+    )
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def client(args, client_id: int, deadline: float, histograms: dict, statuses: dict):
+    """
+    Issue requests on one keep-alive connection until the deadline.
+
+    A share of args.write_ratio requests posts a batch of args.batch contacts,
+    the rest are reads of a contact, the contact list size permitting.
+    """
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    rng = random.Random(client_id)
+    sequence = 0
+    try:
+        while perf_counter() < deadline:
+            if rng.random() < args.write_ratio:
+                kind = "write"
+                batch = [
+                    {"name": f"Load {client_id}-{sequence + i}", "phones": ["1234567890"]}
+                    for i in range(args.batch)
+                ]
+                sequence += args.batch
+                method, path, body = "POST", "/contacts", batch
+            else:
+                kind = "read"
+                name = f"Load {rng.randrange(args.clients)}-{rng.randrange(max(sequence, 1))}"
+                method, path, body = "GET", f"/contacts/{name.replace(' ', '%20')}", None
+            started = perf_counter()
+            status = await request(reader, writer, method, path, body)
+            histograms[kind].record(perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def main():
+    """
+    Benchmark a running server.py with concurrent keep-alive clients.
+
+    Prints requests per second and read/write latency percentiles.
+    """
+
+    parser = argparse.ArgumentParser(description="Load generator for server.py")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--batch", type=int, default=10, help="contacts per write")
+    args = parser.parse_args()
+
+    histograms = {"read": LatencyHistogram(), "write": LatencyHistogram()}
+    statuses = {}
+    started = perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(
+        *(client(args, i, deadline, histograms, statuses) for i in range(args.clients))
+    )
+    elapsed = perf_counter() - started
+
+    total = sum(histogram.count for histogram in histograms.values())
+    print(f"{total} requests in {elapsed:.1f}s: {total / elapsed:,.0f} req/s")
+    print(f"Status codes: {statuses}")
+    for kind, histogram in histograms.items():
+        if histogram.count:
+            print(
+                f"{kind:>5}: {histogram.count} requests, "
+                f"p50 {histogram.percentile(50) * 1000:.2f} ms, "
+                f"p99 {histogram.percentile(99) * 1000:.2f} ms, "
+                f"max {histogram.max / 1000:.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,18 +1,49 @@
-from prompt_toolkit import HTML, PromptSession, print_formatted_text, prompt
+import argparse
+import asyncio
+from datetime import date, datetime, time
+
+from prompt_toolkit import HTML, PromptSession, print_formatted_text
 from prompt_toolkit.completion import WordCompleter
+from prompt_toolkit.patch_stdout import patch_stdout
 from prompt_toolkit.styles import Style
 from colorama import Fore
 
-from constants.constants import COMMAND_NAMES, COMMANDS
+from constants.constants import (
+    AUTOSAVE_INTERVAL,
+    AUTOSAVE_MUTATIONS,
+    BIRTHDAY_REMINDER_DAYS,
+    BOOK_MEMORY_BUDGET,
+    COMMAND_NAMES,
+    COMMANDS,
+    DEFAULT_BOOK,
+    DUPLICATES_SHOWN,
+    MUTATING_COMMANDS,
+    NOTES_PAGE_SIZE,
+    REMINDER_CHECK_INTERVAL,
+    SHARDED_FILE_NAME,
+    STORE_FILE_NAME,
+)
 from decorators.input_error import input_error
-from helpers.data import load_data, save_data
+from helpers.autosave import AutoSaver
+from helpers.birthday_calendar import DATE_FORMAT
+from helpers.book_cache import BookCache, OpenBook
+from helpers.data import book_files, list_books, load_book, save_data
 from helpers.os import clear_console
+from helpers.serializer import CODECS
+from helpers.stats import stats
+from helpers.workload import workload
 from helpers.table_view import (
     get_birthday_table,
     get_birthdays_table,
     get_contacts_table,
+    get_duplicates_table,
+    get_filter_table,
+    get_memory_table,
     get_notes_table,
     get_phone_table,
+    get_similar_notes_table,
+    get_stats_table,
+    get_store_table,
 )
 from models.address_book import AddressBook
 from models.record import Record
@@ -22,6 +53,7 @@ commands_completer = WordCompleter(COMMAND_NAMES.keys())
 names_completer = WordCompleter([])
 notes_completer = WordCompleter([])
 tags_completer = WordCompleter([])
+books_completer = WordCompleter(list_books)
 
 # Define the style for the welcome message
 style = Style.from_dict({"welcome": "bold fg:green", "command": "fg:yellow"})
@@ -35,48 +67,172 @@ welcome_message = HTML(
 )
 
 
-def wrapped_prompt(name: str, completer=None):
-    value = prompt(HTML(f"<b>{name}</b>"), completer=completer)
+async def read_line(message, completer=None) -> str:
+    """
+    Read one line for a command: from the terminal, or from the workload being replayed.
+
+    The line is added to the workload log when recording (see helpers.workload).
+    """
+
+    with stats.phase("prompt"):
+        if workload.replaying:
+            value = workload.next_input()
+        else:
+            value = await PromptSession().prompt_async(message, completer=completer)
+    workload.record(value)
+    return value
+
+
+async def wrapped_prompt(name: str, completer=None):
+    value = await read_line(HTML(f"<b>{name}</b>"), completer)
     if not value:
         raise ValueError
     return value
 
 
-def update_notes_completer(book: AddressBook):
-    notes_completer.words = book.notes.keys()
+def bind_completers(book: AddressBook):
+    """
+    Point the completers at the book; their word lists are computed on first completion.
+
+    Names and titles are dictionary views and cost nothing. Tags come from the book's
+    TagIndex, which is restored with the book when it was saved built (see
+    helpers.index_snapshot), built on the first tag completion otherwise and patched
+    as notes change, so nothing is scanned before the first prompt.
+
+    Args:
+        book (AddressBook): The address book to complete from.
+    """
+
+    names_completer.words = book.data.keys
+    notes_completer.words = book.notes.keys
+
+    def tag_words():
+        book.tag_index.build(book)
+        return list(book.tag_index.titles)
+
+    tags_completer.words = tag_words
+
+
+def open_book(name: str, args) -> OpenBook:
+    """
+    Load a named book for the session and start its autosaver (the loader of the BookCache).
+
+    Args:
+        name (str): The book to load (see helpers.data.book_files).
+        args (argparse.Namespace): The command-line flags of the session.
+
+    Returns:
+        OpenBook: The loaded book.
+    """
+
+    book, filename = load_book(args.shards, args.codec, args.working_set, name)
+    book.enable_concurrency()  # autosave reads and merges from a worker thread
+    if args.parallel_search is not None:
+        from helpers.parallel_search import ParallelNoteSearch
+
+        book.parallel_search = ParallelNoteSearch(book, args.parallel_search)
+    autosaver = AutoSaver(
+        book,
+        filename,
+        mutations=args.autosave_mutations,
+        interval=args.autosave_interval,
+    ).start()
+    return OpenBook(name, book, filename, autosaver)
 
 
-def update_names_completer(book: AddressBook):
-    names_completer.words = book.data.keys()
+async def close_book(entry: OpenBook):
+    """
+    Stop the autosaver of a book, save it and release its worker processes and database.
+
+    Args:
+        entry (OpenBook): The book to close.
+    """
+
+    await entry.autosaver.stop()
+    save_data(entry.book, entry.filename)
+    if entry.book.parallel_search is not None:
+        entry.book.parallel_search.close()
+    if entry.book.store is not None:
+        entry.book.store.close()
+
+
+@input_error(COMMAND_NAMES["use"])
+async def use(books: BookCache, current: OpenBook) -> OpenBook:
+    """
+    Switch the session to another named book, loading it unless it is still in memory.
 
+    Books pushed out of the memory budget by the switch are saved and closed.
 
-def update_tags_completer(book: AddressBook):
-    unique_tags = {tag.value for note in book.notes.values() for tag in note.tags}
-    tags_completer.words = list(unique_tags)
+    Args:
+        books (BookCache): The books loaded in this session.
+        current (OpenBook): The book in use.
+
+    Returns:
+        OpenBook: The book to use from now on.
+    """
+
+    name = await wrapped_prompt("Enter book name: ", books_completer)
+    if name == current.name:
+        print(f"\n{Fore.YELLOW}Already using book {Fore.CYAN}{name}{Fore.YELLOW}.\n")
+        return current
+    loaded = name in books
+    entry, evicted = books.get(name)
+    for old in evicted:
+        await close_book(old)
+    bind_completers(entry.book)
+    print(
+        f"\n{Fore.GREEN}Using book {Fore.CYAN}{name}{Fore.GREEN} "
+        f"({len(entry.book.data)} contacts, {len(entry.book.notes)} notes"
+        f"{', already loaded' if loaded else ''}).\n"
+    )
+    return entry
+
+
+async def remind_birthdays(book: AddressBook):
+    """
+    Show upcoming birthdays once a day without waiting for the birthdays command.
+
+    Checks every REMINDER_CHECK_INTERVAL seconds whether the date has changed and, on
+    start and on every new day, prints the birthdays of the next BIRTHDAY_REMINDER_DAYS days.
+
+    Args:
+        book (AddressBook): The address book to watch.
+    """
+
+    reminded_on = None
+    while True:
+        today = date.today()
+        if today != reminded_on:
+            reminded_on = today
+            upcoming = book.get_upcoming_birthdays(BIRTHDAY_REMINDER_DAYS)
+            if upcoming:
+                print(
+                    f"\n{Fore.YELLOW}Birthday reminder:\n{Fore.RESET}{get_birthdays_table(upcoming)}\n"
+                )
+        await asyncio.sleep(REMINDER_CHECK_INTERVAL)
 
 
 @input_error(COMMAND_NAMES["add_contact"])
-def add_contact(book: AddressBook):
+async def add_contact(book: AddressBook):
     """
     Adds a new contact to the given address book.
 
     Prompts the user to enter a name and a phone number, creates a new record with the provided information,
-    and adds it to the address book. Also updates the names completer with the new contact.
+    and adds it to the address book.
 
     Args:
         book (AddressBook): The address book to which the new contact will be added.
     """
 
-    name = wrapped_prompt("Enter name: ")
-    phone = wrapped_prompt("Enter phone (10 digits): ")
+    name = await wrapped_prompt("Enter name: ")
+    phone = await wrapped_prompt("Enter phone (10 digits): ")
     record = Record(name)
     record.add_phone(phone)
     book.add_record(record)
-    update_names_completer(book)
 
 
 @input_error(COMMAND_NAMES["add_address"])
-def add_address(book: AddressBook):
+async def add_address(book: AddressBook):
     """
     Prompts the user to enter a name and an address, then adds the address to the corresponding record in the address book.
 
@@ -93,17 +249,17 @@ def add_address(book: AddressBook):
         If the contact with the given name is not found in the address book, a message is printed indicating that the contact was not found.
     """
 
-    name = wrapped_prompt("Enter name: ", completer=names_completer)
+    name = await wrapped_prompt("Enter name: ", completer=names_completer)
     record: Record = book.find(name)
     if not record:
         print(f"\n{Fore.RED}Contact {Fore.CYAN}{name} {Fore.RED}not found.\n")
         return
-    address = wrapped_prompt("Enter address: ")
+    address = await wrapped_prompt("Enter address: ")
     record.add_address(address)
 
 
 @input_error(COMMAND_NAMES["add_birthday"])
-def add_birthday(book: AddressBook):
+async def add_birthday(book: AddressBook):
     """
     Add a birthday to a contact in the address book.
 
@@ -118,13 +274,13 @@ def add_birthday(book: AddressBook):
         A message indicating whether the birthday was added or if the contact was not found.
     """
 
-    name = wrapped_prompt("Enter name: ", completer=names_completer)
+    name = await wrapped_prompt("Enter name: ", completer=names_completer)
 
     record: Record = book.find(name)
     if not record:
         print(f"\n{Fore.RED}Contact {Fore.CYAN}{name} {Fore.RED}not found.\n")
 
-    birthday = wrapped_prompt("Enter birthday (DD.MM.YYYY): ")
+    birthday = await wrapped_prompt("Enter birthday (DD.MM.YYYY): ")
     record.add_birthday(birthday)
     print(
         f"\n{Fore.GREEN}Birthday {Fore.CYAN}{birthday} {Fore.GREEN}added to {Fore.CYAN}{name}{Fore.GREEN}.\n"
@@ -132,7 +288,7 @@ def add_birthday(book: AddressBook):
 
 
 @input_error(COMMAND_NAMES["add_email"])
-def add_email(book: AddressBook):
+async def add_email(book: AddressBook):
     """
     Adds an email to an existing contact in the address book.
 
@@ -147,18 +303,18 @@ def add_email(book: AddressBook):
         None
     """
 
-    name = wrapped_prompt("Enter name: ", completer=names_completer)
+    name = await wrapped_prompt("Enter name: ", completer=names_completer)
     record: Record = book.find(name)
     if not record:
         print(f"\n{Fore.RED}Contact {Fore.CYAN}{name} {Fore.RED}not found.\n")
         return
 
-    email = wrapped_prompt("Enter email: ")
+    email = await wrapped_prompt("Enter email: ")
     record.add_email(email)
 
 
 @input_error(COMMAND_NAMES["add_note"])
-def add_note(book: AddressBook):
+async def add_note(book: AddressBook):
     """
     Prompts the user to enter a note title and content, then adds the note to the provided AddressBook.
 
@@ -169,14 +325,13 @@ def add_note(book: AddressBook):
         None
     """
 
-    title = wrapped_prompt("Enter note title: ")
-    content = wrapped_prompt("Enter note content: ")
+    title = await wrapped_prompt("Enter note title: ")
+    content = await wrapped_prompt("Enter note content: ")
     book.add_note(title, content)
-    update_notes_completer(book)
 
 
 @input_error(COMMAND_NAMES["add_phone"])
-def add_phone(book: AddressBook):
+async def add_phone(book: AddressBook):
     """
     Adds a phone number to an existing contact in the address book.
     Prompts the user to enter the name of the contact and the phone number to be added.
@@ -188,13 +343,13 @@ def add_phone(book: AddressBook):
         None
     """
 
-    name = wrapped_prompt("Enter name: ", completer=names_completer)
+    name = await wrapped_prompt("Enter name: ", completer=names_completer)
     record: Record = book.find(name)
     if not record:
         print(f"\n{Fore.RED}Contact {Fore.CYAN}{name} {Fore.RED}not found.\n")
         return
 
-    phone = wrapped_prompt("Enter phone (10 digits): ")
+    phone = await wrapped_prompt("Enter phone (10 digits): ")
     record.add_phone(phone)
     print(
         f"\n{Fore.GREEN}Phone {Fore.CYAN}{phone} {Fore.GREEN}added to {Fore.CYAN}{name}{Fore.GREEN}.\n"
@@ -202,11 +357,11 @@ def add_phone(book: AddressBook):
 
 
 @input_error(COMMAND_NAMES["add_tag"])
-def add_tag(book: AddressBook):
+async def add_tag(book: AddressBook):
     """
     Adds a tag to a note in the address book.
     Prompts the user to enter the title of the note and the tag to be added.
-    If the note is found, the tag is added to the note and the tags completer is updated.
+    If the note is found, the tag is added to the note.
     If the note is not found, an error message is printed.
     Args:
         book (AddressBook): The address book containing the notes.
@@ -214,19 +369,18 @@ def add_tag(book: AddressBook):
         str: A message indicating the result of the operation.
     """
 
-    note_title = wrapped_prompt("Enter note title: ", notes_completer)
+    note_title = await wrapped_prompt("Enter note title: ", notes_completer)
 
     note: Note | None = book.find_note_by_title(note_title)
     if not note:
         return print(f"\n{Fore.RED}Note {Fore.CYAN}{note_title} {Fore.RED}not found.\n")
 
-    tag = wrapped_prompt("Enter tag (#tag): ", completer=tags_completer)
+    tag = await wrapped_prompt("Enter tag (#tag): ", completer=tags_completer)
     note.add_tag(tag)
-    update_tags_completer(book)
 
 
 @input_error(COMMAND_NAMES["birthdays"])
-def birthdays(book: AddressBook):
+async def birthdays(book: AddressBook):
     """
     Display upcoming birthdays from the address book.
 
@@ -240,18 +394,66 @@ def birthdays(book: AddressBook):
         None
     """
 
-    lookup_days = wrapped_prompt("Enter days to lookup: ")
+    lookup_days = await wrapped_prompt("Enter days to lookup: ")
     lookup_days = int(lookup_days)
     upcoming = book.get_upcoming_birthdays(lookup_days)
-    upcoming_table = get_birthdays_table(upcoming)
-    if len(upcoming) > 0:
-        print(f"\n{upcoming_table}\n")
-    else:
-        print(f"\n{Fore.YELLOW}No upcoming birthdays.\n")
+    with stats.phase("render"):
+        upcoming_table = get_birthdays_table(upcoming)
+        if len(upcoming) > 0:
+            print(f"\n{upcoming_table}\n")
+        else:
+            print(f"\n{Fore.YELLOW}No upcoming birthdays.\n")
+
+
+def print_contacts(records: list[Record]):
+    """Display a list of contacts as a table, in the given order."""
+
+    if not records:
+        print(f"\n{Fore.YELLOW}No contacts found.\n")
+        return
+    with stats.phase("render"):
+        contacts = {record.name.value: record for record in records}
+        print(f"\n{get_contacts_table(contacts)}\n")
+
+
+@input_error(COMMAND_NAMES["born_between"])
+async def born_between(book: AddressBook):
+    """
+    Display the contacts born between two dates, ordered by birth date.
+
+    Args:
+        book (AddressBook): The address book to search.
+
+    Returns:
+        None
+    """
+
+    start = await wrapped_prompt("Enter first birth date (DD.MM.YYYY): ")
+    end = await wrapped_prompt("Enter last birth date (DD.MM.YYYY): ")
+    start = datetime.strptime(start, DATE_FORMAT).date()
+    end = datetime.strptime(end, DATE_FORMAT).date()
+    print_contacts(book.born_between(start, end))
+
+
+@input_error(COMMAND_NAMES["age_range"])
+async def age_range(book: AddressBook):
+    """
+    Display the contacts whose age in full years is within a range, oldest first.
+
+    Args:
+        book (AddressBook): The address book to search.
+
+    Returns:
+        None
+    """
+
+    min_age = int(await wrapped_prompt("Enter minimum age: "))
+    max_age = int(await wrapped_prompt("Enter maximum age: "))
+    print_contacts(book.age_range(min_age, max_age))
 
 
 @input_error(COMMAND_NAMES["change_phone"])
-def change_phone(book: AddressBook):
+async def change_phone(book: AddressBook):
     """
     Change the phone number of an existing contact in the address book.
 
@@ -266,20 +468,20 @@ def change_phone(book: AddressBook):
         None
     """
 
-    name = wrapped_prompt("Enter name: ", completer=names_completer)
+    name = await wrapped_prompt("Enter name: ", completer=names_completer)
 
     record: Record = book.find(name)
     if not record:
         print(f"\n{Fore.RED}Contact {Fore.CYAN}{name} {Fore.RED}not found.\n")
         return
     phones_completer = WordCompleter([phone.value for phone in record.phones])
-    old_phone = wrapped_prompt("Enter old phone (10 digits): ", phones_completer)
-    new_phone = wrapped_prompt("Enter new phone (10 digits): ")
+    old_phone = await wrapped_prompt("Enter old phone (10 digits): ", phones_completer)
+    new_phone = await wrapped_prompt("Enter new phone (10 digits): ")
     record.edit_phone(old_phone, new_phone)
 
 
 @input_error(COMMAND_NAMES["change_address"])
-def change_address(book: AddressBook):
+async def change_address(book: AddressBook):
     """
     Prompts the user to enter a name and a new address, then updates the address
     of the corresponding contact in the provided AddressBook.
@@ -298,8 +500,8 @@ def change_address(book: AddressBook):
         a message will be printed indicating that the contact was not found.
     """
 
-    name = wrapped_prompt("Enter name: ", completer=names_completer)
-    address = wrapped_prompt("Enter address: ")
+    name = await wrapped_prompt("Enter name: ", completer=names_completer)
+    address = await wrapped_prompt("Enter address: ")
     record: Record = book.find(name)
     if not record:
         print(f"\n{Fore.RED}Contact {Fore.CYAN}{name} {Fore.RED}not found.\n")
@@ -309,7 +511,7 @@ def change_address(book: AddressBook):
 
 
 @input_error(COMMAND_NAMES["change_email"])
-def change_email(book: AddressBook):
+async def change_email(book: AddressBook):
     """
     Change the email address of a contact in the address book.
 
@@ -324,8 +526,8 @@ def change_email(book: AddressBook):
         None
     """
 
-    name = wrapped_prompt("Enter name: ", completer=names_completer)
-    email = wrapped_prompt("Enter email: ")
+    name = await wrapped_prompt("Enter name: ", completer=names_completer)
+    email = await wrapped_prompt("Enter email: ")
     record: Record = book.find(name)
     if not record:
         print(f"\n{Fore.RED}Contact {Fore.CYAN}{name} {Fore.RED}not found.\n")
@@ -335,7 +537,7 @@ def change_email(book: AddressBook):
 
 
 @input_error(COMMAND_NAMES["delete_contact"])
-def delete_contact(book: AddressBook):
+async def delete_contact(book: AddressBook):
     """
     Deletes a contact from the given address book.
 
@@ -349,19 +551,18 @@ def delete_contact(book: AddressBook):
         None
     """
 
-    name = wrapped_prompt("Enter name: ", completer=names_completer)
+    name = await wrapped_prompt("Enter name: ", completer=names_completer)
     yes_no_completer = WordCompleter(["yes", "no"])
-    result = prompt(
+    result = await read_line(
         HTML(f"\nAre you sure you want to delete <cyan>{name}</cyan> (yes/no)?: "),
-        completer=yes_no_completer,
+        yes_no_completer,
     )
     if result.lower() == "yes" or result.lower() == "y":
         book.delete(name)
-        update_names_completer(book)
 
 
 @input_error(COMMAND_NAMES["delete_note"])
-def delete_note(book: AddressBook):
+async def delete_note(book: AddressBook):
     """
     Deletes a note from the given AddressBook by its title.
 
@@ -371,12 +572,46 @@ def delete_note(book: AddressBook):
     Prompts the user to enter the title of the note to be deleted and removes the note with the matching title from the address book.
     """
 
-    title = wrapped_prompt("Enter note title: ", notes_completer)
+    title = await wrapped_prompt("Enter note title: ", notes_completer)
     book.delete_note_by_title(title)
 
 
+@input_error(COMMAND_NAMES["merge_duplicates"])
+async def merge_duplicates(book: AddressBook):
+    """
+    Find duplicate contacts and merge them after confirmation.
+
+    Lists up to DUPLICATES_SHOWN proposed merges (see AddressBook.find_duplicates) and,
+    if confirmed, merges the phones, email, address and birthday of every duplicate
+    into the kept contact and deletes the duplicate.
+
+    Args:
+        book (AddressBook): The address book to clean up.
+
+    Returns:
+        None
+    """
+
+    proposals, skipped = book.find_duplicates()
+    if not proposals:
+        print(f"\n{Fore.YELLOW}No duplicate contacts found.\n")
+        return
+    duplicates = sum(len(proposal.duplicates) for proposal in proposals)
+    with stats.phase("render"):
+        print(f"\n{get_duplicates_table(proposals[:DUPLICATES_SHOWN])}")
+        if len(proposals) > DUPLICATES_SHOWN:
+            print(f"... and {len(proposals) - DUPLICATES_SHOWN} more")
+        if skipped:
+            print(f"{Fore.YELLOW}{skipped} very common phones, emails or names were not compared.")
+    answer = await wrapped_prompt(f"Merge {duplicates} duplicates into {len(proposals)} contacts? (y/n): ")
+    if answer.strip().lower() not in ("y", "yes"):
+        return
+    merged = book.merge_duplicates(proposals)
+    print(f"\n{Fore.GREEN}Merged {Fore.CYAN}{merged}{Fore.GREEN} duplicate contacts.\n")
+
+
 @input_error(COMMAND_NAMES["edit_note"])
-def edit_note(book: AddressBook):
+async def edit_note(book: AddressBook):
     """
     Edits the content of an existing note in the AddressBook.
 
@@ -390,15 +625,16 @@ def edit_note(book: AddressBook):
         None
     """
 
-    title = wrapped_prompt("Enter note title: ", notes_completer)
-    new_content = wrapped_prompt("Enter new content: ")
+    title = await wrapped_prompt("Enter note title: ", notes_completer)
+    new_content = await wrapped_prompt("Enter new content: ")
     book.edit_note(title, new_content)
     new_note = book.find_note_by_title(title)
     dict_note = {new_note.title: new_note}
-    print(f"{Fore.RESET}{get_notes_table(dict_note)}\n")
+    with stats.phase("render"):
+        print(f"{Fore.RESET}{get_notes_table(dict_note)}\n")
 
 
-def find_note_by_title(book: AddressBook):
+async def find_note_by_title(book: AddressBook):
     """
     Find and display a note by its title from the given address book.
 
@@ -410,16 +646,17 @@ def find_note_by_title(book: AddressBook):
     If the note is not found, it prints a message indicating that the note was not found.
     """
 
-    note_title = wrapped_prompt("Enter note title: ", notes_completer)
+    note_title = await wrapped_prompt("Enter note title: ", notes_completer)
     note = book.find_note_by_title(note_title)
     if not note:
         print(f"\n{Fore.RED}Note not found.\n")
     else:
         dict_note = {note.title: note}
-        print(f"\n{get_notes_table(dict_note)}\n")
+        with stats.phase("render"):
+            print(f"\n{get_notes_table(dict_note)}\n")
 
 
-def find_contact_by_name(book: AddressBook):
+async def find_contact_by_name(book: AddressBook):
     """
     Find and display a contact by name from the given address book.
 
@@ -432,17 +669,18 @@ def find_contact_by_name(book: AddressBook):
     that the contact was not found.
     """
 
-    name = wrapped_prompt("Enter name: ", names_completer)
+    name = await wrapped_prompt("Enter name: ", names_completer)
     record = book.find(name)
     if not record:
         print(f"\n{Fore.RED}Contact not found.\n")
     else:
         dict_record = {record.name: record}
-        print(f"\n{get_contacts_table(dict_record)}\n")
+        with stats.phase("render"):
+            print(f"\n{get_contacts_table(dict_record)}\n")
 
 
 @input_error(COMMAND_NAMES["find_notes"])
-def find_notes(book: AddressBook):
+async def find_notes(book: AddressBook):
     """
     Search for notes in the given AddressBook that match the user's query.
 
@@ -458,16 +696,17 @@ def find_notes(book: AddressBook):
         None
     """
 
-    query = wrapped_prompt("Enter query: ")
+    query = await wrapped_prompt("Enter query: ")
     notes = book.find_notes(query)
     if not notes:
         print(f"\n{Fore.RED}No notes found matching {Fore.CYAN}{query}{Fore.RED}.\n")
     else:
-        print(f"\n{get_notes_table(notes)}\n")
+        with stats.phase("render"):
+            print(f"\n{get_notes_table(notes)}\n")
 
 
 @input_error(COMMAND_NAMES["find_notes_by_tag"])
-def find_notes_by_tag(book: AddressBook):
+async def find_notes_by_tag(book: AddressBook):
     """
     Find and display notes associated with a specific tag in the address book.
     Args:
@@ -477,16 +716,151 @@ def find_notes_by_tag(book: AddressBook):
     are found, a message indicating the absence of notes linked to the tag is displayed.
     """
 
-    tag = wrapped_prompt("Enter tag (#tag): ", tags_completer)
+    tag = await wrapped_prompt("Enter tag (#tag): ", tags_completer)
     notes: list[Note] = book.find_notes_by_tag(tag)
     if not notes:
         print(f"\n{Fore.RED}No notes linked to tag {Fore.CYAN}{tag}{Fore.RED}.\n")
     else:
-        print(f"\n{get_notes_table(notes)}\n")
+        with stats.phase("render"):
+            print(f"\n{get_notes_table(notes)}\n")
+
+
+@input_error(COMMAND_NAMES["similar_notes"])
+async def similar_notes(book: AddressBook):
+    """
+    Display the notes whose content is a near-duplicate of a note, most similar first.
+
+    Args:
+        book (AddressBook): The address book containing the notes.
+
+    Returns:
+        None
+    """
+
+    note_title = await wrapped_prompt("Enter note title: ", notes_completer)
+    note = book.find_note_by_title(note_title)
+    if not note:
+        print(f"\n{Fore.RED}Note not found.\n")
+        return
+    similar = book.similar_notes(note.title)
+    if not similar:
+        print(f"\n{Fore.YELLOW}No similar notes found.\n")
+    else:
+        with stats.phase("render"):
+            print(f"\n{get_similar_notes_table(similar)}\n")
+
+
+async def page_notes(fetch):
+    """
+    Display notes a page of NOTES_PAGE_SIZE at a time, asking before each next page.
+
+    Args:
+        fetch (callable): fetch(offset, limit) returns the notes of a page in display order.
+    """
+
+    offset = 0
+    while True:
+        notes = fetch(offset, NOTES_PAGE_SIZE + 1)
+        if not notes and not offset:
+            print(f"\n{Fore.YELLOW}No notes found.\n")
+            return
+        with stats.phase("render"):
+            page = {note.title: note for note in notes[:NOTES_PAGE_SIZE]}
+            print(f"\n{get_notes_table(page)}\n")
+        if len(notes) <= NOTES_PAGE_SIZE:
+            return
+        offset += NOTES_PAGE_SIZE
+        try:
+            answer = await wrapped_prompt("Show more? (y/n): ")
+        except ValueError:
+            return
+        if answer.strip().lower() not in ("y", "yes"):
+            return
+
+
+@input_error(COMMAND_NAMES["notes_between"])
+async def notes_between(book: AddressBook):
+    """
+    Display the notes created between two dates (both days included), oldest first.
+
+    Args:
+        book (AddressBook): The address book containing the notes.
+
+    Returns:
+        None
+    """
+
+    start = await wrapped_prompt("Enter start date (DD.MM.YYYY): ")
+    end = await wrapped_prompt("Enter end date (DD.MM.YYYY): ")
+    start = datetime.strptime(start, DATE_FORMAT)
+    end = datetime.combine(datetime.strptime(end, DATE_FORMAT), time.max)
+    await page_notes(lambda offset, limit: book.notes_between(start, end, offset, limit))
+
+
+@input_error(COMMAND_NAMES["recent_notes"])
+async def recent_notes(book: AddressBook):
+    """
+    Display the most recently created notes, newest first.
+
+    Args:
+        book (AddressBook): The address book containing the notes.
+
+    Returns:
+        None
+    """
+
+    count = int(await wrapped_prompt("Enter number of notes: "))
+    await page_notes(
+        lambda offset, limit: book.recent_notes(max(min(limit, count - offset), 0), offset)
+    )
+
+
+@input_error(COMMAND_NAMES["query"])
+async def query(book: AddressBook):
+    """
+    Search contacts or notes with a filter expression and display the matches.
+
+    Terms are field:value (also =, >, >=, <, <= where it makes sense) combined with
+    AND, OR, NOT and parentheses. Note fields: title, text, tag, created, modified.
+    Contact fields: name, phone, email, address, has, birthday (next N days), born, age.
+
+    Args:
+        book (AddressBook): The address book to search.
+
+    Returns:
+        None
+    """
+
+    expression = await wrapped_prompt("Enter query: ")
+    target, found = book.query(expression)
+    if not found:
+        print(f"\n{Fore.YELLOW}Nothing found.\n")
+        return
+    with stats.phase("render"):
+        if target == "contacts":
+            print(f"\n{get_contacts_table(found)}\n")
+        else:
+            print(f"\n{get_notes_table(found)}\n")
+
+
+@input_error(COMMAND_NAMES["explain"])
+async def explain(book: AddressBook):
+    """
+    Display the plan the query command would use for an expression.
+
+    Args:
+        book (AddressBook): The address book to plan against.
+
+    Returns:
+        None
+    """
+
+    expression = await wrapped_prompt("Enter query: ")
+    print(f"\n{book.explain(expression)}\n")
 
 
 @input_error(COMMAND_NAMES["show_phone"])
-def show_phone(book: AddressBook):
+async def show_phone(book: AddressBook):
     """
     Prompt the user to enter a name, find the corresponding record in the address book,
     retrieve all phone numbers associated with that record, and print them in a table format.
@@ -498,14 +872,15 @@ def show_phone(book: AddressBook):
         None
     """
 
-    name = wrapped_prompt("Enter name: ", completer=names_completer)
+    name = await wrapped_prompt("Enter name: ", completer=names_completer)
     record: Record = book.find(name)
     if not record:
         print(f"\n{Fore.RED}Contact {Fore.CYAN}{name}{Fore.RED} not found.\n")
         return
     phones = record.get_all_phones()
-    phones_tale = get_phone_table(phones)
-    print(phones_tale)
+    with stats.phase("render"):
+        phones_tale = get_phone_table(phones)
+        print(phones_tale)
 
 
 def get_all_contacts(book: AddressBook):
@@ -521,11 +896,12 @@ def get_all_contacts(book: AddressBook):
     if not contacts:
         print(f"\n{Fore.RED}No contacts found.\n")
     else:
-        print(f"\n{get_contacts_table(contacts)}\n")
+        with stats.phase("render"):
+            print(f"\n{get_contacts_table(contacts)}\n")
 
 
 @input_error(COMMAND_NAMES["remove_tag"])
-def remove_tag(book: AddressBook):
+async def remove_tag(book: AddressBook):
     """
     Removes a tag from a note in the address book.
 
@@ -540,17 +916,17 @@ def remove_tag(book: AddressBook):
         - Prompts the user to enter the tag to be removed from the note.
     """
 
-    note_title = wrapped_prompt("Enter note title: ", notes_completer)
+    note_title = await wrapped_prompt("Enter note title: ", notes_completer)
     note: Note | None = book.find_note_by_title(note_title)
     tags_completer = WordCompleter([tag.value for tag in note.tags])
-    tag = wrapped_prompt("Enter tag (#tag): ", tags_completer)
+    tag = await wrapped_prompt("Enter tag (#tag): ", tags_completer)
     if not note:
         return "Note not found"
     note.remove_tag(tag)
 
 
 @input_error(COMMAND_NAMES["show_birthday"])
-def show_birthday(book: AddressBook):
+async def show_birthday(book: AddressBook):
     """
     Display the birthday information of a contact from the address book.
 
@@ -565,17 +941,18 @@ def show_birthday(book: AddressBook):
         None
     """
 
-    name = wrapped_prompt("Enter name: ", completer=names_completer)
+    name = await wrapped_prompt("Enter name: ", completer=names_completer)
     record: Record = book.find(name)
     if record:
-        birthday_table = get_birthday_table(record)
-        print(f"\n{birthday_table}\n")
+        with stats.phase("render"):
+            birthday_table = get_birthday_table(record)
+            print(f"\n{birthday_table}\n")
     else:
         print(f"\n{Fore.RED}Contact {Fore.CYAN}{name}{Fore.RED} not found.")
 
 
 @input_error(COMMAND_NAMES["all_notes"])
-def all_notes(book: AddressBook):
+async def all_notes(book: AddressBook):
     """
     Display the notes from the given AddressBook.
 
@@ -587,20 +964,283 @@ def all_notes(book: AddressBook):
     """
 
     table = book.get_notes()
-    print(f"\n{get_notes_table(table)}\n")
+    with stats.phase("render"):
+        print(f"\n{get_notes_table(table)}\n")
 
 
-def main():
+def show_stats():
+    """
+    Display per-command latency percentiles collected by the instrumentation.
+
+    Prints a table with the number of calls, handled errors and the prompt, model and
+    render phase timings of every command run in this session. If the assistant was
+    started without the --stats flag, prints a hint instead.
+
+    Returns:
+        None
+    """
+
+    if not stats.enabled:
+        print(
+            f"\n{Fore.YELLOW}Instrumentation is off. Start the assistant with {Fore.CYAN}--stats{Fore.YELLOW} to collect latency.\n"
+        )
+    elif not stats.histograms:
+        print(f"\n{Fore.YELLOW}No commands recorded yet.\n")
+    else:
+        print(f"\n{get_stats_table(stats.histograms, stats.errors)}\n")
+
+
+@input_error(COMMAND_NAMES["memory"])
+async def show_memory(book: AddressBook):
+    """
+    Display how much memory each subsystem of the assistant retains.
+
+    Measures contacts, notes, tags, secondary indexes and completer word lists by
+    walking what they reference (see helpers.memory) and prints a table with the total
+    bytes and bytes per item. Note bodies still on disk are counted, not loaded. For a
+    book in a disk store only the records and notes in memory are measured, and the
+    cache counters and Bloom filters of the store are shown as well.
+
+    Args:
+        book (AddressBook): The address book to measure.
+
+    Returns:
+        None
+    """
+
+    contacts, notes = book.data, book.notes
+    if book.store is not None:
+        contacts, notes = dict(contacts.cache), dict(notes.cache)
+    note_tags = [note.tags for note in notes.values()]
+    subsystems = {
+        "contacts": (contacts, len(contacts)),
+        "notes": (notes, len(notes)),
+        "tags": (note_tags, sum(len(tags) for tags in note_tags)),
+    }
+    for name, (index, entries) in book.get_indexes().items():
+        subsystems[f"index: {name}"] = (index, entries)
+    for name, completer in (
+        ("names completer", names_completer),
+        ("notes completer", notes_completer),
+        ("tags completer", tags_completer),
+    ):
+        words = completer.words
+        words = list(words() if callable(words) else words)
+        subsystems[name] = (words, len(words))
+
+    from helpers.memory import get_memory_report
+    from helpers.rwlock import RWLock
+    from helpers.shards import BodySegment
+
+    report = get_memory_report(subsystems, shared=(AddressBook, RWLock, BodySegment))
+    with stats.phase("render"):
+        print(f"\n{get_memory_table(report)}\n")
+        if book.store is not None:
+            print(f"{get_store_table(book.store.counters())}\n")
+            print(f"{get_filter_table(book.store.filter_stats())}\n")
+
+
+def parse_args(argv=None):
+    """
+    Parse the command-line flags of the assistant.
+
+    Args:
+        argv (list[str] | None): Arguments to parse. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: Parsed flags.
+    """
+
+    parser = argparse.ArgumentParser(description="Address Book Assistant")
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="record per-command latency, shown by the 'stats' command",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="COMMAND",
+        help="run every call of COMMAND under cProfile and print the pstats report",
+    )
+    parser.add_argument(
+        "--profile-output",
+        metavar="FILE",
+        help="save raw cProfile data to FILE instead of printing it",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="append every command and the inputs typed for it to FILE, for replay.py",
+    )
+    parser.add_argument(
+        "--autosave-mutations",
+        type=int,
+        default=AUTOSAVE_MUTATIONS,
+        metavar="N",
+        help="save in the background after N changing commands",
+    )
+    parser.add_argument(
+        "--autosave-interval",
+        type=float,
+        default=AUTOSAVE_INTERVAL,
+        metavar="SECONDS",
+        help="save in the background this long after the first unsaved change (0 disables autosave)",
+    )
+    parser.add_argument(
+        "--parallel-search",
+        type=int,
+        nargs="?",
+        const=0,
+        metavar="WORKERS",
+        help="search large note collections in a process pool (default: one worker per core)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        metavar="N",
+        help=f"store the book in {SHARDED_FILE_NAME} split into N contact and N note shards",
+    )
+    parser.add_argument(
+        "--codec",
+        choices=CODECS,
+        help="compress the stored book with this codec from now on",
+    )
+    parser.add_argument(
+        "--book",
+        default=DEFAULT_BOOK,
+        metavar="NAME",
+        help="start with this named book (switch with the 'use' command)",
+    )
+    parser.add_argument(
+        "--book-memory",
+        type=int,
+        default=BOOK_MEMORY_BUDGET,
+        metavar="MB",
+        help="keep loaded books in memory up to about this many MB before saving and unloading the least recently used",
+    )
+    parser.add_argument(
+        "--working-set",
+        type=int,
+        metavar="N",
+        help=f"keep the book in {STORE_FILE_NAME} with at most N contacts and N notes in memory",
+    )
+    args = parser.parse_args(argv)
+    if args.working_set is not None and args.working_set < 1:
+        parser.error("--working-set must be at least 1")
+    if args.book_memory < 0:
+        parser.error("--book-memory must not be negative")
+    try:
+        book_files(args.book)
+    except ValueError as error:
+        parser.error(str(error))
+    return args
+
+
+async def dispatch(command: str, book: AddressBook):
+    """
+    Run a single command of the assistant against the address book.
+
+    Args:
+        command (str): A command name from COMMAND_NAMES, other than close/exit and use.
+        book (AddressBook): The address book the command works on.
+
+    Returns:
+        None
+    """
+
+    match command:
+        case "help":
+            print(COMMANDS)
+        case "add_contact":
+            await add_contact(book)
+        case "add_address":
+            await add_address(book)
+        case "add_birthday":
+            await add_birthday(book)
+        case "add_email":
+            await add_email(book)
+        case "add_note":
+            await add_note(book)
+        case "add_phone":
+            await add_phone(book)
+        case "add_tag":
+            await add_tag(book)
+        case "all_contacts":
+            get_all_contacts(book)
+        case "birthdays":
+            await birthdays(book)
+        case "born_between":
+            await born_between(book)
+        case "age_range":
+            await age_range(book)
+        case "change_phone":
+            await change_phone(book)
+        case "change_address":
+            print(await change_address(book))
+        case "change_email":
+            await change_email(book)
+        case "delete_contact":
+            await delete_contact(book)
+        case "delete_note":
+            await delete_note(book)
+        case "edit_note":
+            await edit_note(book)
+        case "merge_duplicates":
+            await merge_duplicates(book)
+        case "find_contact_by_name":
+            await find_contact_by_name(book)
+        case "find_note_by_title":
+            await find_note_by_title(book)
+        case "find_notes":
+            await find_notes(book)
+        case "find_notes_by_tag":
+            await find_notes_by_tag(book)
+        case "similar_notes":
+            await similar_notes(book)
+        case "notes_between":
+            await notes_between(book)
+        case "recent_notes":
+            await recent_notes(book)
+        case "query":
+            await query(book)
+        case "explain":
+            await explain(book)
+        case "show_phone":
+            await show_phone(book)
+        case "remove_tag":
+            await remove_tag(book)
+        case "show_birthday":
+            await show_birthday(book)
+        case "all_notes":
+            await all_notes(book)
+        case "stats":
+            show_stats()
+        case "memory":
+            await show_memory(book)
+
+
+async def main():
     """
     Main function to run the command-line interface for the contact book application.
 
-    This function initializes the console, loads data, updates completers, and starts a prompt session
+    This function initializes the console, loads data, binds completers, and starts a prompt session
     to accept user commands. It handles various commands to manage contacts, addresses, birthdays, emails,
     notes, and tags. The function also handles saving data and exiting the application gracefully.
 
+    The session runs on an asyncio event loop. While the prompt waits for input, background tasks
+    autosave the book and print birthday reminders.
+
+    Several named books can be used in one session (see the use command). Loaded books stay in a
+    BookCache within the --book-memory budget, each with its own autosaver, so switching back to
+    one does not read it again; the least recently used are saved and unloaded to stay within it.
+
+    With --record, every command and the lines typed for it are appended to a workload log
+    (see helpers.workload) that replay.py runs again against a book.
+
     Commands:
     - help: Display available commands.
     - close, exit: Save data and exit the application.
+    - use: Switch to another named book.
     - add: Add a new contact.
     - add_address: Add an address to a contact.
     - add_birthday: Add a birthday to a contact.
@@ -610,103 +1250,94 @@ def main():
     - add_tag: Add a tag to a note.
     - all: Display all contacts.
     - birthdays: Display upcoming birthdays.
+    - born_between: Display contacts born between two dates.
+    - age_range: Display contacts within an age range.
     - change_phone: Change contact details.
     - change_address: Change a contact's address.
     - change_email: Change a contact's email.
     - delete_contact: Delete a contact.
     - delete_note: Delete a note.
     - edit_note: Edit a note.
+    - merge_duplicates: Find and merge duplicate contacts.
     - find_contact_by_name: Find a contact by name.
     - find_note_by_title: Find a note by title.
     - find_notes: Find notes.
     - find_notes_by_tag: Find notes by tag.
+    - similar_notes: Find near-duplicates of a note.
+    - notes_between: Display notes created between two dates.
+    - recent_notes: Display the most recent notes.
+    - query: Search contacts or notes with a filter expression.
+    - explain: Show the plan of a query.
     - phone: Get a contact's phone number.
     - remove_tag: Remove a tag from a note.
     - show_birthday: Show a contact's birthday.
     - all_notes: Show all notes.
+    - stats: Show per-command latency (requires --stats).
+    - memory: Show memory used by contacts, notes, tags, indexes and completers.
 
     Exceptions:
     - KeyboardInterrupt: Save data and exit on keyboard interrupt.
     - EOFError: Save data and exit on end-of-file error.
     """
 
+    args = parse_args()
+    stats.enabled = args.stats
+    stats.profile_command = args.profile
+    stats.profile_output = args.profile_output
+    if args.record:
+        workload.start(args.record, args.book)
+
+    books = BookCache(lambda name: open_book(name, args), args.book_memory * 2**20)
+    reminder = None
+
+    async def close_books():
+        for entry in books:
+            await close_book(entry)
+
     try:
         clear_console()
-        book = load_data()
-        update_notes_completer(book)
-        update_names_completer(book)
-        update_tags_completer(book)
+        current, _ = books.get(args.book)
+        bind_completers(current.book)
         print_formatted_text(welcome_message, style=style)
         session = PromptSession()  # session for in memory history
-        while True:
-            command = session.prompt(
-                HTML("<b><ansibrightcyan>Enter a command:</ansibrightcyan></b> "),
-                completer=commands_completer,
-            )
-            if command in COMMAND_NAMES:
-                match command:
-                    case "help":
-                        print(COMMANDS)
-                    case "close" | "exit":
-                        save_data(book)
-                        print("Good bye!")
-                        break
-                    case "add_contact":
-                        add_contact(book)
-                    case "add_address":
-                        add_address(book)
-                    case "add_birthday":
-                        add_birthday(book)
-                    case "add_email":
-                        add_email(book)
-                    case "add_note":
-                        add_note(book)
-                    case "add_phone":
-                        add_phone(book)
-                    case "add_tag":
-                        add_tag(book)
-                    case "all_contacts":
-                        get_all_contacts(book)
-                    case "birthdays":
-                        birthdays(book)
-                    case "change_phone":
-                        change_phone(book)
-                    case "change_address":
-                        print(change_address(book))
-                    case "change_email":
-                        change_email(book)
-                    case "delete_contact":
-                        delete_contact(book)
-                    case "delete_note":
-                        delete_note(book)
-                    case "edit_note":
-                        edit_note(book)
-                    case "find_contact_by_name":
-                        find_contact_by_name(book)
-                    case "find_note_by_title":
-                        find_note_by_title(book)
-                    case "find_notes":
-                        find_notes(book)
-                    case "find_notes_by_tag":
-                        find_notes_by_tag(book)
-                    case "show_phone":
-                        show_phone(book)
-                    case "remove_tag":
-                        remove_tag(book)
-                    case "show_birthday":
-                        show_birthday(book)
-                    case "all_notes":
-                        all_notes(book)
-            else:
-                print(
-                    f"\n{Fore.RED}Invalid command.\n{Fore.BLUE}To see all commands available type 'help'\n"
+        with patch_stdout(raw=True):
+            reminder = asyncio.create_task(remind_birthdays(current.book))
+            while True:
+                command = await session.prompt_async(
+                    HTML("<b><ansibrightcyan>Enter a command:</ansibrightcyan></b> "),
+                    completer=commands_completer,
                 )
+                if command in ("close", "exit"):
+                    break
+                if command == "use":
+                    with workload.command(command), stats.command(command):
+                        entry = await use(books, current) or current
+                    if entry is not current:
+                        current = entry
+                        reminder.cancel()
+                        reminder = asyncio.create_task(remind_birthdays(current.book))
+                elif command in COMMAND_NAMES:
+                    async with current.autosaver.lock:
+                        with workload.command(command), stats.command(command):
+                            await dispatch(command, current.book)
+                        if command in MUTATING_COMMANDS:
+                            current.autosaver.notify()
+                else:
+                    print(
+                        f"\n{Fore.RED}Invalid command.\n{Fore.BLUE}To see all commands available type 'help'\n"
+                    )
+        await close_books()
+        print("Good bye!")
     except (KeyboardInterrupt, EOFError):
-        save_data(book)
+        await close_books()
         print("\nGood bye!")
     except Exception:
-        save_data(book)
+        await close_books()
+    finally:
+        if reminder is not None:
+            reminder.cancel()
+        workload.stop()
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
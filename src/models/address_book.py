@@ -1,16 +1,27 @@
 from collections import UserDict
-from datetime import datetime, timedelta
+from datetime import datetime
 from colorama import Fore
 
+from constants.constants import PARALLEL_SEARCH_MIN_NOTES
+from decorators.locking import read_locked, write_locked
+from helpers.birth_date_index import BirthDateIndex
+from helpers.dedup import find_duplicates
+from helpers.birthday_calendar import (
+    DATE_FORMAT,
+    BirthdayCalendar,
+    congratulation_date,
+    next_birthday,
+)
+from helpers.birthday_columns import BirthdayColumns, age_bounds
+from helpers.minhash import SIMILARITY, MinHashIndex
+from helpers.note_date_index import NoteDateIndex
+from helpers.query import Query
+from helpers.rwlock import RWLock
+from helpers.tag_index import TagIndex
 from models.note import Note
 from models.record import Record
 
 
-DATE_FORMAT = "%d.%m.%Y"
-DAYS_IN_WEEK = 7
-WEEKEND_DAYS = [5, 6]  # Saturday and Sunday
-
-
 class AddressBook(UserDict):
     """
     AddressBook is a specialized dictionary for storing and managing contact records.
@@ -27,12 +38,214 @@ class AddressBook(UserDict):
 
         get_upcoming_birthdays():
             Returns a list of contacts with upcoming birthdays within the next week. Adjusts for weekends.
+
+    Concurrent mode:
+        AddressBook(concurrent=True) or enable_concurrency() shares one RWLock between the book
+        and all its records and notes. Reads (find, search, birthdays) then run in parallel from
+        many threads while writes are serialized. Without it no lock is taken at all.
+
+    Change tracking:
+        Records and notes belong to their book and report every change through mark_changed().
+        The names and titles changed since the last save are kept in changed_contacts and
+        changed_notes. Each save bumps `generation` and stamps the changed keys with it in
+        contact_generations / note_generations (deleted keys stay as tombstones), which lets
+        merge() pick up exactly the entries another process saved in the meantime.
+        `revision` counts changes in this session so derived structures know when to rebuild.
+
+    Birthday calendar:
+        get_upcoming_birthdays answers from a BirthdayCalendar (`birthday_calendar`) that is
+        built on the first query of a day and patched by mark_changed() for every changed contact.
+        The calendar is computed over packed BirthdayColumns (`birthday_columns`), and the
+        birth date queries (born_between, age_range) bisect a BirthDateIndex (`birth_date_index`)
+        sorted by birth date. Both are maintained the same way.
+
+    Note dates:
+        notes_between and recent_notes page through a NoteDateIndex (`note_date_index`) of the
+        notes sorted by creation date, maintained like the birthday indexes. edit_note records
+        the modification date of the note.
+
+    Queries:
+        query() and explain() run filter expressions such as `tag:#work AND created>2024-01-01`
+        (see helpers.query). The planner draws candidates from the indexes above, the
+        TagIndex (`tag_index`) and the keys of `data` / `notes`, and checks the other
+        conditions on the candidates only.
+
+        The birth date, note date and tag indexes are saved next to the data file when
+        built and restored by the next load if the book did not change in between (see
+        helpers.index_snapshot).
+
+    Similar notes:
+        similar_notes finds near-duplicates of a note through a MinHashIndex (`similarity_index`)
+        of MinHash signatures over the word shingles of the note contents, bucketed by
+        locality-sensitive hashing and maintained like the other note indexes.
+
+    Disk store:
+        A book attached to a DiskStore (`store`, see helpers.disk_store) keeps `data` and
+        `notes` in a SQLite database and only a bounded working set of records and notes in
+        memory. mark_changed() marks changed entries for write-back.
+
+    Parallel search:
+        With a ParallelNoteSearch attached as `parallel_search`, find_notes and find_notes_by_tag
+        scan books of PARALLEL_SEARCH_MIN_NOTES notes or more in a process pool.
     """
 
-    def __init__(self):
+    lock = None
+    parallel_search = None
+    store = None
+
+    def __init__(self, concurrent=False):
         super().__init__()
         self.notes = {}
+        self.generation = 0
+        self.contact_generations = {}
+        self.note_generations = {}
+        self.changed_contacts = set()
+        self.changed_notes = set()
+        self.revision = 0
+        self.birthday_columns = BirthdayColumns()
+        self.birthday_calendar = BirthdayCalendar()
+        self.birth_date_index = BirthDateIndex()
+        self.note_date_index = NoteDateIndex()
+        self.tag_index = TagIndex()
+        self.similarity_index = MinHashIndex()
+        if concurrent:
+            self.enable_concurrency()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for transient in (
+            "lock",
+            "changed_contacts",
+            "changed_notes",
+            "revision",
+            "parallel_search",
+            "birthday_columns",
+            "birthday_calendar",
+            "birth_date_index",
+            "note_date_index",
+            "tag_index",
+            "similarity_index",
+        ):
+            state.pop(transient, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault("generation", 0)
+        self.__dict__.setdefault("contact_generations", {})
+        self.__dict__.setdefault("note_generations", {})
+        self.changed_contacts = set()
+        self.changed_notes = set()
+        self.revision = 0
+        self.birthday_columns = BirthdayColumns()
+        self.birthday_calendar = BirthdayCalendar()
+        self.birth_date_index = BirthDateIndex()
+        self.note_date_index = NoteDateIndex()
+        self.tag_index = TagIndex()
+        self.similarity_index = MinHashIndex()
+        for record in self.data.values():
+            self._link(record)
+        for note in self.notes.values():
+            self._link(note)
+
+    def _link(self, item):
+        item.lock = self.lock
+        item.book = self
+
+    def mark_changed(self, item):
+        """
+        Remember that a record or note was changed since the last save.
+
+        Args:
+            item (Record | Note): The changed entry.
+        """
+
+        if self.store is not None:
+            self.store.changed(item)
+        if isinstance(item, Note):
+            self.changed_notes.add(item.title)
+            self.note_date_index.changed(self, item)
+            self.tag_index.changed(self, item)
+            self.similarity_index.changed(self, item)
+        else:
+            self.changed_contacts.add(item.name.value)
+            self.birthday_columns.changed(self, item)
+            self.birthday_calendar.changed(self, item)
+            self.birth_date_index.changed(self, item)
+        self.revision += 1
+
+    def stamp_changes(self, generation: int):
+        """
+        Stamp everything changed since the last save with a new save generation.
+
+        Args:
+            generation (int): The generation the book is being saved as.
+        """
 
+        for name in self.changed_contacts:
+            self.contact_generations[name] = generation
+        for title in self.changed_notes:
+            self.note_generations[title] = generation
+        self.changed_contacts.clear()
+        self.changed_notes.clear()
+        self.generation = generation
+
+    @write_locked
+    def merge(self, other: "AddressBook"):
+        """
+        Bring in the changes another process saved since this book was loaded or saved.
+
+        Only entries stamped with a generation newer than self.generation are taken from
+        the other book; entries changed in this session win over them. Entries missing
+        from the other book but stamped there were deleted and are removed here too.
+
+        Args:
+            other (AddressBook): The book as currently stored on disk.
+        """
+
+        for name, generation in other.contact_generations.items():
+            if generation > self.generation and name not in self.changed_contacts:
+                self.contact_generations[name] = generation
+                record = other.data.get(name)
+                if record is None:
+                    self.data.pop(name, None)
+                else:
+                    self._link(record)
+                    self.data[name] = record
+        for title, generation in other.note_generations.items():
+            if generation > self.generation and title not in self.changed_notes:
+                self.note_generations[title] = generation
+                note = other.notes.get(title)
+                if note is None:
+                    self.notes.pop(title, None)
+                else:
+                    self._link(note)
+                    self.notes[title] = note
+        self.birthday_columns.invalidate()
+        self.birthday_calendar.invalidate()
+        self.birth_date_index.invalidate()
+        self.note_date_index.invalidate()
+        self.tag_index.invalidate()
+        self.similarity_index.invalidate()
+        self.revision += 1
+
+    def enable_concurrency(self):
+        """
+        Switch the address book to concurrent mode.
+
+        Creates a reader-writer lock and shares it with every record and note, including
+        the ones added later, so it is safe to use the book from several threads.
+        """
+
+        self.lock = RWLock()
+        with self.lock.write():
+            for entries in (self.data, self.notes):
+                if self.store is not None:  # the store links entries as it loads them
+                    entries = entries.cache
+                for item in entries.values():
+                    self._link(item)
+
+    @write_locked
     def add_record(self, record: Record):
         """
         Adds a record to the address book. If the record's name does not exist in the address book,
@@ -46,7 +259,9 @@ class AddressBook(UserDict):
             str: A message indicating whether a new contact was added or an existing contact was updated.
         """
         if not self.data.get(record.name.value):
+            self._link(record)
             self.data[record.name.value] = record
+            self.mark_changed(record)
             print(
                 f"\n{Fore.GREEN}Contact {Fore.CYAN}{record.name.value} {Fore.GREEN}added.\n"
             )
@@ -56,6 +271,7 @@ class AddressBook(UserDict):
                 f"\n{Fore.GREEN}Phone number {Fore.CYAN}{record.phones[0].value} {Fore.GREEN}added to the contact {Fore.CYAN}{record.name.value}{Fore.GREEN}.\n"
             )
 
+    @read_locked
     def find(self, name: str):
         """
         Find a contact by name in the address book.
@@ -68,6 +284,7 @@ class AddressBook(UserDict):
         """
         return self.data.get(name, None)
 
+    @write_locked
     def delete(self, name):
         """
         Deletes a contact from the address book by name.
@@ -82,53 +299,127 @@ class AddressBook(UserDict):
         KeyError: If the contact with the given name is not found in the address book.
         """
         try:
-            self.data.pop(name)
+            self.mark_changed(self.data.pop(name))
             print(f"\n{Fore.GREEN}Contact {Fore.CYAN}{name} {Fore.GREEN}deleted.\n")
         except KeyError:
             print(f"\n{Fore.RED}Contact {Fore.CYAN} {name} {Fore.RED}not found.\n")
 
+    @read_locked
+    def find_duplicates(self):
+        """
+        Find contacts that are probably the same person (see helpers.dedup.find_duplicates).
+
+        Returns:
+            tuple[list[MergeProposal], int]: The proposed merges and the number of
+                blocking-key blocks skipped for being too large.
+        """
+
+        return find_duplicates(self.data)
+
+    @write_locked
+    def merge_duplicates(self, proposals) -> int:
+        """
+        Apply merge proposals: every duplicate is merged into the kept contact and deleted.
+
+        Proposals naming contacts that no longer exist are applied to the ones that do.
+
+        Args:
+            proposals (list[MergeProposal]): As returned by find_duplicates.
+
+        Returns:
+            int: The number of contacts merged away.
+        """
+
+        merged = 0
+        for proposal in proposals:
+            keep = self.data.get(proposal.keep)
+            if keep is None:
+                continue
+            for name in proposal.duplicates:
+                if name == proposal.keep:
+                    continue
+                duplicate = self.data.pop(name, None)
+                if duplicate is None:
+                    continue
+                keep.merge_from(duplicate)
+                self.mark_changed(duplicate)
+                merged += 1
+        return merged
+
+    @read_locked
     def get_upcoming_birthdays(self, days):
         """
         Get a list of upcoming birthdays within the specified number of days.
 
         This method checks each user's birthday and calculates if it falls within the next
         specified days from the current date. If the birthday falls on a weekend, it adjusts
-        the date to the next Monday.
+        the date to the next Monday. Windows up to the calendar horizon are sliced from the
+        birthday calendar, ordered by date; longer ones scan every contact.
 
         Returns:
             list: A list of dictionaries, each containing the user's name and their next
                 upcoming birthday in the specified date format.
         """
 
-        if len(self.data) == 0:
-            return []
         today = datetime.now().date()
+        if days <= self.birthday_calendar.horizon:
+            return self.birthday_calendar.upcoming(self, days, today)
+        return self.scan_upcoming_birthdays(days, today)
+
+    def scan_upcoming_birthdays(self, days, today):
+        """
+        Compute upcoming birthdays with a per-contact loop, without the calendar.
+
+        Same result as get_upcoming_birthdays, in the order of the contacts.
+        """
+
         upcoming_birthdays = []
 
         for user in self.data.values():
             if user.birthday is not None:
-                birthday_this_year = user.birthday.value.date().replace(year=today.year)
-                if birthday_this_year < today:
-                    birthday_this_year = birthday_this_year.replace(year=today.year + 1)
-
+                birthday_this_year = next_birthday(user.birthday.value.date(), today)
                 days_until_birthday = (birthday_this_year - today).days
 
                 if 0 <= days_until_birthday <= days:
-                    if birthday_this_year.weekday() in WEEKEND_DAYS:
-                        days_to_monday = 7 - birthday_this_year.weekday()
-                        birthday_this_year += timedelta(days=days_to_monday)
-
                     upcoming_birthdays.append(
                         {
                             "name": user.name.value,
-                            "next_upcoming_birthday": birthday_this_year.strftime(
-                                DATE_FORMAT
-                            ),
+                            "next_upcoming_birthday": congratulation_date(
+                                birthday_this_year
+                            ).strftime(DATE_FORMAT),
                         }
                     )
 
         return upcoming_birthdays
 
+    @read_locked
+    def born_between(self, start, end):
+        """
+        Find the contacts born from start to end, both dates included.
+
+        Args:
+            start (date): The first birth date.
+            end (date): The last birth date.
+
+        Returns:
+            list[Record]: The matching contacts, ordered by birth date.
+        """
+
+        self.birth_date_index.build(self)
+        return [self.data[name] for name in self.birth_date_index.born_between(start, end)]
+
+    @read_locked
+    def age_range(self, min_age, max_age):
+        """
+        Find the contacts aged min_age to max_age (in full years) today.
+
+        Returns:
+            list[Record]: The matching contacts, youngest last.
+        """
+
+        return self.born_between(*age_bounds(datetime.now().date(), min_age, max_age))
+
+    @write_locked
     def add_note(self, title: str, content: str):
         """
         Adds a note with the given title and content to the address book.
@@ -148,11 +439,15 @@ class AddressBook(UserDict):
             raise ValueError(
                 f"\n{Fore.GREEN}Note with title {Fore.CYAN}{title} {Fore.GREEN}already exists.\n"
             )
-        self.notes[title] = Note(title, content)
+        note = Note(title, content)
+        self._link(note)
+        self.notes[title] = note
+        self.mark_changed(note)
         print(
             f"\n{Fore.GREEN}Note {Fore.CYAN}{title} {Fore.GREEN}added successfully.\n"
         )
 
+    @write_locked
     def delete_note_by_title(self, title: str):
         """
         Deletes a note by its title.
@@ -172,14 +467,15 @@ class AddressBook(UserDict):
                 f"\n{Fore.RED}Note with title {Fore.CYAN}{title}{Fore.RED} not found.\n"
             )
 
-        del self.notes[title]
+        self.mark_changed(self.notes.pop(title))
         print(
             f"\n{Fore.GREEN}Note {Fore.CYAN}{title}{Fore.GREEN} deleted successfully.\n"
         )
 
+    @write_locked
     def edit_note(self, title: str, new_content: str):
         """
-        Edit the content of an existing note.
+        Edit the content of an existing note and record its modification date.
 
         Args:
             title (str): The title of the note to be edited.
@@ -197,11 +493,106 @@ class AddressBook(UserDict):
                 f"\n{Fore.RED}Note with title {Fore.CYAN}{title}{Fore.RED} not found.\n"
             )
 
-        self.notes[title].value = new_content
+        self.notes[title].change_content(new_content)
         print(
             f"\n{Fore.GREEN}Note {Fore.CYAN}{title}{Fore.GREEN} updated successfully.\n"
         )
 
+    @read_locked
+    def notes_between(self, start, end, offset=0, limit=None):
+        """
+        Find the notes created from start to end, both included, oldest first.
+
+        Args:
+            start (datetime): The earliest creation date.
+            end (datetime): The latest creation date.
+            offset (int): Notes to skip, for paging.
+            limit (int | None): Most notes to return; all by default.
+
+        Returns:
+            list[Note]: The matching notes.
+        """
+
+        self.note_date_index.build(self)
+        titles = self.note_date_index.created_between(start, end, offset, limit)
+        return [self.notes[title] for title in titles]
+
+    @read_locked
+    def recent_notes(self, count, offset=0):
+        """
+        Find the most recently created notes, newest first.
+
+        Args:
+            count (int): Most notes to return.
+            offset (int): Newest notes to skip, for paging.
+
+        Returns:
+            list[Note]: The notes.
+        """
+
+        self.note_date_index.build(self)
+        return [self.notes[title] for title in self.note_date_index.recent(count, offset)]
+
+    @read_locked
+    def similar_notes(self, title: str, threshold: float = SIMILARITY):
+        """
+        Find the notes whose contents are near-duplicates of a note, most similar first.
+
+        Args:
+            title (str): The title of the note.
+            threshold (float): The lowest estimated Jaccard similarity of the word
+                shingles of two notes to report.
+
+        Returns:
+            list[tuple[Note, float]]: The similar notes and their estimated similarity.
+
+        Raises:
+            KeyError: If a note with the specified title does not exist.
+        """
+
+        if title not in self.notes:
+            raise KeyError(
+                f"\n{Fore.RED}Note with title {Fore.CYAN}{title}{Fore.RED} not found.\n"
+            )
+
+        self.similarity_index.build(self)
+        return [
+            (self.notes[other], score)
+            for other, score in self.similarity_index.similar(title, threshold)
+        ]
+
+    @read_locked
+    def query(self, expression: str):
+        """
+        Find the contacts or notes matching a filter expression.
+
+        Args:
+            expression (str): E.g. `tag:#work AND text:invoice AND created>2024-01-01`
+                or `has:email AND birthday:30d`. All fields must be contact fields
+                or all note fields.
+
+        Returns:
+            tuple[str, dict]: "contacts" or "notes", and the matches by name or title.
+
+        Raises:
+            QueryError: If the expression cannot be parsed.
+        """
+
+        query = Query(self, expression)
+        return query.target, query.run()
+
+    @read_locked
+    def explain(self, expression: str) -> str:
+        """
+        Describe how query() would evaluate an expression, with estimated cardinalities.
+
+        Raises:
+            QueryError: If the expression cannot be parsed.
+        """
+
+        return Query(self, expression).explain()
+
+    @read_locked
     def find_notes(self, query: str):
         """
         Searches for notes that contain the given query in their title or value.
@@ -214,7 +605,12 @@ class AddressBook(UserDict):
                          and the values are the note objects. If no notes are found, returns
                          a string message indicating no matches.
         """
-        
+
+        if (
+            self.parallel_search is not None
+            and len(self.notes) >= PARALLEL_SEARCH_MIN_NOTES
+        ):
+            return self.parallel_search.find_notes(query)
         found_notes = {
             key: note
             for key, note in self.notes.items()
@@ -224,9 +620,13 @@ class AddressBook(UserDict):
 
         return found_notes
 
+    @read_locked
     def find_note_by_title(self, note_title: str) -> Note | None:
         """
-        Find a note by its title.
+        Find a note by its title, ignoring case.
+
+        The exact title is looked up first (a primary key read for a book in a disk
+        store); only if it misses are all titles compared.
 
         Args:
             note_title (str): The title of the note to find.
@@ -235,11 +635,15 @@ class AddressBook(UserDict):
             Note | None: The note object if found, otherwise None.
         """
 
+        note = self.notes.get(note_title)
+        if note is not None:
+            return note
         for title, note in self.notes.items():
             if title.lower() == note_title.lower():
                 return note
         return None
 
+    @read_locked
     def find_notes_by_tag(self, tag: str) -> list[Note]:
         """
         Find notes by a specific tag.
@@ -249,6 +653,11 @@ class AddressBook(UserDict):
             list[Note]: A list of notes that contain the specified tag.
         """
 
+        if (
+            self.parallel_search is not None
+            and len(self.notes) >= PARALLEL_SEARCH_MIN_NOTES
+        ):
+            return self.parallel_search.find_notes_by_tag(tag)
         notes = {
             key: note for key, note in self.notes.items() if note.is_tag_exists(tag)
         }
@@ -272,3 +681,20 @@ class AddressBook(UserDict):
         """
 
         return self.notes
+
+    def get_indexes(self):
+        """
+        Retrieve the secondary indexes maintained by the address book.
+
+        Returns:
+            dict: Index name -> (index object, number of entries). Used by the memory report.
+        """
+
+        return {
+            "birthday columns": (self.birthday_columns, len(self.birthday_columns)),
+            "birthday calendar": (self.birthday_calendar, len(self.birthday_calendar)),
+            "birth date index": (self.birth_date_index, len(self.birth_date_index)),
+            "note date index": (self.note_date_index, len(self.note_date_index)),
+            "tag index": (self.tag_index, len(self.tag_index)),
+            "similarity index": (self.similarity_index, len(self.similarity_index)),
+        }
@@ -1,9 +1,48 @@
 from colorama import Fore
 from datetime import datetime
+from decorators.locking import read_locked, write_locked
 from models.field import Field
 from models.tag import Tag, TagDuplicateError, TagNotFound, auto_add_hashtag
 
 
+class MissingBodyError(LookupError):
+    """The stored bodies of a lazily loaded note do not include it."""
+
+
+class LazyBody:
+    """
+    Descriptor for a note body that is read from storage on first access.
+
+    Notes loaded from a sharded book or a data file carry `body_loader = (segment,
+    key)` instead of their content. The first read of `value` calls
+    `segment.load()`, which returns the bodies of the whole segment, and stores the
+    body in the instance, so later reads and all writes bypass the descriptor.
+
+    A body missing from the segment is read again from disk once; if it is still
+    missing MissingBodyError is raised, so the note is never taken (and saved) as
+    empty.
+    """
+
+    def __get__(self, note, owner=None):
+        if note is None:
+            return self
+        loader = note.__dict__.get("body_loader")
+        if loader is None:
+            try:  # loaded by another thread in the meantime
+                return note.__dict__["value"]
+            except KeyError:
+                raise AttributeError("value") from None
+        segment, key = loader
+        bodies = segment.load()
+        if key not in bodies:
+            bodies = segment.load(reload=True)  # cached before a save that added it
+        if key not in bodies:
+            raise MissingBodyError(f"The body of note {key!r} is missing from {segment.path}")
+        value = note.__dict__["value"] = bodies[key]
+        note.__dict__.pop("body_loader", None)
+        return value
+
+
 class Note(Field):
     """
     A class used to represent a Note.
@@ -12,21 +51,43 @@ class Note(Field):
         title (str): The title of the note.
         value (str): The content of the note.
         creation_date (datetime): The date and time when the note was created.
+        modification_date (datetime): The date and time its content was last changed.
 
     Methods:
         change_title(new_title):
         change_content(new_content):
         __str__():
             Returns a string representation of the note.
+
+    The note reports changes to its address book (`book`) and shares its lock in concurrent mode.
+    Its content may be loaded lazily (see LazyBody).
     """
 
+    lock = None
+    book = None
+    value = LazyBody()
+
     def __init__(self, title, note):
         super().__init__(note)
         self.title: str = title
         self.value = note
         self.creation_date = datetime.now()
+        self.modification_date = self.creation_date
         self.tags: list[Tag] = []
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("lock", None)
+        state.pop("book", None)
+        state.pop("body_loader", None)
+        state["value"] = self.value
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("modification_date", state["creation_date"])
+        self.__dict__.update(state)
+
+    @write_locked
     def change_title(self, new_title):
         """
         Changes the title of the note.
@@ -39,6 +100,7 @@ class Note(Field):
         """
         self.title = new_title
 
+    @write_locked
     def change_content(self, new_content):
         """
         Changes the content of the note.
@@ -50,7 +112,9 @@ class Note(Field):
         None
         """
         self.value = new_content
+        self.modification_date = datetime.now()
 
+    @write_locked
     def add_tag(self, new_tag: str) -> None:
         new_tag = auto_add_hashtag(new_tag)
         for tag in self.tags:
@@ -59,10 +123,12 @@ class Note(Field):
         self.tags.append(Tag(new_tag))
         print(f"\n{Fore.GREEN}Tag {Fore.CYAN}{new_tag} {Fore.GREEN}added to note {Fore.CYAN}{self.title}{Fore.GREEN}.\n")
 
+    @read_locked
     def is_tag_exists(self, tag: str) -> bool:
         tag = auto_add_hashtag(tag)
         return tag in [tag.value for tag in self.tags]
 
+    @write_locked
     def remove_tag(self, tag_to_remove: str) -> None:
         tag_to_remove = auto_add_hashtag(tag_to_remove)
         if not self.is_tag_exists(tag_to_remove):
@@ -70,6 +136,22 @@ class Note(Field):
         self.tags = [tag for tag in self.tags if tag.value != tag_to_remove]
         print(f"\n{Fore.GREEN}Tag {Fore.CYAN}{tag_to_remove} {Fore.GREEN}removed from note {Fore.CYAN}{self.title}{Fore.GREEN}.\n")
 
+    @read_locked
+    def to_dict(self) -> dict:
+        """
+        Returns the note as a JSON-serializable dictionary.
+
+        Returns:
+            dict: The title, content, tags and ISO creation and modification dates of the note.
+        """
+        return {
+            "title": self.title,
+            "content": self.value,
+            "tags": [tag.value for tag in self.tags],
+            "created": self.creation_date.isoformat(),
+            "modified": self.modification_date.isoformat(),
+        }
+
     def __get_tags_str(self):
         result_str = '\nTags:'
         for tag in self.tags:
@@ -1,4 +1,5 @@
 from colorama import Fore
+from decorators.locking import read_locked, write_locked
 from models.name import Name
 from models.phone import Phone
 from models.birthday import Birthday
@@ -33,8 +34,13 @@ class Record:
         Adds a birthday to the contact.
     show_birthdays():
         Returns the birthday of the contact.
+
+    The record reports changes to its address book (`book`) and shares its lock in concurrent mode.
     """
 
+    lock = None
+    book = None
+
     def __init__(self, name):
         self.name = Name(name)
         self.phones = []
@@ -42,9 +48,17 @@ class Record:
         self.email = None
         self.address = None
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("lock", None)
+        state.pop("book", None)
+        return state
+
+    @read_locked
     def __str__(self):
         return f"Contact name: {self.name.value}, phones: {'; '.join(p.value for p in self.phones)}, birthday: {self.birthday}, email: {self.email}, address: {self.address}"
 
+    @write_locked
     def add_phone(self, phone_number: Phone):
         """
         Adds a phone number to the record.
@@ -59,6 +73,7 @@ class Record:
         if phone:
             self.phones.append(phone)
 
+    @write_locked
     def add_email(self, value):
         """
         Adds an email to the record.
@@ -68,6 +83,7 @@ class Record:
         self.email = Email(value)
         print(f"\n{Fore.GREEN}Email {Fore.CYAN}{value} {Fore.GREEN}added to {Fore.CYAN}{self.name}{Fore.GREEN}.\n")
 
+    @write_locked
     def add_address(self, address):
         """
         Adds an address to the record.
@@ -78,6 +94,7 @@ class Record:
         self.address = Address(address)
         print(f"\n{Fore.GREEN}Address added to {Fore.CYAN}{self.name}.\n")
 
+    @write_locked
     def edit_email(self, new_email):
         """
         Edits the email address in the record.
@@ -89,6 +106,7 @@ class Record:
         self.email = Email(new_email)
         print(f"\n{Fore.GREEN}Email changed to {Fore.CYAN}{new_email}{Fore.GREEN}.\n")
 
+    @write_locked
     def edit_address(self, new_address):
         """
         Edits the address in the record.
@@ -101,6 +119,7 @@ class Record:
             f"\n{Fore.GREEN}Address changed to {Fore.CYAN}{new_address}{Fore.GREEN}.\n"
         )
 
+    @write_locked
     def edit_phone(self, current_phone, new_phone):
         """
         Edits an existing phone number in the record.
@@ -120,6 +139,7 @@ class Record:
                 )
                 break
 
+    @read_locked
     def find_phone(self, phone_number):
         """
         Search for a phone number in the list of phone objects.
@@ -135,6 +155,7 @@ class Record:
                 return phone
         return None
 
+    @read_locked
     def get_all_phones(self):
         """
         Retrieve all phone numbers associated with the record.
@@ -144,6 +165,7 @@ class Record:
         """
         return self.phones
 
+    @write_locked
     def add_birthday(self, birthday):
         """
         Adds a birthday to the record.
@@ -156,6 +178,7 @@ class Record:
         """
         self.birthday = Birthday(birthday)
 
+    @read_locked
     def show_birthdays(self):
         """
         Returns the birthday attribute of the record.
@@ -165,6 +188,23 @@ class Record:
         """
         return self.birthday
 
+    @read_locked
+    def to_dict(self):
+        """
+        Returns the record as a JSON-serializable dictionary.
+
+        Returns:
+            dict: The name, phones, birthday (DD.MM.YYYY), email and address of the contact.
+        """
+        return {
+            "name": self.name.value,
+            "phones": [phone.value for phone in self.phones],
+            "birthday": str(self.birthday) if self.birthday else None,
+            "email": self.email.value if self.email else None,
+            "address": self.address.value if self.address else None,
+        }
+
+    @write_locked
     def change_address(self, new_address: str) -> None:
         """
         Change exiting address to the record.
@@ -173,3 +213,23 @@ class Record:
             new_address (str): The home address in the string format.
         """
         self.address = Address(new_address)
+
+    @write_locked
+    def merge_from(self, other: "Record") -> None:
+        """
+        Take over the details of a duplicate of this contact.
+
+        Phones missing from this record are appended; email, address and birthday
+        are copied only where this record has none.
+
+        Args:
+            other (Record): The duplicate contact.
+        """
+        phones = {phone.value for phone in self.phones}
+        for phone in other.phones:
+            if phone.value not in phones:
+                phones.add(phone.value)
+                self.phones.append(phone)
+        for field in ("email", "address", "birthday"):
+            if getattr(self, field) is None:
+                setattr(self, field, getattr(other, field))
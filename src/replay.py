@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import os
+from collections import Counter
+from contextlib import redirect_stdout
+from time import perf_counter
+
+import main as assistant
+from constants.constants import COMMAND_NAMES, FILE_NAME, WORKING_SET_SIZE
+from helpers.data import load_data
+from helpers.file_lock import FileLock
+from helpers.stats import stats
+from helpers.table_view import get_stats_table
+from helpers.workload import ReplayMismatch, read_log, workload
+
+SKIPPED = ("close", "exit", "use")  # the replay runs against one book and never exits
+
+
+async def replay(book, entries: list[dict], failures: Counter) -> tuple[float, int, int]:
+    """
+    Run recorded commands against the book, each fed the inputs recorded for it.
+
+    Output is discarded (tables are still rendered, only not written), birthday
+    reminders and autosave do not run and the book is not saved. A command that
+    raises is counted as an error of its command in `stats` and in `failures`
+    ("command: error" -> count), and the replay goes on with the next one.
+
+    Returns:
+        tuple[float, int, int]: Seconds spent, commands replayed and commands that
+            prompted for more inputs than were recorded.
+    """
+
+    replayed = mismatches = 0
+    started = perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for entry in entries:
+            command = entry["command"]
+            if command in SKIPPED or command not in COMMAND_NAMES:
+                continue
+            with workload.command(command, entry["inputs"]), stats.command(command):
+                try:
+                    await assistant.dispatch(command, book)
+                except ReplayMismatch:
+                    mismatches += 1
+                except Exception as error:  # the log also holds commands that failed
+                    stats.record_error(command)
+                    failures[f"{command}: {type(error).__name__}: {error}"] += 1
+            replayed += 1
+    return perf_counter() - started, replayed, mismatches
+
+
+def open_book(path: str, working_set: int | None):
+    """
+    Open the book to replay against: a data file, a sharded book or a disk store.
+
+    A disk store (a .db file, see helpers.disk_store) is opened the way the
+    assistant opens it, with at most `working_set` contacts and notes in memory.
+    Its changes are rolled back after the run (see close_book), so every run
+    starts from the same store.
+
+    Returns:
+        AddressBook: The loaded book.
+    """
+
+    if path.endswith(".db"):
+        from helpers.disk_store import DiskStore
+        from models.address_book import AddressBook
+
+        with FileLock(path):
+            book = DiskStore(path, working_set or WORKING_SET_SIZE).attach(AddressBook())
+    else:
+        book = load_data(path)
+    book.enable_concurrency()  # as in the assistant
+    return book
+
+
+def close_book(book):
+    """Drop what a replay changed in a disk store; books loaded into memory are never saved."""
+
+    if book.store is not None:
+        book.store.discard()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a workload recorded with main.py --record and report per-command latency"
+    )
+    parser.add_argument("log", help="workload log written by main.py --record")
+    parser.add_argument(
+        "--book",
+        default=FILE_NAME,
+        help="data file, sharded book directory or disk store (.db) to replay against (only read)",
+    )
+    parser.add_argument(
+        "--working-set",
+        type=int,
+        metavar="N",
+        help=f"contacts and notes a disk store keeps in memory (default {WORKING_SET_SIZE})",
+    )
+    parser.add_argument("--runs", type=int, default=1, help="replay the log this many times")
+    args = parser.parse_args()
+    if not os.path.exists(args.book):
+        parser.error(f"no book at {args.book}")
+    if args.working_set is not None and args.working_set < 1:
+        parser.error("--working-set must be at least 1")
+
+    entries = read_log(args.log)
+    skipped = sum(entry["command"] in SKIPPED for entry in entries)
+    stats.enabled = True
+    loads, walls, replayed, mismatches, failures = [], [], 0, 0, Counter()
+    for _ in range(args.runs):
+        started = perf_counter()
+        book = open_book(args.book, args.working_set)  # a fresh copy each run
+        loads.append(perf_counter() - started)
+        assistant.bind_completers(book)
+        try:
+            wall, count, failed = asyncio.run(replay(book, entries, failures))
+        finally:
+            close_book(book)
+        walls.append(wall)
+        replayed += count
+        mismatches += failed
+
+    print(
+        f"{len(entries)} recorded commands, {skipped} skipped ({', '.join(SKIPPED)}), "
+        f"{args.runs} run(s) against {args.book}"
+    )
+    print(f"load   {min(loads):8.3f} s (best of {args.runs})")
+    print(f"replay {min(walls):8.3f} s (best of {args.runs}), {replayed} commands in total")
+    if mismatches or workload.unused:
+        print(
+            f"diverged: {mismatches} commands asked for more inputs than recorded, "
+            f"{workload.unused} recorded inputs were not asked for"
+        )
+    if failures:
+        print(f"failed: {failures.total()} commands raised an error")
+        for failure, count in failures.most_common():
+            print(f"  {count} x {failure}")
+    print(get_stats_table(stats.histograms, stats.errors))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import io
+import random
+import sys
+import threading
+import traceback
+from contextlib import redirect_stdout
+from time import perf_counter
+
+from models.address_book import AddressBook
+from models.birthday import Birthday
+from models.phone import Phone
+from models.record import Record
+from models.tag import Tag
+
+UPCOMING_DAYS = 7
+
+
+def build_book(contacts: int, notes: int) -> AddressBook:
+    """Build the stable part of the book, which the writer never touches."""
+
+    rng = random.Random(0)
+    book = AddressBook()
+    for i in range(contacts):
+        record = Record(f"Stable {i}")
+        record.phones.append(Phone(str(rng.randrange(10**9, 10**10))))
+        record.birthday = Birthday(
+            f"{rng.randrange(1, 29):02d}.{rng.randrange(1, 13):02d}.{rng.randrange(1950, 2005)}"
+        )
+        book.data[record.name.value] = record
+    for i in range(notes):
+        book.add_note(f"Stable note {i}", f"stable content number {i}")
+        book.notes[f"Stable note {i}"].tags.append(Tag("#stable"))
+    book.enable_concurrency()
+    return book
+
+
+def writer(book: AddressBook, stop: threading.Event, keep: int, counts: dict):
+    """Add and delete contacts and notes that no reader checks for, until stopped."""
+
+    i = 0
+    while not stop.is_set():
+        record = Record(f"Churn {i}")
+        record.add_phone("1234567890")
+        book.add_record(record)
+        book.add_note(f"Churn note {i}", f"churn content {i}")
+        book.notes[f"Churn note {i}"].add_tag("#churn")
+        if i >= keep:
+            book.delete(f"Churn {i - keep}")
+            book.delete_note_by_title(f"Churn note {i - keep}")
+        i += 1
+    counts["writes"] = i
+
+
+def reader(book: AddressBook, stop: threading.Event, expected: dict, seed: int, counts: dict):
+    """Run read commands and check every answer against the stable part of the book."""
+
+    rng = random.Random(seed)
+    reads = 0
+    while not stop.is_set():
+        name = f"Stable {rng.randrange(expected['contacts'])}"
+        record = book.find(name)
+        if record is None or record.name.value != name:
+            raise AssertionError(f"find({name!r}) returned {record!r}")
+        churn = book.find(f"Churn {rng.randrange(1000)}")
+        if churn is not None and not churn.name.value.startswith("Churn "):
+            raise AssertionError(f"find returned {churn.name.value!r} for a churned name")
+        found = book.find_notes("stable content")
+        if len(found) != expected["notes"]:
+            raise AssertionError(f"find_notes found {len(found)} of {expected['notes']} notes")
+        upcoming = book.get_upcoming_birthdays(UPCOMING_DAYS)
+        if len(upcoming) != expected["upcoming"]:
+            raise AssertionError(
+                f"get_upcoming_birthdays returned {len(upcoming)}, not {expected['upcoming']}"
+            )
+        target, matches = book.query("tag:#stable")
+        if target != "notes" or len(matches) != expected["notes"]:
+            raise AssertionError(f"query matched {len(matches)} of {expected['notes']} notes")
+        reads += 1
+    counts[seed] = reads
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run reader threads against a writer thread on one book and check every read"
+    )
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to run")
+    parser.add_argument("--contacts", type=int, default=2_000)
+    parser.add_argument("--notes", type=int, default=2_000)
+    parser.add_argument("--keep", type=int, default=200, help="churned entries kept alive")
+    args = parser.parse_args()
+
+    with redirect_stdout(io.StringIO()):
+        book = build_book(args.contacts, args.notes)
+    expected = {
+        "contacts": args.contacts,
+        "notes": args.notes,
+        "upcoming": len(book.get_upcoming_birthdays(UPCOMING_DAYS)),
+    }
+    stop = threading.Event()
+    errors, counts = [], {}
+
+    def run(target, *target_args):
+        try:
+            target(*target_args)
+        except BaseException:
+            errors.append(traceback.format_exc())
+            stop.set()
+
+    threads = [threading.Thread(target=run, args=(writer, book, stop, args.keep, counts))]
+    threads += [
+        threading.Thread(target=run, args=(reader, book, stop, expected, seed, counts))
+        for seed in range(args.readers)
+    ]
+    started = perf_counter()
+    with redirect_stdout(io.StringIO()):  # the models print their confirmations
+        for thread in threads:
+            thread.start()
+        stop.wait(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    elapsed = perf_counter() - started
+
+    reads = sum(value for key, value in counts.items() if key != "writes")
+    print(
+        f"{args.readers} readers, 1 writer, {elapsed:.1f} s: {reads} read rounds, "
+        f"{counts.get('writes', 0)} write rounds"
+    )
+    if errors:
+        print(f"{len(errors)} thread(s) failed:", file=sys.stderr)
+        for error in errors:
+            print(error, file=sys.stderr)
+        sys.exit(1)
+    print("all reads consistent")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+import argparse
+import asyncio
+import io
+import json
+import re
+import signal
+from contextlib import redirect_stdout
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from constants.constants import FILE_NAME, SERVER_HOST, SERVER_PORT
+from helpers.autosave import AutoSaver
+from helpers.data import load_data, save_data
+from models.address import Address
+from models.address_book import AddressBook
+from models.birthday import Birthday
+from models.email import Email
+from models.phone import Phone
+from models.record import Record
+
+ANSI_CODES = re.compile(r"\x1b\[[0-9;]*m")
+REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+CONTACT_FIELDS = {"birthday": Birthday, "email": Email, "address": Address}
+
+
+def plain(error: Exception) -> str:
+    """Return the message of a model error without terminal colors."""
+
+    message = error.args[0] if error.args else str(error)
+    return ANSI_CODES.sub("", str(message)).strip()
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def apply_contact(book: AddressBook, item: dict) -> dict:
+    """
+    Create a contact or update an existing one from a JSON object.
+
+    Args:
+        book (AddressBook): The address book to change.
+        item (dict): "name" and optional "phones", "birthday", "email" and "address".
+
+    Returns:
+        dict: The stored contact.
+
+    Raises:
+        ValueError: If the name is missing or a field does not pass validation.
+    """
+
+    name = item.get("name")
+    if not name:
+        raise ValueError("Contact name is required")
+    # validate every field before the book changes, so a bad one leaves no partial contact
+    phones = [Phone(phone).value for phone in item.get("phones", [])]
+    for key, field in CONTACT_FIELDS.items():
+        if item.get(key):
+            field(item[key])
+    record = book.find(name)
+    new = record is None
+    if new:
+        record = Record(name)
+    for phone in phones:
+        if not record.find_phone(phone):
+            record.add_phone(phone)
+    if item.get("birthday"):
+        record.add_birthday(item["birthday"])
+    if item.get("email"):
+        record.add_email(item["email"])
+    if item.get("address"):
+        record.add_address(item["address"])
+    if new:
+        book.add_record(record)
+    return record.to_dict()
+
+
+def apply_note(book: AddressBook, item: dict) -> dict:
+    """
+    Create a note from a JSON object.
+
+    Args:
+        book (AddressBook): The address book to change.
+        item (dict): "title", "content" and optional "tags".
+
+    Returns:
+        dict: The stored note.
+
+    Raises:
+        ValueError: If the title or content is missing or the note already exists.
+    """
+
+    title = item.get("title")
+    if not title or not item.get("content"):
+        raise ValueError("Note title and content are required")
+    book.add_note(title, item["content"])
+    note = book.notes[title]
+    for tag in item.get("tags", []):
+        note.add_tag(tag)
+    return note.to_dict()
+
+
+def apply_batch(apply, book: AddressBook, items) -> list[dict]:
+    """
+    Apply a batch of items, reporting the outcome of every item separately.
+
+    Returns:
+        list: {"ok": True, "item": ...} or {"ok": False, "error": ...} per item.
+    """
+
+    if not isinstance(items, list):
+        items = [items]
+    results = []
+    for item in items:
+        try:
+            results.append({"ok": True, "item": apply(book, item)})
+        except Exception as e:
+            results.append({"ok": False, "error": plain(e)})
+    return results
+
+
+class AddressBookServer:
+    """
+    JSON-over-HTTP service exposing an AddressBook to local clients.
+
+    Requests are read on persistent HTTP/1.1 connections (keep-alive). Reads run
+    directly on the event loop: they never await in the middle, so every read sees
+    the book between two writes and many of them are served concurrently. Writes are
+    queued to a single writer task that drains the queue and applies everything
+    pending as one batch under the autosave lock, so snapshots stay consistent.
+
+    Endpoints:
+        GET    /contacts, /contacts/<name>, /birthdays?days=N
+        POST   /contacts (object or list of objects)
+        DELETE /contacts/<name>
+        GET    /notes[?query=text][&tag=#tag], /notes/<title>
+        POST   /notes (object or list of objects)
+        PUT    /notes/<title> {"content": ...}
+        DELETE /notes/<title>
+    """
+
+    def __init__(self, book: AddressBook, autosaver: AutoSaver):
+        self.book = book
+        self.autosaver = autosaver
+        self.writes = asyncio.Queue()
+        self.batches = 0
+
+    async def write(self, operation):
+        future = asyncio.get_running_loop().create_future()
+        await self.writes.put((operation, future))
+        return await future
+
+    async def run_writer(self):
+        while True:
+            batch = [await self.writes.get()]
+            while not self.writes.empty():
+                batch.append(self.writes.get_nowait())
+            async with self.autosaver.lock:
+                with redirect_stdout(io.StringIO()):
+                    for operation, future in batch:
+                        revision = self.book.revision
+                        try:
+                            future.set_result(operation())
+                        except Exception as e:
+                            future.set_exception(e)
+                        else:
+                            # a batch whose items all failed changed nothing to save
+                            if self.book.revision != revision:
+                                self.autosaver.notify()
+            self.batches += 1
+
+    def read(self, parts: list[str], query: dict):
+        book = self.book
+        match parts:
+            case ["contacts"]:
+                return 200, [record.to_dict() for record in book.data.values()]
+            case ["contacts", name]:
+                record = book.find(name)
+                if record is None:
+                    raise HTTPError(404, f"Contact {name} not found")
+                return 200, record.to_dict()
+            case ["birthdays"]:
+                days = int(query.get("days", ["7"])[0])
+                return 200, book.get_upcoming_birthdays(days)
+            case ["notes"]:
+                notes = book.notes
+                if "query" in query:
+                    notes = book.find_notes(query["query"][0])
+                if "tag" in query:
+                    tag = query["tag"][0]
+                    notes = {
+                        title: note
+                        for title, note in notes.items()
+                        if note.is_tag_exists(tag)
+                    }
+                return 200, [note.to_dict() for note in notes.values()]
+            case ["notes", title]:
+                note = book.find_note_by_title(title)
+                if note is None:
+                    raise HTTPError(404, f"Note {title} not found")
+                return 200, note.to_dict()
+        raise HTTPError(404, "Unknown endpoint")
+
+    async def change(self, method: str, parts: list[str], body):
+        book = self.book
+        match method, parts:
+            case "POST", ["contacts"]:
+                return 201, await self.write(
+                    lambda: apply_batch(apply_contact, book, body)
+                )
+            case "POST", ["notes"]:
+                return 201, await self.write(lambda: apply_batch(apply_note, book, body))
+            case "DELETE", ["contacts", name]:
+                if book.find(name) is None:
+                    raise HTTPError(404, f"Contact {name} not found")
+                await self.write(lambda: book.delete(name))
+                return 200, {"deleted": name}
+            case "PUT", ["notes", title]:
+                content = (body or {}).get("content")
+                if not content:
+                    raise HTTPError(400, "Note content is required")
+                await self.write(lambda: book.edit_note(title, content))
+                return 200, book.notes[title].to_dict()
+            case "DELETE", ["notes", title]:
+                await self.write(lambda: book.delete_note_by_title(title))
+                return 200, {"deleted": title}
+        raise HTTPError(405, f"{method} is not supported here")
+
+    async def handle_request(self, method: str, target: str, body: bytes):
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        try:
+            if method == "GET":
+                # the autosave merges saves of other sessions into the book under this lock
+                async with self.autosaver.lock:
+                    return self.read(parts, parse_qs(url.query))
+            payload = json.loads(body) if body else None
+            return await self.change(method, parts, payload)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except KeyError as e:
+            return 404, {"error": plain(e)}
+        except (ValueError, TypeError) as e:
+            return 400, {"error": plain(e)}
+        except Exception as e:
+            return 500, {"error": plain(e)}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:  # headers larger than the stream limit
+                    await respond(writer, 400, {"error": "Request headers too large"}, False)
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                    length = int(headers.get("content-length", 0))
+                    if length < 0:
+                        raise ValueError("negative Content-Length")
+                except ValueError:
+                    # the rest of the stream cannot be framed, so answer and hang up
+                    await respond(writer, 400, {"error": "Malformed request"}, False)
+                    break
+                try:
+                    body = await reader.readexactly(length) if length else b""
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                status, result = await self.handle_request(method, target, body)
+
+                keep_alive = headers.get("connection", "").lower() != "close" and (
+                    version == "HTTP/1.1"
+                    or headers.get("connection", "").lower() == "keep-alive"
+                )
+                await respond(writer, status, result, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+
+async def respond(writer, status: int, result, keep_alive: bool):
+    """Write one JSON response and wait until it is sent."""
+
+    payload = json.dumps(result).encode()
+    writer.write(
+        (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode()
+        + payload
+    )
+    await writer.drain()
+
+
+def parse_args(argv=None):
+    """
+    Parse the command-line flags of the service.
+
+    Args:
+        argv (list[str] | None): Arguments to parse. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: Parsed flags.
+    """
+
+    parser = argparse.ArgumentParser(description="Address Book JSON service")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--file", default=FILE_NAME, help="address book to serve")
+    return parser.parse_args(argv)
+
+
+async def main():
+    """
+    Load the address book and serve it over HTTP until interrupted.
+
+    Changes are autosaved in the background and saved once more on shutdown
+    (Ctrl+C or SIGTERM).
+    """
+
+    args = parse_args()
+    book = load_data(args.file)
+    book.enable_concurrency()  # autosave reads and merges from a worker thread
+    autosaver = AutoSaver(book, filename=args.file).start()
+    service = AddressBookServer(book, autosaver)
+    writer_task = asyncio.create_task(service.run_writer())
+    server = await asyncio.start_server(
+        service.handle_connection, args.host, args.port
+    )
+    print(f"Serving {args.file} on http://{args.host}:{args.port}")
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, asyncio.current_task().cancel
+        )
+    except NotImplementedError:  # Windows
+        pass
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        writer_task.cancel()
+        await autosaver.stop()
+        save_data(book, args.file)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\nGood bye!")
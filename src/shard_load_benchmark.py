@@ -0,0 +1,51 @@
+import argparse
+import os
+import tempfile
+from statistics import median
+
+from helpers.data import save_data
+from helpers.serializer import CODECS, gc_paused
+from helpers.shards import read_manifest, read_shards
+from storage_benchmark import generate_book, timed
+
+
+def load(directory, workers: int):
+    with gc_paused():  # as load_data does
+        return read_shards(directory, read_manifest(directory), workers=workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time loading a sharded book with one process and with a worker pool"
+    )
+    parser.add_argument("--contacts", type=int, default=500_000)
+    parser.add_argument("--notes", type=int, default=100_000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--codec", choices=CODECS, default="none")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--workers", type=int, help="pool size (default: shard files, up to the CPUs)")
+    args = parser.parse_args()
+
+    book = generate_book(args.contacts, args.notes)
+    cpus = os.cpu_count() or 1
+    print(
+        f"{args.contacts} contacts, {args.notes} notes, codec {args.codec}, {cpus} CPUs "
+        f"(median of {args.runs} runs)"
+    )
+    print(f"{'shards':>6}{'1 process s':>14}{'pool s':>10}{'workers':>9}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for shards in args.shards:
+            target = os.path.join(directory, f"book-{shards}.d")
+            save_data(book, target, shards, args.codec)
+            workers = args.workers or min(shards * 2, cpus)  # contacts and notes shards
+            single = median(timed(load, target, 1)[0] for _ in range(args.runs))
+            pooled = median(timed(load, target, workers)[0] for _ in range(args.runs))
+            print(
+                f"{shards:>6}{single:>14.2f}{pooled:>10.2f}{workers:>9}{single / pooled:>8.2f}x"
+            )
+    if cpus == 1 and not args.workers:
+        print("one CPU: the pool is not used, run on a multi-core machine to compare")
+
+
+if __name__ == "__main__":
+    main()
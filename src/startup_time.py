@@ -0,0 +1,90 @@
+import argparse
+import os
+import subprocess
+import sys
+from statistics import median
+from time import perf_counter
+
+from constants.constants import STARTUP_BUDGET
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+READY = (
+    "import main\n"
+    "from helpers.data import load_book\n"
+    "book, _ = load_book()\n"
+    "main.bind_completers(book)\n"
+)
+
+
+def import_times(stderr: str) -> dict:
+    """
+    Parse `-X importtime` output into {module: (self µs, cumulative µs)}.
+
+    Only modules imported by the measured statement and their direct imports are
+    kept; deeper imports are included in the cumulative time of their parents.
+    """
+
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if own.strip().isdigit() and depth <= 1:
+            times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def cold_start() -> tuple[float, dict]:
+    """Start a fresh interpreter up to the first prompt and return its wall time and imports."""
+
+    started = perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", READY],
+        cwd=os.getcwd(),
+        env={**os.environ, "PYTHONPATH": SRC},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return perf_counter() - started, import_times(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the cold-start time of the assistant up to its first prompt"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=STARTUP_BUDGET,
+        metavar="SECONDS",
+        help="fail if the median start-up time exceeds this",
+    )
+    args = parser.parse_args()
+
+    walls, imports = [], {}
+    for _ in range(args.runs):
+        wall, times = cold_start()
+        walls.append(wall)
+        for name, (_, cumulative) in times.items():
+            imports.setdefault(name, []).append(cumulative)
+
+    print(f"start-up to first prompt: median {median(walls) * 1000:.1f} ms, "
+          f"min {min(walls) * 1000:.1f} ms, max {max(walls) * 1000:.1f} ms "
+          f"({args.runs} runs, book in {os.getcwd()})")
+    print("slowest imports (median cumulative):")
+    slowest = sorted(imports.items(), key=lambda item: median(item[1]), reverse=True)
+    for name, cumulative in slowest[: args.top]:
+        print(f"  {median(cumulative) / 1000:8.1f} ms  {name}")
+
+    if median(walls) > args.budget:
+        print(f"over budget: {median(walls) * 1000:.1f} ms > {args.budget * 1000:.0f} ms")
+        sys.exit(1)
+    print(f"within budget of {args.budget * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import os
+import pickle
+import random
+import tempfile
+from time import perf_counter
+
+from helpers.data import load_data, save_data
+from helpers.serializer import CODECS
+from models.address import Address
+from models.address_book import AddressBook
+from models.birthday import Birthday
+from models.email import Email
+from models.note import Note
+from models.phone import Phone
+from models.record import Record
+from models.tag import Tag
+
+DOMAINS = ("gmail.com", "ukr.net", "example.com", "outlook.com")
+STREETS = ("Main St", "Khreshchatyk", "Shevchenka Ave", "Park Lane")
+WORDS = ("meeting", "invoice", "call", "project", "review", "draft", "budget", "plan")
+TAGS = ("#work", "#home", "#urgent", "#later", "#ideas")
+
+
+def generate_book(contacts: int, notes: int, seed: int = 0) -> AddressBook:
+    """Build a book of synthetic contacts and notes with a realistic share of optional fields."""
+
+    rng = random.Random(seed)
+    book = AddressBook()
+    for i in range(contacts):
+        record = Record(f"Contact {i}")
+        for _ in range(1 + (rng.random() < 0.3)):
+            record.phones.append(Phone(str(rng.randrange(10**9, 10**10))))
+        if rng.random() < 0.6:
+            record.birthday = Birthday(
+                f"{rng.randrange(1, 29):02d}.{rng.randrange(1, 13):02d}.{rng.randrange(1940, 2010)}"
+            )
+        if rng.random() < 0.5:
+            record.email = Email(f"user{i}@{rng.choice(DOMAINS)}")
+        if rng.random() < 0.3:
+            record.address = Address(f"{rng.randrange(1, 200)} {rng.choice(STREETS)}")
+        book.data[record.name.value] = record
+    for i in range(notes):
+        note = Note(f"Note {i}", " ".join(rng.choices(WORDS, k=rng.randrange(5, 60))))
+        note.tags = [Tag(tag) for tag in rng.sample(TAGS, rng.randrange(0, 3))]
+        book.notes[note.title] = note
+    return book
+
+
+def timed(function, *args):
+    started = perf_counter()
+    result = function(*args)
+    return perf_counter() - started, result
+
+
+def write_pickle(book, path):
+    with open(path, "wb") as f:
+        pickle.dump(book, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare save/load time and file size of the storage formats and codecs"
+    )
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--notes", type=int, default=100_000)
+    parser.add_argument("--shards", type=int, default=16, help="0 skips sharded books")
+    parser.add_argument("--codecs", nargs="+", choices=CODECS, default=list(CODECS))
+    args = parser.parse_args()
+
+    book = generate_book(args.contacts, args.notes)
+    print(f"{args.contacts} contacts, {args.notes} notes")
+    print(f"{'format':<24}{'size MB':>10}{'save s':>10}{'load s':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "book.pkl")
+        save, _ = timed(write_pickle, book, path)
+        load, loaded = timed(read_pickle, path)
+        print(f"{'pickle':<24}{os.path.getsize(path) / 2**20:>10.1f}{save:>10.2f}{load:>10.2f}")
+        del loaded
+
+        formats = [
+            (f"segments {codec}", os.path.join(directory, f"book.{codec}"), None, codec)
+            for codec in args.codecs
+        ]
+        if args.shards:
+            formats += [
+                (
+                    f"{args.shards} shards {codec}*",
+                    os.path.join(directory, f"book.{codec}.d"),
+                    args.shards,
+                    codec,
+                )
+                for codec in args.codecs
+            ]
+        for name, target, shards, codec in formats:
+            save, _ = timed(save_data, book, target, shards, codec)
+            load, loaded = timed(load_data, target)
+            size = sum(
+                os.path.getsize(os.path.join(root, file))
+                for root, _, files in os.walk(target)
+                for file in files
+            ) if os.path.isdir(target) else os.path.getsize(target)
+            print(f"{name:<24}{size / 2**20:>10.1f}{save:>10.2f}{load:>10.2f}")
+            del loaded
+    print("* note bodies are loaded on first use")
+
+
+if __name__ == "__main__":
+    main()
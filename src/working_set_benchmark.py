@@ -0,0 +1,90 @@
+import argparse
+import os
+import random
+import resource
+import tempfile
+
+from helpers.disk_store import DiskStore
+from models.address_book import AddressBook
+from models.name import Name
+from storage_benchmark import generate_book, timed
+
+BATCH = 10_000  # contacts generated and imported at a time
+
+
+def fill_store(store, contacts: int):
+    """Import `contacts` synthetic contacts a batch at a time, so the book is never in memory whole."""
+
+    for start in range(0, contacts, BATCH):
+        batch = generate_book(min(BATCH, contacts - start), 0, seed=start)
+        renamed = AddressBook()
+        for i, record in enumerate(batch.data.values()):
+            record.name = Name(f"Contact {start + i}")
+            renamed.data[record.name.value] = record
+        store.import_book(renamed)
+
+
+def workload(book, contacts: int, lookups: int, hot: float, seed: int = 1):
+    """Look up contacts, 90% of the time among the first `hot` share of them, and change every tenth."""
+
+    rng = random.Random(seed)
+    hot_count = max(int(contacts * hot), 1)
+    for i in range(lookups):
+        index = rng.randrange(hot_count) if rng.random() < 0.9 else rng.randrange(contacts)
+        record = book.find(f"Contact {index}")
+        if i % 10 == 0:
+            record.phones.append(record.phones[0])
+            book.mark_changed(record)
+
+
+def look_up_missing(book, lookups: int):
+    """Look up names no contact has, as add_contact does before adding one."""
+
+    for i in range(lookups):
+        book.find(f"Nobody {i}")
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time lookups on a disk-backed book and report its cache hit rate and peak RSS"
+    )
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--working-set", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--hot", type=float, default=0.005, help="share of contacts looked up most")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = DiskStore(os.path.join(directory, "book.db"), args.working_set)
+        fill, _ = timed(fill_store, store, args.contacts)
+        compact, _ = timed(store.compact)  # size the filters for the whole book
+        book = store.attach(AddressBook())
+        run, _ = timed(workload, book, args.contacts, args.lookups, args.hot)
+        missing, _ = timed(look_up_missing, book, args.lookups)
+        flush, _ = timed(store.flush)
+        counters = store.counters()["contacts"]
+        store.connection.close()
+    lookups = counters["hits"] + counters["misses"]
+    print(f"{args.contacts} contacts, working set {args.working_set}")
+    print(f"import  {fill:8.2f} s")
+    print(f"compact {compact:8.2f} s")
+    print(f"lookups {run:8.2f} s  {run / args.lookups * 1e6:.1f} us each")
+    print(
+        f"missing {missing:8.2f} s  {missing / args.lookups * 1e6:.1f} us each, "
+        f"{counters['filtered']} answered by the Bloom filter, "
+        f"{counters['false_positives']} false positives"
+    )
+    print(f"flush   {flush:8.2f} s")
+    print(
+        f"hit rate {counters['hits'] / lookups:.1%}, {counters['evictions']} evictions, "
+        f"{counters['writes']} writes"
+    )
+    print(f"peak RSS {peak_rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()